@@ -0,0 +1,177 @@
+"""
+End-to-end API benchmark that runs fully offline. By default the app is served by uvicorn on a
+local port (lifespan included, so the render pool and job queue start as in production) and
+its LLM calls go over HTTP to the deterministic mock server (benchmarks.mock_llm_server).
+--transport asgi drives the app in-process over httpx's ASGI transport instead (no lifespan),
+and --llm inprocess uses the mock backend without a server.
+
+    python -m benchmarks.bench_api --rows 20000 --cols 30 --requests 50 --concurrency 8
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+ENDPOINTS = ["analyze-csv", "suggest-cleaning", "generate-story", "suggest-visualization", "chat"]
+
+
+def make_csv(rows: int, cols: int, seed: int = 0) -> bytes:
+    """
+    Synthetic CSV with numeric, categorical and string columns, missing values and duplicates.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(cols):
+        kind = i % 3
+        if kind == 0:
+            values = rng.normal(100, 15, rows)
+            values[rng.random(rows) < 0.05] = np.nan
+            data[f"num_{i}"] = values
+        elif kind == 1:
+            data[f"cat_{i}"] = rng.choice(["a", "b", "c", "d"], rows, p=[0.7, 0.1, 0.1, 0.1])
+        else:
+            data[f"id_{i}"] = [f"row-{v}" for v in rng.integers(0, rows, rows)]
+    df = pd.DataFrame(data)
+    df = pd.concat([df, df.head(rows // 100)], ignore_index=True)
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    arr = np.array(latencies) if latencies else np.array([np.nan])
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(float(p50) * 1000, 1),
+        "p95_ms": round(float(p95) * 1000, 1),
+        "p99_ms": round(float(p99) * 1000, 1),
+        "mean_ms": round(float(arr.mean()) * 1000, 1),
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+async def run_endpoint(client, endpoint: str, requests: int, concurrency: int, csv_bytes: bytes,
+                       dataset_id: str, use_cache: bool) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            if endpoint == "analyze-csv":
+                resp = await client.post("/analyze-csv", files={"file": ("bench.csv", csv_bytes, "text/csv")})
+            elif endpoint == "chat":
+                resp = await client.post("/chat", json={"dataset_id": dataset_id, "message": f"What stands out in column {i}?",
+                                                        "use_cache": use_cache})
+            else:
+                resp = await client.post(f"/{endpoint}", json={"dataset_id": dataset_id, "use_cache": use_cache})
+            elapsed = time.perf_counter() - start
+        if resp.status_code == 200:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run(args, base_url: str = None) -> Dict[str, Any]:
+    import httpx
+
+    csv_bytes = make_csv(args.rows, args.cols, args.seed)
+    if base_url is None:
+        from src.api.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits)
+    results = {}
+    async with client:
+        resp = await client.post("/analyze-csv", files={"file": ("bench.csv", csv_bytes, "text/csv")})
+        resp.raise_for_status()
+        dataset_id = resp.json()["dataset_id"]
+        for endpoint in args.endpoints:
+            results[endpoint] = await run_endpoint(client, endpoint, args.requests, args.concurrency, csv_bytes,
+                                                   dataset_id, args.use_cache)
+            print(f"{endpoint:<22} " + "  ".join(f"{k}={v}" for k, v in results[endpoint].items()), flush=True)
+    if base_url is None:
+        from src.storytelling.llm_client import close_llm_clients
+        await close_llm_clients()
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "csv_bytes": len(csv_bytes),
+        "results": results,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--use-cache", action="store_true", help="let repeated prompts hit the LLM response cache")
+    parser.add_argument("--transport", choices=["http", "asgi"], default="http",
+                        help="serve the app with uvicorn on a local port (default) or call it in-process")
+    parser.add_argument("--llm", choices=["server", "inprocess"], default="server",
+                        help="mock LLM behind a local HTTP server (default) or the in-process mock backend")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock LLM fixed overhead, seconds")
+    parser.add_argument("--ttft", type=float, default=0.2, help="mock LLM time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="mock LLM throughput")
+    parser.add_argument("--response-tokens", type=int, default=200, help="mock LLM reply length")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    from benchmarks.mock_llm_server import ServerThread, create_app
+    from src.storytelling.llm_backends import MockBackend
+
+    # Configure the app before it is imported: mock LLM, throwaway data directory, no disk cache
+    os.environ["MOCK_LLM_LATENCY_SECONDS"] = str(args.latency)
+    os.environ["MOCK_LLM_TTFT_SECONDS"] = str(args.ttft)
+    os.environ["MOCK_LLM_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["MOCK_LLM_RESPONSE_TOKENS"] = str(args.response_tokens)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(max(args.concurrency, int(os.environ.get("LLM_MAX_CONCURRENCY", 8))))
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-data-")
+    os.environ["LLM_CACHE_DIR"] = ""
+
+    try:
+        with ExitStack() as stack:
+            if args.llm == "server":
+                backend = MockBackend(args.latency, args.ttft, args.tokens_per_second, args.response_tokens)
+                llm_server = stack.enter_context(ServerThread(create_app(backend)))
+                os.environ["LLM_BACKEND"] = "hf"
+                os.environ["HF_BASE_URL"] = llm_server.url
+            else:
+                os.environ["LLM_BACKEND"] = "mock"
+            base_url = None
+            if args.transport == "http":
+                from src.api.main import app
+                base_url = stack.enter_context(ServerThread(app)).url
+            report = asyncio.run(run(args, base_url))
+    finally:
+        shutil.rmtree(os.environ["DATA_DIR"], ignore_errors=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
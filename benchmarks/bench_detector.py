@@ -0,0 +1,217 @@
+"""
+Micro-benchmarks for the issue detector on synthetic data: per-check and whole-report latency
+plus peak traced memory, written as JSON and optionally compared against a stored baseline.
+
+    python -m benchmarks.bench_detector --output detector.json
+    python -m benchmarks.bench_detector --scenarios wide tall --baseline detector.json
+    python -m benchmarks.bench_detector --rows 10000 1000000 --cols 10 500 --null-density 0.2
+    python -m benchmarks.bench_detector --scenarios wide --workers 0
+"""
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning.detector import analyze_issues
+
+# Named datasets covering the axes the detector's cost depends on
+SCENARIOS = {
+    "small": {"rows": 10_000, "cols": 10},
+    "medium": {"rows": 100_000, "cols": 50},
+    "wide": {"rows": 10_000, "cols": 5_000},
+    "tall": {"rows": 10_000_000, "cols": 10},
+    "sparse": {"rows": 100_000, "cols": 50, "null_density": 0.6},
+    "high_cardinality": {"rows": 100_000, "cols": 50, "cardinality": 50_000},
+    "duplicates": {"rows": 100_000, "cols": 50, "duplicate_ratio": 0.3},
+    "mixed_types": {"rows": 100_000, "cols": 50, "string_frac": 0.6, "mixed_frac": 0.5},
+}
+DEFAULT_SCENARIOS = ["small", "medium", "sparse", "high_cardinality", "duplicates", "mixed_types"]
+
+DEFAULTS = {
+    "numeric_frac": 0.5,
+    "string_frac": 0.3,
+    "datetime_frac": 0.1,
+    "null_density": 0.05,
+    "cardinality": 100,
+    "duplicate_ratio": 0.01,
+    "mixed_frac": 0.1,
+    "seed": 0,
+}
+
+
+def generate_frame(rows: int, cols: int, numeric_frac: float = 0.5, string_frac: float = 0.3,
+                   datetime_frac: float = 0.1, null_density: float = 0.05, cardinality: int = 100,
+                   duplicate_ratio: float = 0.01, mixed_frac: float = 0.1, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic frame of `rows` x `cols`. Columns are numeric, string (with `cardinality` distinct
+    values, a `mixed_frac` share of them mixing in integers), datetime strings or constant, in the
+    given proportions; `null_density` of each column is missing and `duplicate_ratio` of the rows
+    are copies of other rows.
+    """
+    rng = np.random.default_rng(seed)
+    unique_rows = max(1, int(rows * (1 - duplicate_ratio)))
+    labels = np.array([f"value_{i}" for i in range(max(1, cardinality))], dtype=object)
+    dates = np.array(pd.date_range("2020-01-01", periods=max(2, min(cardinality, 3650))).strftime("%Y-%m-%d"), dtype=object)
+    data = {}
+    kinds = rng.choice(["numeric", "string", "datetime", "constant"], cols,
+                       p=_normalize([numeric_frac, string_frac, datetime_frac, max(0.0, 1 - numeric_frac - string_frac - datetime_frac)]))
+    for i, kind in enumerate(kinds):
+        if kind == "numeric":
+            values = rng.normal(100, 15, unique_rows) if i % 2 else rng.integers(0, 1000, unique_rows).astype(float)
+        elif kind == "string":
+            values = labels[rng.integers(0, len(labels), unique_rows)]
+            if rng.random() < mixed_frac:
+                values = values.copy()
+                ints = rng.random(unique_rows) < 0.2
+                values[ints] = rng.integers(0, 100, int(ints.sum()))
+        elif kind == "datetime":
+            values = dates[rng.integers(0, len(dates), unique_rows)]
+        else:
+            values = np.zeros(unique_rows)
+        if null_density > 0 and kind != "constant":
+            values = values.astype(object) if values.dtype == object else values.astype(float)
+            values[rng.random(unique_rows) < null_density] = None if values.dtype == object else np.nan
+        data[f"{kind}_{i}"] = values
+    df = pd.DataFrame(data)
+    if unique_rows < rows:
+        extra = rng.integers(0, unique_rows, rows - unique_rows)
+        df = pd.concat([df, df.iloc[extra]], ignore_index=True)
+    return df
+
+
+def _normalize(weights: List[float]) -> List[float]:
+    total = sum(weights)
+    return [w / total for w in weights] if total > 0 else [1.0, 0.0, 0.0, 0.0]
+
+
+def measure(df: pd.DataFrame, repeat: int = 3, memory: bool = True, workers: Optional[int] = 1) -> Dict[str, Any]:
+    """
+    Median whole-report and per-check seconds over `repeat` runs, and the peak traced memory of
+    one extra run (tracing slows the detector, so it is not timed). Worker processes' memory is
+    not traced.
+    """
+    totals, checks = [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, timings = analyze_issues(df, return_timings=True, workers=workers)
+        totals.append(time.perf_counter() - start)
+        for name, seconds in timings.items():
+            checks.setdefault(name, []).append(seconds)
+    result = {
+        "total_seconds": statistics.median(totals),
+        "checks": {name: statistics.median(values) for name, values in checks.items()},
+    }
+    if memory:
+        tracemalloc.start()
+        analyze_issues(df, workers=workers)
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Lines describing every timing or memory figure that grew by more than `threshold`x.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        figures = [("total_seconds", current["total_seconds"], base["total_seconds"])]
+        figures += [(f"checks.{k}", v, base["checks"].get(k)) for k, v in current["checks"].items()]
+        if "peak_memory_bytes" in current and "peak_memory_bytes" in base:
+            figures.append(("peak_memory_bytes", current["peak_memory_bytes"], base["peak_memory_bytes"]))
+        for figure, value, reference in figures:
+            # Ignore checks too fast to time reliably
+            if reference and value > reference * threshold and (figure == "peak_memory_bytes" or value > 0.005):
+                regressions.append(f"{name} {figure}: {reference:.4g} -> {value:.4g} ({value / reference:.2f}x)")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), help=f"named datasets (default: {' '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument("--rows", nargs="+", type=int, help="custom grid: row counts")
+    parser.add_argument("--cols", nargs="+", type=int, help="custom grid: column counts")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=None, help=f"default {default}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="detector processes (0 = all cores)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced-memory run")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown factor reported as a regression")
+    args = parser.parse_args(argv)
+
+    overrides = {name: getattr(args, name) for name in DEFAULTS if getattr(args, name) is not None}
+    runs = {}
+    if args.rows or args.cols:
+        for rows, cols in itertools.product(args.rows or [10_000], args.cols or [10]):
+            runs[f"grid_{rows}x{cols}"] = {"rows": rows, "cols": cols}
+    for name in args.scenarios or ([] if runs else DEFAULT_SCENARIOS):
+        runs[name] = SCENARIOS[name]
+
+    results = {}
+    warnings.simplefilter("ignore")
+    for name, scenario in runs.items():
+        params = {**DEFAULTS, **scenario, **overrides}
+        start = time.perf_counter()
+        df = generate_frame(**params)
+        generate_seconds = time.perf_counter() - start
+        result = {"params": params, "generate_seconds": generate_seconds, **measure(df, args.repeat, not args.no_memory, args.workers)}
+        results[name] = result
+        memory = f"  peak={result['peak_memory_bytes'] / 2**20:.1f}MiB" if "peak_memory_bytes" in result else ""
+        print(f"{name:<24} {params['rows']:>10}x{params['cols']:<6} total={result['total_seconds']:.3f}s{memory}", flush=True)
+        for check, seconds in sorted(result["checks"].items(), key=lambda kv: -kv[1]):
+            print(f"    {check:<34} {seconds:.4f}s")
+        del df
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('meta', {}).get('commit')}):")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            return 1
+        print("  no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
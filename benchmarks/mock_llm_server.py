@@ -0,0 +1,118 @@
+"""
+Standalone mock LLM server speaking the OpenAI-compatible chat completions API
+(POST /v1/chat/completions, streamed or not), so the API's real HTTP client, connection pool,
+retries and timeouts are exercised offline. Replies and timings come from MockBackend: the
+text depends only on the request, latency is overhead + time to first token + tokens / throughput.
+
+    python -m benchmarks.mock_llm_server --port 8001
+    HF_BASE_URL=http://127.0.0.1:8001 python -m uvicorn src.api.main:app
+"""
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from src.storytelling.llm_backends import MockBackend
+
+
+def create_app(backend: MockBackend) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+
+    def chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages, model = body.get("messages", []), body.get("model") or "mock"
+        max_tokens = body.get("max_tokens") or backend.response_tokens
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        if body.get("stream"):
+            async def events():
+                yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                async for delta in backend.stream(messages, model, max_tokens, body.get("temperature", 0.0)):
+                    yield chunk(completion_id, model, {"content": delta})
+                yield chunk(completion_id, model, {}, "stop")
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        text = await backend.complete(messages, model, max_tokens, body.get("temperature", 0.0))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+        }
+
+    @app.get("/stats")
+    def stats():
+        return {"calls": backend.calls}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """
+    Serves an ASGI app with uvicorn (lifespan included) on a local port from a background
+    thread, as a context manager; `url` is its base URL.
+    """
+
+    def __init__(self, app, port: int = 0):
+        import uvicorn
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning",
+                                                    lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed overhead, seconds")
+    parser.add_argument("--ttft", type=float, default=0.2, help="time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    backend = MockBackend(args.latency, args.ttft, args.tokens_per_second, args.response_tokens)
+    uvicorn.run(create_app(backend), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,149 @@
+API_BASE_URL = "http://127.0.0.1:8000"
 API_SUGGEST_URL = "http://127.0.0.1:8000/suggest-cleaning"
 API_CHAT_URL = "http://127.0.0.1:8000/chat"
-def analyze_csv(file):
+
+_client = None
+
+def api_client():
+    """
+    One pooled async HTTP client shared by every handler, so calls reuse open connections
+    instead of connecting per click.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=20, max_keepalive_connections=10))
+    return _client
+
+async def stream_text(url, payload):
+    """
+    Posts to a streaming endpoint and yields the accumulated text after each Server-Sent Event.
+    """
+    import json
+    text = ""
+    async with api_client().stream("POST", url, json=payload) as resp:
+        if resp.status_code != 200:
+            raise RuntimeError(f"API error: {resp.status_code}")
+        async for line in resp.aiter_lines():
+            if line.startswith("event: done"):
+                break
+            if line.startswith("data: "):
+                text += json.loads(line[len("data: "):]).get("delta", "")
+                yield text
+
+async def render_image(dataset_id, code, code_id):
+    """
+    (image, code) for plot code the API generated (by its code_id), rendered by the API's
+    sandboxed workers.
+    """
+    render = await api_client().post(f"{API_BASE_URL}/render-visualization", json={"dataset_id": dataset_id, "code_id": code_id})
+    if render.status_code != 200:
+        return None, f"{code}\n\n# Could not render: {render.json().get('detail', render.status_code)}"
+    return Image.open(BytesIO(render.content)), code
+
+async def collect_artifacts(dataset_id, prefetch):
+    """
+    Fills in the cleaning suggestions, story and visualization the API prefetched after
+    analysis, each as soon as it is ready, by long-polling /datasets/{id}/artifacts.
+    """
+    unchanged = gr.update()
+    values = [unchanged] * 4  # suggestions, story, plot, code
+    if not prefetch or not dataset_id:
+        yield tuple(values)
+        return
+    shown = set()
+    try:
+        while True:
+            resp = await api_client().get(f"{API_BASE_URL}/datasets/{dataset_id}/artifacts", params={"wait": 30})
+            if resp.status_code != 200:
+                return
+            data = resp.json()
+            for name, artifact in data["artifacts"].items():
+                if name in shown or artifact["status"] == "pending":
+                    continue
+                shown.add(name)
+                result = artifact.get("result") or {}
+                if name == "cleaning":
+                    values[0] = result.get("suggestions") or f"Could not prefetch suggestions: {artifact.get('error')}"
+                elif name == "story":
+                    values[1] = result.get("story") or f"Could not prefetch the story: {artifact.get('error')}"
+                elif name == "visualization":
+                    if result.get("visualization_code"):
+                        # Rendered during the prefetch, so this is a cache hit
+                        values[2], values[3] = await render_image(dataset_id, result["visualization_code"], result.get("code_id"))
+                    else:
+                        values[3] = f"# Could not prefetch a visualization: {artifact.get('error')}"
+            yield tuple(values)
+            if data["complete"]:
+                return
+    except Exception as e:
+        values[0] = f"Error collecting prefetched results: {e}"
+        yield tuple(values)
+
+async def analyze_csv(file, quick=False, prefetch=False):
     if file is None:
-        return "No file uploaded.", None, None, None, None
+        return "No file uploaded.", None, None, None, None, None
     try:
         # The file object has a .name attribute with the temp path
         filepath = file.name
+        data = {}
+        if quick:
+            # Quick mode reports on a sample first; the exact report follows server-side
+            data["row_budget"] = 50_000
+        if prefetch:
+            # Suggestions, story and visualization start generating on the server right away
+            data["prefetch"] = "true"
         with open(filepath, "rb") as f:
             files = {"file": (filepath, f, "text/csv")}
-            with httpx.Client(timeout=None) as client:
-                resp = client.post(API_ANALYZE_URL, files=files)
+            resp = await api_client().post(API_ANALYZE_URL, files=files, data=data or None)
         if resp.status_code == 200:
             response_data = resp.json()
             issues = response_data.get("issues", {})
             columns = response_data.get("columns", [])
+            dataset_id = response_data.get("dataset_id")
             
             # Prepare summary for display
             summary = ""
             for k, v in issues.items():
                 summary += f"**{k.replace('_', ' ').title()}**: {v if v else 'None'}\n\n"
+            if response_data.get("status") == "pending":
+                sample = response_data.get("sample", {})
+                summary = (f"*Approximate report from {sample.get('rows')} sampled rows of about "
+                           f"{sample.get('estimated_total_rows')}. The exact report is being computed; "
+                           f"analyze again to refresh.*\n\n") + summary
             
-            # Return the filepath to be stored in state
-            return summary, columns, str(issues), str(columns), filepath
+            # Return the filepath and dataset id to be stored in state
+            return summary, columns, str(issues), str(columns), filepath, dataset_id
         else:
-            return f"API error: {resp.status_code}", None, None, None, None
+            return f"API error: {resp.status_code}", None, None, None, None, None
     except Exception as e:
-        return f"Error: {e}", None, None, None, None
+        return f"Error: {e}", None, None, None, None, None
 
-def get_ai_suggestions(issues_str, columns_str):
+async def get_ai_suggestions(issues_str, columns_str, dataset_id=None):
     import ast
+    if dataset_id:
+        # Same prompt as a prefetch for the dataset, so its completion is reused
+        payload = {"dataset_id": dataset_id}
+    else:
+        try:
+            payload = {"issues": ast.literal_eval(issues_str), "columns": ast.literal_eval(columns_str)}
+        except Exception:
+            yield "Could not parse issues/columns for AI suggestions."
+            return
     try:
-        issues = ast.literal_eval(issues_str)
-        columns = ast.literal_eval(columns_str)
-    except Exception:
-        return "Could not parse issues/columns for AI suggestions."
-    try:
-        with httpx.Client(timeout=None) as client:
-            resp = client.post(API_SUGGEST_URL, json={"issues": issues, "columns": columns})
-        if resp.status_code == 200:
-            # Backend now returns a single Markdown string
-            suggestions_md = resp.json().get("suggestions", "")
-            return suggestions_md or "No suggestions generated."
-        else:
-            return f"API error: {resp.status_code}"
+        # Render the Markdown as it streams in rather than after the whole playbook is written
+        suggestions_md = ""
+        async for suggestions_md in stream_text(API_SUGGEST_URL + "/stream", payload):
+            yield suggestions_md
+        if not suggestions_md:
+            yield "No suggestions generated."
     except Exception as e:
-        return f"Error: {e}"
+        yield f"Error: {e}"
 # Entry point for the Gradio UI
 import gradio as gr
 import httpx
-import pandas as pd
-import ast
+from io import BytesIO
+import uuid
+from PIL import Image
 
 API_ANALYZE_URL = "http://127.0.0.1:8000/analyze-csv"
 
@@ -62,181 +156,135 @@ if __name__ == "__main__":
     .scroll-suggestions { height: 24rem; overflow-y: auto; padding: 1rem; border: 1px solid #E5E7EB; border-radius: 4px; }
     """
     with gr.Blocks(css=css, title="AI Data Analyst Agent") as demo:
-        # Add a hidden state component to store the uploaded file path
+        # Add hidden state components to store the uploaded file path and the API's dataset id
         filepath_state = gr.Textbox(visible=False)
+        dataset_state = gr.Textbox(visible=False)
         
         gr.Markdown("# AI Data Analyst Agent\nUpload a CSV to detect issues, get AI cleaning code, generate stories, visualizations, and chat with an analyst.")
         with gr.Row():
-            file_input = gr.File(label="Upload CSV", file_types=[".csv"])
+            file_input = gr.File(label="Upload CSV (optionally .gz/.zst), Parquet or Feather", file_types=[".csv", ".gz", ".zst", ".parquet", ".feather"])
+            quick_input = gr.Checkbox(label="Quick report (sampled, for large files)", value=False)
+            prefetch_input = gr.Checkbox(label="Also generate suggestions, story and visualization", value=False)
             analyze_btn = gr.Button("Analyze Data Issues")
         issues_out = gr.Markdown(label="Detected Issues")
         columns_out = gr.Textbox(label="Columns", visible=False)
         issues_hidden = gr.Textbox(visible=False)
         columns_hidden = gr.Textbox(visible=False)
         
-        analyze_btn.click(
+        analyze_event = analyze_btn.click(
             fn=analyze_csv, 
-            inputs=file_input, 
-            outputs=[issues_out, columns_out, issues_hidden, columns_hidden, filepath_state]
+            inputs=[file_input, quick_input, prefetch_input],
+            outputs=[issues_out, columns_out, issues_hidden, columns_hidden, filepath_state, dataset_state]
         )
 
         with gr.Row():
             suggest_btn = gr.Button("Get AI Cleaning Suggestions (Meta Llama 3)")
         # Render markdown with scrollable container for better readability
         suggestions_out = gr.Markdown(label="AI Cleaning Suggestions", elem_classes=["scroll-suggestions"])
-        suggest_btn.click(fn=get_ai_suggestions, inputs=[issues_hidden, columns_hidden], outputs=suggestions_out, show_progress=True)
+        suggest_btn.click(fn=get_ai_suggestions, inputs=[issues_hidden, columns_hidden, dataset_state], outputs=suggestions_out, show_progress=True)
 
         gr.Markdown("---")
         gr.Markdown("## AI Data Storytelling")
         story_btn = gr.Button("Generate Data Story")
         story_out = gr.Markdown(label="Data Story", elem_classes=["scroll-story"])
 
-        def get_ai_story(filepath, columns_str):
-            if not filepath:
-                return "Please analyze a file first."
+        async def get_ai_story(dataset_id):
+            if not dataset_id:
+                yield "Please analyze a file first."
+                return
             
             try:
-                # Use the stored filepath to read the dataframe
-                temp_df = pd.read_csv(filepath)
-                df_head = temp_df.head().to_string()
-                df_describe = temp_df.describe().to_string()
-                
-                with httpx.Client(timeout=None) as client:
-                    resp = client.post(
-                        "http://127.0.0.1:8000/generate-story", 
-                        json={
-                            "df_head": df_head,
-                            "df_describe": df_describe,
-                            "columns": ast.literal_eval(columns_str)
-                        }
-                    )
-                if resp.status_code == 200:
-                    return resp.json().get("story", "No story generated.")
-                else:
-                    return f"API error: {resp.status_code}"
+                # The API already holds the parsed dataset, head and describe
+                story = ""
+                async for story in stream_text(f"{API_BASE_URL}/generate-story/stream", {"dataset_id": dataset_id}):
+                    yield story
+                if not story:
+                    yield "No story generated."
             except Exception as e:
-                return f"Error generating story: {e}"
+                yield f"Error generating story: {e}"
 
-        story_btn.click(fn=get_ai_story, inputs=[filepath_state, columns_hidden], outputs=story_out, show_progress=True)
+        story_btn.click(fn=get_ai_story, inputs=dataset_state, outputs=story_out, show_progress=True)
 
         gr.Markdown("---")
         gr.Markdown("## AI Visualization Suggestion")
         with gr.Row():
             viz_btn = gr.Button("Suggest a Visualization")
         with gr.Row():
-            viz_plot = gr.Plot(label="Suggested Visualization")
+            viz_plot = gr.Image(label="Suggested Visualization", type="pil")
             viz_code = gr.Code(label="Visualization Code", language="python")
 
-        def get_ai_visualization(filepath, columns_str):
-            if not filepath:
+        async def get_ai_visualization(dataset_id):
+            if not dataset_id:
                 return None, "Please analyze a file first."
             
             try:
-                # Read dataframe to get head
-                df = pd.read_csv(filepath)
-                df_head = df.head().to_string()
-                columns = ast.literal_eval(columns_str)
-
-                # Call the new backend endpoint
-                with httpx.Client(timeout=None) as client:
-                    resp = client.post(
-                        "http://127.0.0.1:8000/suggest-visualization",
-                        json={"columns": columns, "df_head": df_head}
-                    )
-                
-                if resp.status_code == 200:
-                    code = resp.json().get("visualization_code")
-                    
-                    # Execute the code to generate the plot
-                    # The code should define a 'fig' variable or just show the plot
-                    # We need to capture the plot object. A simple way is to exec
-                    # and assume it creates a figure.
-                    
-                    # Create a space for the code to execute in
-                    local_scope = {}
-                    # The code expects a dataframe 'df'
-                    local_scope['df'] = df
-                    
-                    # Redirect stdout to capture any prints if needed
-                    from io import StringIO
-                    import sys
-                    old_stdout = sys.stdout
-                    sys.stdout = captured_output = StringIO()
-                    
-                    exec(code, globals(), local_scope)
-                    
-                    sys.stdout = old_stdout # Restore stdout
-                    
-                    # Gradio's gr.Plot can take a matplotlib figure object
-                    # We assume the executed code creates a figure on plt
-                    import matplotlib.pyplot as plt
-                    fig = plt.gcf()
-                    
-                    # If the figure is empty, it might be a seaborn plot that needs drawing
-                    if not fig.axes:
-                        # This is a bit of a hack, but seaborn plots often just need plt.show()
-                        # to be drawn onto the current figure.
-                        plt.tight_layout()
-
-                    return fig, code
-                else:
+                resp = await api_client().post(f"{API_BASE_URL}/suggest-visualization", json={"dataset_id": dataset_id})
+                if resp.status_code != 200:
                     return None, f"API error: {resp.status_code}"
+                # The code runs in the API's sandboxed render workers, not in this process
+                data = resp.json()
+                return await render_image(dataset_id, data.get("visualization_code"), data.get("code_id"))
 
             except Exception as e:
                 return None, f"Error generating visualization: {e}"
 
         viz_btn.click(
             fn=get_ai_visualization,
-            inputs=[filepath_state, columns_hidden],
+            inputs=dataset_state,
             outputs=[viz_plot, viz_code],
             show_progress=True
         )
 
+        # With prefetch on, the three results above fill in as the API finishes each of them
+        analyze_event.then(
+            fn=collect_artifacts,
+            inputs=[dataset_state, prefetch_input],
+            outputs=[suggestions_out, story_out, viz_plot, viz_code]
+        )
+
         gr.Markdown("---")
         gr.Markdown("## Data Analyst Chatbot")
         chatbot = gr.Chatbot(label="Chat with your Data Analyst")
         msg = gr.Textbox(label="Ask a question about your data...")
         clear = gr.Button("Clear Chat")
+        chat_session_state = gr.State(None)
 
         def user_chat(user_message, history):
             return "", history + [[user_message, None]]
 
-        def bot_response(history, filepath, columns_str):
-            if not filepath:
+        async def bot_response(history, dataset_id, session_id):
+            if not dataset_id:
                 history[-1][1] = "Please upload and analyze a file before starting a chat."
-                return history
+                yield history, session_id
+                return
 
+            # The API keeps the conversation; a fresh chat starts a new session
+            if session_id is None or len(history) == 1:
+                session_id = uuid.uuid4().hex
             user_message = history[-1][0]
+            payload = {
+                "message": user_message,
+                "dataset_id": dataset_id,
+                "session_id": session_id,
+            }
             
             try:
-                df = pd.read_csv(filepath)
-                df_head = df.head().to_string()
-                columns = ast.literal_eval(columns_str)
-
-                with httpx.Client(timeout=None) as client:
-                    resp = client.post(
-                        API_CHAT_URL,
-                        json={
-                            "message": user_message,
-                            "history": history[:-1], # Send history without the current question
-                            "columns": columns,
-                            "df_head": df_head,
-                        }
-                    )
-                
-                if resp.status_code == 200:
-                    bot_message = resp.json().get("response", "Sorry, I didn't get a response.")
-                else:
-                    bot_message = f"API Error: {resp.status_code}"
+                # Show tokens as they arrive
+                bot_message = ""
+                async for bot_message in stream_text(API_CHAT_URL + "/stream", payload):
+                    history[-1][1] = bot_message
+                    yield history, session_id
+                if not bot_message:
+                    bot_message = "Sorry, I didn't get a response."
 
             except Exception as e:
                 bot_message = f"An error occurred: {e}"
 
             history[-1][1] = bot_message
-            return history
+            yield history, session_id
 
         msg.submit(user_chat, [msg, chatbot], [msg, chatbot], queue=False).then(
-            bot_response, [chatbot, filepath_state, columns_hidden], chatbot
+            bot_response, [chatbot, dataset_state, chat_session_state], [chatbot, chat_session_state]
         )
         clear.click(lambda: None, None, chatbot, queue=False)
     demo.launch()
@@ -0,0 +1,161 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.analysis.profile import column_profile, correlation
+
+# Once column names and statistic keywords are blanked out, a question the profile can answer
+# has only these words left. Anything else ("of survivors", "for women", "in first class",
+# "why", "plot") may filter, group or ask for reasoning, so the question goes to the LLM.
+_STOP_WORDS = frozenset("""
+    a an the this that these those of in for on and or to is are was were be what whats s which how many much
+    number count do does did have has there tell me us show give get find list please i we you can could would
+    it its their column columns field fields variable variables feature features value values entries data
+    dataset set table frame df overall between pearson coefficient
+""".split())
+_ROWS = re.compile(r"\b(?:how many|number of|count of|total)\s+(?:rows|records|entries|observations|samples)\b|"
+                   r"\b(?:row count|shape|size of (?:the|this) (?:data ?set|data|table))\b")
+_COLUMNS = re.compile(r"\b(?:how many|number of|count of|list|what are)\s+(?:the\s+)?(?:columns|fields|variables|features)\b")
+
+# Statistic keywords, matched after column names are blanked out of the question
+_STATS: List[Tuple[str, re.Pattern]] = [
+    ("correlation", re.compile(r"\bcorrelat\w*\b")),
+    ("nulls", re.compile(r"\b(?:nulls?|missing|nans?|empty|blanks?)\b")),
+    ("distinct", re.compile(r"\b(?:unique|distinct)\b")),
+    ("top", re.compile(r"\b(?:most (?:common|frequent)|top values?|mode)\b")),
+    ("mean", re.compile(r"\b(?:mean|average|avg)\b")),
+    ("median", re.compile(r"\bmedian\b")),
+    ("variance", re.compile(r"\bvariance\b")),
+    ("std", re.compile(r"\b(?:std|stdev|standard deviation)\b")),
+    ("range", re.compile(r"\brange\b")),
+    ("min", re.compile(r"\b(?:min|minimum|lowest|smallest|earliest)\b")),
+    ("max", re.compile(r"\b(?:max|maximum|highest|largest|biggest|latest)\b")),
+    ("sum", re.compile(r"\b(?:sum|total)\b")),
+    ("dtype", re.compile(r"\b(?:data ?type|dtype|type)\b")),
+]
+_NUMERIC_STATS = {"mean", "median", "variance", "std", "sum"}
+_LABELS = {"mean": "mean", "median": "median", "std": "standard deviation", "variance": "variance",
+           "min": "minimum", "max": "maximum", "sum": "sum"}
+
+
+def _normalize(text: str) -> str:
+    return " " + re.sub(r"[^0-9a-z]+", " ", str(text).lower()).strip() + " "
+
+
+def mentioned_columns(message: str, columns: List[Any]) -> Tuple[List[Any], str]:
+    """
+    Columns named in the message with the position of their first mention, in order, and the
+    normalized message with those names blanked out (positions are kept). Longer names are
+    matched first, so "age group" is not read as "age".
+    """
+    text = _normalize(message)
+    found = []
+    for col in sorted(columns, key=lambda c: -len(_normalize(c))):
+        name = _normalize(col)
+        if name.strip() and name in text:
+            found.append((text.index(name), col))
+            text = text.replace(name, " " + "|" * (len(name) - 2) + " ")
+    return sorted(found, key=lambda f: f[0]), text
+
+
+def _pair(stats: List[Tuple[int, str]], columns: List[Tuple[int, Any]]) -> List[Tuple[Any, List[str]]]:
+    """
+    Each statistic goes with the first column named after it ("average Fare and median Age"),
+    or the last column when none follows ("Age mean"). If that leaves a column without one,
+    every statistic applies to every column ("mean and median of Age and Fare").
+    """
+    paired = {col: [] for _, col in columns}
+    for position, stat in stats:
+        following = [col for start, col in columns if start > position]
+        target = following[0] if following else columns[-1][1]
+        if stat not in paired[target]:
+            paired[target].append(stat)
+    if not all(paired.values()):
+        names = list(dict.fromkeys(stat for _, stat in stats))
+        return [(col, names) for _, col in columns]
+    return list(paired.items())
+
+
+def _number(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:,.6g}" if abs(value) >= 1e-4 or value == 0 else f"{value:.4g}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def _answer(stat: str, summary: Dict[str, Any], n_rows: int) -> Optional[str]:
+    name, kind = summary["name"], summary["kind"]
+    if stat == "nulls":
+        return f"**{name}** has {_number(summary['nulls'])} missing values ({summary['null_pct']}% of {_number(n_rows)} rows)."
+    if stat == "distinct":
+        return f"**{name}** has {_number(summary['distinct'])} distinct values."
+    if stat == "top":
+        values = ", ".join(f"{v} ({_number(c)})" for v, c in summary["top_values"][:5])
+        return f"Most common values of **{name}**: {values}." if values else f"**{name}** has no values."
+    if stat == "dtype":
+        return f"**{name}** is {kind} (`{summary['dtype']}`)."
+    if stat in _NUMERIC_STATS and kind != "numeric":
+        return None
+    if stat in ("min", "max", "range") and "min" not in summary:
+        return None
+    if stat == "range":
+        return f"**{name}** ranges from {_number(summary['min'])} to {_number(summary['max'])}."
+    value = summary.get(stat) if stat != "variance" else (summary["std"] ** 2 if summary.get("std") is not None else None)
+    if value is None:
+        return f"**{name}** has no values to compute the {_LABELS[stat]} from."
+    return f"The {_LABELS[stat]} of **{name}** is {_number(value)} (over {_number(summary['count'])} non-missing values)."
+
+
+def answer_from_profile(message: str, profile: Dict[str, Any]) -> Optional[str]:
+    """
+    A direct answer to a recognizable statistical question (row or column counts, missing
+    values, distinct/top values, mean/median/std/min/max/sum/range, types, correlations)
+    about columns named in it, read from the dataset profile. Returns None for anything else,
+    including any question with words beyond column names, statistics and stop words (a filter
+    such as "of survivors" would get the whole column's answer), which then goes to the LLM.
+    """
+    names = [summary["name"] for summary in profile["columns"]]
+    mentions, rest = mentioned_columns(message, names)
+    columns = [col for _, col in mentions]
+    # Column names are blanked first, so a column called e.g. "Price per unit" is not read as a group-by
+    leftover = rest
+    for pattern in [_ROWS, _COLUMNS] + [pattern for _, pattern in _STATS]:
+        leftover = pattern.sub(" ", leftover)
+    words = [word for word in leftover.split() if word.strip("|")]
+    if len(message.split()) > 25 or any(word not in _STOP_WORDS for word in words):
+        return None
+    n_rows = profile["n_rows"]
+    found = sorted((match.start(), stat) for stat, pattern in _STATS for match in pattern.finditer(rest))
+    stats = list(dict.fromkeys(stat for _, stat in found))
+    lines = []
+    if not columns:
+        if _ROWS.search(rest):
+            lines.append(f"The dataset has {_number(n_rows)} rows and {_number(profile['n_columns'])} columns.")
+        elif _COLUMNS.search(rest):
+            lines.append(f"The dataset has {_number(profile['n_columns'])} columns: {', '.join(map(str, names))}.")
+        elif stats == ["nulls"]:
+            missing = [s for s in profile["columns"] if s["nulls"]]
+            lines.append("Missing values per column: " + ", ".join(f"**{s['name']}** {_number(s['nulls'])}" for s in missing) + "."
+                         if missing else "No column has missing values.")
+        else:
+            return None
+    elif "correlation" in stats:
+        if len(columns) < 2:
+            return None
+        for i, a in enumerate(columns):
+            for b in columns[i + 1:]:
+                value = correlation(profile, a, b)
+                if value is None:
+                    return None
+                lines.append(f"The Pearson correlation between **{a}** and **{b}** is {value:.3f}.")
+    elif stats:
+        for col, col_stats in _pair(found, mentions):
+            summary = column_profile(profile, col)
+            for stat in col_stats:
+                line = _answer(stat, summary, n_rows)
+                if line is None:
+                    return None
+                lines.append(line)
+    else:
+        return None
+    return "\n".join(lines) + f"\n\n_Answered from the dataset profile ({_number(n_rows)} rows)._"
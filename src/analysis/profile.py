@@ -0,0 +1,144 @@
+import warnings
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Numeric columns are summarized this many at a time, bounding the float64 copy
+_BLOCK_COLUMNS = 64
+
+
+def _scalar(value: Any) -> Any:
+    # JSON-friendly form of a value from the frame
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None if np.isnan(value) else str(value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _kind(series: pd.Series) -> str:
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "categorical"
+
+
+def _top_values(series: pd.Series, top_k: int) -> Dict[str, Any]:
+    """
+    Distinct count and the `top_k` most frequent values with their counts, from one factorize
+    and one bincount; ties keep the order of first appearance.
+    """
+    codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    k = min(top_k, len(counts))
+    top = np.argpartition(-counts, k - 1)[:k] if k else np.array([], dtype=np.int64)
+    top = top[np.lexsort((top, -counts[top]))]
+    return {"distinct": int(len(uniques)), "top_values": [[_scalar(uniques[i]), int(counts[i])] for i in top]}
+
+
+def _numeric_block(values: np.ndarray, bins: int) -> List[Dict[str, Any]]:
+    """
+    Summary statistics and a histogram of each column of `values` (rows x columns, NaN for
+    missing), computed for the whole block at once.
+    """
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        total = np.nansum(values, axis=0)
+        mean = total / count
+        std = np.sqrt(np.nansum((values - mean) ** 2, axis=0) / (count - 1))
+        quantiles = np.nanpercentile(values, [0, 25, 50, 75, 100], axis=0)
+        zeros = (values == 0).sum(axis=0)
+    summaries = []
+    for j in range(values.shape[1]):
+        finite = values[:, j][np.isfinite(values[:, j])]
+        counts, edges = np.histogram(finite, bins=bins) if len(finite) else (np.array([]), np.array([]))
+        summaries.append({
+            "mean": _scalar(mean[j]), "std": _scalar(std[j]), "min": _scalar(quantiles[0, j]),
+            "p25": _scalar(quantiles[1, j]), "median": _scalar(quantiles[2, j]), "p75": _scalar(quantiles[3, j]),
+            "max": _scalar(quantiles[4, j]), "sum": _scalar(total[j]), "zeros": int(zeros[j]),
+            "histogram": {"edges": [_scalar(e) for e in edges], "counts": [int(c) for c in counts]},
+        })
+    return summaries
+
+
+def correlation_matrix(values: np.ndarray) -> np.ndarray:
+    """
+    Pairwise-complete Pearson correlations of the columns of `values` (NaN for missing), as
+    df.corr() computes them, from a handful of matrix products instead of a loop over pairs.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        present = (~np.isnan(values)).astype(np.float64)
+        # Centering first keeps the sums of products well conditioned
+        centered = np.nan_to_num(values - np.nanmean(values, axis=0))
+        n = present.T @ present
+        sx = centered.T @ present
+        sxx = (centered ** 2).T @ present
+        sxy = centered.T @ centered
+        cov = n * sxy - sx * sx.T
+        corr = cov / np.sqrt((n * sxx - sx ** 2) * (n * sxx - sx ** 2).T)
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def build_profile(df: pd.DataFrame, bins: int = 20, top_k: int = 10, max_correlation_columns: int = 50) -> Dict[str, Any]:
+    """
+    Per-column summary (type, nulls, distinct count, top values; mean/std/quantiles/sum and a
+    histogram for numeric columns; range for datetimes) and the correlation matrix of the
+    numeric columns with the fewest nulls. The result is JSON-serializable so it can be stored
+    with the dataset's metadata.
+    """
+    n_rows = len(df)
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        nulls = int(series.isna().sum())
+        summary = {"name": _scalar(col), "dtype": str(series.dtype), "kind": _kind(series), "count": n_rows - nulls,
+                   "nulls": nulls, "null_pct": round(100 * nulls / n_rows, 2) if n_rows else 0.0}
+        summary.update(_top_values(series, top_k))
+        if summary["kind"] == "datetime":
+            summary.update({"min": _scalar(series.min()), "max": _scalar(series.max())})
+        columns.append(summary)
+
+    numeric = [i for i, summary in enumerate(columns) if summary["kind"] == "numeric"]
+    for start in range(0, len(numeric), _BLOCK_COLUMNS):
+        block = numeric[start:start + _BLOCK_COLUMNS]
+        values = np.column_stack([df.iloc[:, i].to_numpy(dtype=np.float64, na_value=np.nan) for i in block])
+        for i, summary in zip(block, _numeric_block(values, bins)):
+            columns[i].update(summary)
+
+    correlated = sorted(numeric, key=lambda i: columns[i]["nulls"])[:max_correlation_columns]
+    correlated.sort()
+    correlation = {"columns": [], "matrix": []}
+    if len(correlated) >= 2:
+        values = np.column_stack([df.iloc[:, i].to_numpy(dtype=np.float64, na_value=np.nan) for i in correlated])
+        matrix = correlation_matrix(values)
+        correlation = {
+            "columns": [columns[i]["name"] for i in correlated],
+            "matrix": [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in matrix],
+        }
+    return {"n_rows": n_rows, "n_columns": len(df.columns), "columns": columns, "correlation": correlation}
+
+
+def column_profile(profile: Dict[str, Any], name: Any) -> Optional[Dict[str, Any]]:
+    for summary in profile["columns"]:
+        if summary["name"] == name:
+            return summary
+    return None
+
+
+def correlation(profile: Dict[str, Any], a: Any, b: Any) -> Optional[float]:
+    names = profile["correlation"]["columns"]
+    if a not in names or b not in names:
+        return None
+    return profile["correlation"]["matrix"][names.index(a)][names.index(b)]
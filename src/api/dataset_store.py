@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.profile import build_profile
+from src.storage import columnar
+
+
+def hash_upload(fileobj, block_size: int = 1 << 20, limit: Optional[int] = None) -> str:
+    """
+    Content hash of an uploaded file, used as its dataset id; with `limit`, of its first
+    `limit` bytes only. Rewinds the file afterwards.
+    """
+    digest = hashlib.sha256()
+    remaining = limit
+    while remaining is None or remaining > 0:
+        block = fileobj.read(block_size if remaining is None else min(block_size, remaining))
+        if not block:
+            break
+        digest.update(block)
+        if remaining is not None:
+            remaining -= len(block)
+    fileobj.seek(0)
+    return digest.hexdigest()[:32]
+
+
+def frame_nbytes(df: Optional[pd.DataFrame]) -> int:
+    if df is None:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# Derived artifacts kept with an entry that count towards the cache's byte budget
+SIZED_ARTIFACTS = ("describe_frame", "describe", "head_frame", "profile", "outliers")
+
+
+def artifact_nbytes(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    # Profiles and outlier results are JSON-like; their serialized size is a fair proxy
+    return len(json.dumps(value, default=str))
+
+
+class DatasetStore:
+    """
+    In-process LRU of parsed datasets and their derived artifacts, keyed by dataset id.
+    Entries are evicted when the byte budget is exceeded or after `idle_seconds` without access.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, idle_seconds: float = 1800.0):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_loads = 0
+        self.persist_failures = 0
+
+    def put(self, dataset_id: str, df: Optional[pd.DataFrame], issues: Dict[str, Any], columns: list,
+            head: Optional[str] = None, **artifacts) -> Dict[str, Any]:
+        entry = {
+            "dataset_id": dataset_id,
+            "df": df,
+            "columns": columns,
+            "issues": issues,
+            "head": head if head is not None else (df.head().to_string() if df is not None else ""),
+            "describe": None,
+            "numeric_columns": list(df.select_dtypes(include=[np.number]).columns) if df is not None else [],
+            "n_rows": len(df) if df is not None else None,
+            "nbytes": frame_nbytes(df),
+            "last_access": time.monotonic(),
+        }
+        entry.update(artifacts)
+        entry["artifact_nbytes"] = {key: artifact_nbytes(artifacts[key]) for key in SIZED_ARTIFACTS if key in artifacts}
+        entry["nbytes"] += sum(entry["artifact_nbytes"].values())
+        with self._lock:
+            self._remove(dataset_id)
+            self._entries[dataset_id] = entry
+            self.bytes_used += entry["nbytes"]
+            self._evict()
+        return entry
+
+    def get(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(dataset_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["last_access"] = time.monotonic()
+            self._entries.move_to_end(dataset_id)
+            return entry
+
+    def load(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Like get(), but falls back to the dataset's columnar copy on disk, e.g. after eviction
+        or when another worker process handled the upload. The frame itself stays on disk.
+        """
+        entry = self.get(dataset_id)
+        if entry is not None or not columnar.valid_dataset_id(dataset_id):
+            return entry
+        metadata = columnar.read_metadata(dataset_id)
+        if metadata is None or not columnar.has_dataset(dataset_id):
+            return None
+        with self._lock:
+            self.disk_loads += 1
+        return self.put(dataset_id, None, metadata["issues"], metadata["columns"], head=metadata["head"],
+                        numeric_columns=metadata["numeric_columns"], n_rows=metadata.get("n_rows"),
+                        fingerprints=metadata.get("fingerprints"), column_stats=metadata.get("column_stats"),
+                        source_bytes=metadata.get("source_bytes"), profile=metadata.get("profile"),
+                        outliers=metadata.get("outliers"))
+
+    def attach(self, entry: Dict[str, Any], key: str, value: Any) -> None:
+        """
+        Stores a derived artifact (see SIZED_ARTIFACTS) with the entry and counts its size
+        towards the byte budget.
+        """
+        size = artifact_nbytes(value)
+        with self._lock:
+            sizes = entry.setdefault("artifact_nbytes", {})
+            added = size - sizes.get(key, 0)
+            entry[key] = value
+            sizes[key] = size
+            entry["nbytes"] += added
+            if self._entries.get(entry["dataset_id"]) is entry:
+                self.bytes_used += added
+                self._evict()
+
+    def frame(self, entry: Dict[str, Any], columns: Optional[list] = None) -> Optional[pd.DataFrame]:
+        """
+        The entry's DataFrame, or a memory-mapped read of just `columns` when it is not in memory.
+        """
+        if entry["df"] is not None:
+            return entry["df"] if columns is None else entry["df"][columns]
+        return columnar.load_dataset(entry["dataset_id"], columns)
+
+    def describe_frame(self, entry: Dict[str, Any]) -> Optional[pd.DataFrame]:
+        """
+        `df.describe()` for an entry, computed on first use and kept with it.
+        """
+        if entry.get("describe_frame") is None:
+            # describe() only summarizes numeric columns when there are any
+            df = self.frame(entry, entry["numeric_columns"] or None)
+            self.attach(entry, "describe_frame", df.describe() if df is not None else None)
+        return entry["describe_frame"]
+
+    def describe(self, entry: Dict[str, Any]) -> str:
+        """
+        `df.describe()` text for an entry.
+        """
+        if entry["describe"] is None:
+            describe = self.describe_frame(entry)
+            self.attach(entry, "describe", describe.to_string() if describe is not None else "")
+        return entry["describe"]
+
+    def profile(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        The dataset profile (see src.analysis.profile), built on first use and kept with the
+        entry. None while the entry only holds a quick-report sample.
+        """
+        if entry.get("profile") is None and entry.get("report_status") != "pending":
+            df = self.frame(entry)
+            self.attach(entry, "profile", build_profile(df) if df is not None else None)
+        return entry.get("profile")
+
+    def head_frame(self, entry: Dict[str, Any], n: int = 5) -> Optional[pd.DataFrame]:
+        """
+        The first `n` rows as a DataFrame; a disk-backed entry only decodes those rows.
+        """
+        if entry.get("head_frame") is None:
+            if entry["df"] is not None:
+                self.attach(entry, "head_frame", entry["df"].head(n))
+            else:
+                table = columnar.load_table(entry["dataset_id"])
+                self.attach(entry, "head_frame", table.slice(0, n).to_pandas() if table is not None else None)
+        return entry["head_frame"]
+
+    def persist(self, entry: Dict[str, Any]) -> None:
+        """
+        Writes the entry's frame and artifacts to the columnar data directory. A failure is
+        recorded as the entry's `persist_error` and re-raised.
+        """
+        try:
+            self._write(entry)
+        except Exception as e:
+            with self._lock:
+                self.persist_failures += 1
+            entry["persist_error"] = f"{type(e).__name__}: {e}"
+            raise
+        entry.pop("persist_error", None)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        if entry["df"] is not None:
+            columnar.write_dataset(entry["dataset_id"], entry["df"])
+        columnar.write_metadata(entry["dataset_id"], {
+            "columns": entry["columns"],
+            "issues": entry["issues"],
+            "head": entry["head"],
+            "numeric_columns": entry["numeric_columns"],
+            "n_rows": entry.get("n_rows"),
+            # Let later versions of the dataset reuse unchanged columns (see src.cleaning.incremental)
+            "fingerprints": entry.get("fingerprints"),
+            "column_stats": entry.get("column_stats"),
+            "source_bytes": entry.get("source_bytes"),
+            "profile": entry.get("profile"),
+            "outliers": entry.get("outliers"),
+        })
+
+    def _remove(self, dataset_id: str) -> None:
+        entry = self._entries.pop(dataset_id, None)
+        if entry is not None:
+            self.bytes_used -= entry["nbytes"]
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for dataset_id in [k for k, e in self._entries.items() if now - e["last_access"] > self.idle_seconds]:
+            self._remove(dataset_id)
+            self.evictions += 1
+        # Least recently used first; the newest entry is kept even if it alone exceeds the budget
+        while self.bytes_used > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes_used": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_loads": self.disk_loads,
+                "persist_failures": self.persist_failures,
+            }
+
+
+dataset_store = DatasetStore(
+    max_bytes=int(os.environ.get("DATASET_CACHE_MAX_BYTES", 1 << 30)),
+    idle_seconds=float(os.environ.get("DATASET_CACHE_IDLE_SECONDS", 1800)),
+)
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.storage import columnar
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT UNIQUE NOT NULL,
+    batch_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    owned INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, seq);
+"""
+
+_FINISHED = ("done", "failed")
+
+# Columns added after the first release, for queue files created before them
+_ADDED_COLUMNS = {"owner": "TEXT", "heartbeat_at": "REAL"}
+
+
+def _job(row: sqlite3.Row, with_result: bool = True) -> Dict[str, Any]:
+    job = {key: row[key] for key in ("job_id", "batch_id", "name", "status", "stage", "attempts", "error",
+                                     "created_at", "started_at", "finished_at")}
+    job["options"] = json.loads(row["options"])
+    if with_result:
+        job["result"] = json.loads(row["result"]) if row["result"] else None
+    return job
+
+
+class JobQueue:
+    """
+    Durable queue of batch analysis jobs, kept in a SQLite file so queued work survives API
+    restarts. `workers` asyncio tasks each claim one queued job at a time and await
+    `handler(job, set_stage)`; whatever it returns is stored as the job's result.
+
+    Several API processes may share the file. Each queue claims jobs under its own `owner` id
+    and a background thread refreshes the claims' heartbeat every `heartbeat_seconds`; a
+    running job whose heartbeat is older than `stale_seconds` belonged to a process that
+    died and is queued again by any other. Jobs still running at a clean shutdown are queued
+    again at once. Files spooled for a job (`owned`) are deleted once it finishes; finished
+    jobs are dropped after `retention_seconds`.
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_attempts: int = 3, retention_seconds: float = 7 * 86400,
+                 heartbeat_seconds: float = 10.0, stale_seconds: float = 60.0):
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        # A claim must miss a few heartbeats before it counts as abandoned
+        self.stale_seconds = max(stale_seconds, 3 * heartbeat_seconds)
+        self.owner = uuid.uuid4().hex
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.completed = 0
+        self.failed = 0
+        self.recovered = 0
+        self.taken_over = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            existing = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._db = db
+        return self._db
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn().execute(sql, params).fetchall()
+
+    def spool_path(self, job_id: str) -> str:
+        # Uploads are copied next to the queue so a restart can still reach them
+        return os.path.join(os.path.dirname(self.path) or ".", f"{job_id}.csv")
+
+    def submit(self, batch_id: str, items: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Queues one job per item (`job_id`, `name`, `path`, `owned`) under `batch_id`, all with
+        the same `options`.
+        """
+        now = time.time()
+        rows = [(item["job_id"], batch_id, item["name"], item["path"], int(item["owned"]), json.dumps(options), now)
+                for item in items]
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            db.executemany("INSERT INTO jobs (job_id, batch_id, name, path, owned, options, status, created_at) "
+                           "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)", rows)
+            db.execute("COMMIT")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return [{"job_id": item["job_id"], "name": item["name"], "status": "queued"} for item in items]
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        rows = self._execute(
+            "UPDATE jobs SET status = 'running', stage = 'starting', attempts = attempts + 1, started_at = ?, "
+            "owner = ?, heartbeat_at = ? "
+            "WHERE seq = (SELECT seq FROM jobs WHERE status = 'queued' ORDER BY seq LIMIT 1) RETURNING *",
+            (now, self.owner, now))
+        if not rows:
+            return None
+        job = _job(rows[0], with_result=False)
+        job.update(path=rows[0]["path"], owned=bool(rows[0]["owned"]))
+        return job
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        self._execute("UPDATE jobs SET stage = ? WHERE job_id = ? AND status = 'running' AND owner = ?",
+                      (stage, job_id, self.owner))
+
+    def _finish(self, job: Dict[str, Any], result: Optional[Dict[str, Any]], error: Optional[str]) -> bool:
+        """
+        Stores the outcome of a job this queue still owns. Returns False, storing nothing, when
+        the claim went stale and the job was queued again (another process may be running it).
+        """
+        rows = self._execute(
+            "UPDATE jobs SET status = ?, stage = NULL, result = ?, error = ?, finished_at = ?, owner = NULL "
+            "WHERE job_id = ? AND status = 'running' AND owner = ? RETURNING job_id",
+            ("failed" if error else "done", json.dumps(result, default=str) if result is not None else None,
+             error, time.time(), job["job_id"], self.owner))
+        if not rows:
+            print(f"Batch job {job['job_id']} ({job['name']}) was taken over by another worker; dropping its outcome")
+            self.taken_over += 1
+            return False
+        if job["owned"] and os.path.exists(job["path"]):
+            os.remove(job["path"])
+        return True
+
+    def _requeue_stale(self) -> int:
+        rows = self._execute(
+            "UPDATE jobs SET status = 'queued', stage = NULL, owner = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?) RETURNING job_id",
+            (time.time() - self.stale_seconds,))
+        self.recovered += len(rows)
+        return len(rows)
+
+    def _beat(self) -> None:
+        # A thread rather than a task, so long handlers blocking the event loop cannot starve it
+        while not self._stopping.wait(self.heartbeat_seconds):
+            try:
+                self._execute("UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND owner = ?",
+                              (time.time(), self.owner))
+                self._requeue_stale()
+            except sqlite3.Error as e:
+                print(f"Job queue heartbeat failed: {e}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        return _job(rows[0]) if rows else None
+
+    def batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Progress of a batch: job counts per status and each job without its result.
+        """
+        rows = self._execute("SELECT * FROM jobs WHERE batch_id = ? ORDER BY seq", (batch_id,))
+        if not rows:
+            return None
+        jobs = [_job(row, with_result=False) for row in rows]
+        counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+        for job in jobs:
+            counts[job["status"]] += 1
+        return {"batch_id": batch_id, "total": len(jobs), "finished": counts["done"] + counts["failed"],
+                "counts": counts, "jobs": jobs}
+
+    def start(self, handler: Callable[[Dict[str, Any], Callable[[str], None]], Awaitable[Dict[str, Any]]]) -> None:
+        """
+        Requeues jobs whose process died while running them, drops expired finished jobs and
+        starts the workers on the running event loop and the heartbeat thread.
+        """
+        self._requeue_stale()
+        expired = self._execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ? RETURNING path, owned",
+                                (*_FINISHED, time.time() - self.retention_seconds))
+        for row in expired:
+            if row["owned"] and os.path.exists(row["path"]):
+                os.remove(row["path"])
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker(handler)) for _ in range(self.workers)]
+        self._stopping.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name="job-queue-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    async def _worker(self, handler) -> None:
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    # Also polls, for jobs submitted by another API process sharing the file
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=2.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if job["attempts"] > self.max_attempts:
+                # Interrupted by a crash or restart every time it ran
+                self._finish(job, None, f"Gave up after {self.max_attempts} attempts")
+                self.failed += 1
+                continue
+            try:
+                result = await handler(job, lambda stage: self.set_stage(job["job_id"], stage))
+            except asyncio.CancelledError:
+                # Shutdown: the job is queued again by shutdown()
+                raise
+            except Exception as e:
+                print(f"Batch job {job['job_id']} ({job['name']}) failed: {e}")
+                if self._finish(job, None, str(e) or type(e).__name__):
+                    self.failed += 1
+            else:
+                if self._finish(job, result, None):
+                    self.completed += 1
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self._db is not None:
+            # Interrupted jobs need not wait for their claims to go stale
+            self._execute("UPDATE jobs SET status = 'queued', stage = NULL, owner = NULL "
+                          "WHERE status = 'running' AND owner = ?", (self.owner,))
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {row["status"]: row["n"] for row in self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        return {
+            "workers": self.workers,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "completed_since_start": self.completed,
+            "failed_since_start": self.failed,
+            "recovered": self.recovered,
+            "taken_over": self.taken_over,
+        }
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+job_queue = JobQueue(
+    path=os.environ.get("JOB_DB_PATH", os.path.join(columnar.DATA_DIR, "jobs", "jobs.sqlite3")),
+    workers=int(os.environ.get("JOB_WORKERS", 2)),
+    max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", 3)),
+    retention_seconds=float(os.environ.get("JOB_RETENTION_SECONDS", 7 * 86400)),
+    heartbeat_seconds=float(os.environ.get("JOB_HEARTBEAT_SECONDS", 10)),
+    stale_seconds=float(os.environ.get("JOB_STALE_SECONDS", 60)),
+)
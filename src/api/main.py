@@ -1,15 +1,75 @@
-from fastapi import FastAPI, UploadFile, File, Body
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, Body, Form, Query, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import glob
+import json
+import os
+import shutil
 import pandas as pd
-from src.cleaning.detector import analyze_issues
+from src.analysis.fast_path import answer_from_profile, mentioned_columns
+from src.cleaning.duplicates import find_duplicates
+from src.cleaning.outliers import METHODS as OUTLIER_METHODS, OUTLIER_TIME_BUDGET, prompt_issues, score_rows
+from src.cleaning.parallel import shutdown_pool
+from src.cleaning.pipeline import PIPELINE_CHUNK_ROWS, plan_from_issues, run_pipeline
+from src.cleaning.quick_report import sample_csv, quick_report
+from src.cleaning.streaming import accumulate_chunks, accumulate_csv
+from src.cleaning.incremental import (
+    analyze_incremental,
+    analyze_append,
+    column_fingerprints,
+    column_partials,
+    extend_fingerprints,
+    frame_chunks,
+    load_state,
+    save_state,
+)
+from src.api.dataset_store import dataset_store, hash_upload
+from src.api.job_queue import job_queue, new_job_id
+from src.api.prefetch import prefetcher
+from src.observability.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, DETECT_SECONDS, PARSE_SECONDS, PROMPT_BUILD_SECONDS, registry
+from src.observability.middleware import InstrumentationMiddleware
+from src.observability.tracing import tracer
+from src.storage.columnar import cleaned_path, convert_csv, has_dataset, load_table, valid_dataset_id, write_cleaned, write_outlier_scores
+from src.api.uploads import read_upload_form
+from src.storage.ingest import column_names, dataset_key, read_frame, stage_path
 from src.storytelling.hf_client import (
     get_cleaning_suggestions_hf,
     get_data_story_hf,
     get_visualization_suggestion_hf,
     get_chat_response_hf,
+    stream_cleaning_suggestions_hf,
+    stream_data_story_hf,
+    stream_chat_response_hf,
+    summarize_chat_hf,
+    CHAT_FALLBACK,
 )
+from src.storytelling.chat_session import chat_sessions
+from src.storytelling.llm_client import close_llm_clients
+from src.storytelling.prompt_builder import fit_cleaning_prompt, fit_story_prompt, fit_columns_and_head, format_profile
+from src.storytelling.response_cache import response_cache
+from src.visualization.code_store import plot_code_store
+from src.visualization.render_pool import DPI_RANGE, FORMATS, RenderError, RenderTimeout, render_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Render workers import matplotlib in the background so the first plot does not wait for it
+    render_pool.start()
+    # Batch jobs left queued or interrupted by the last shutdown resume here
+    job_queue.start(_run_job)
+    yield
+    # Release the batch workers, prefetch tasks, pooled LLM connections and detector/render worker processes
+    await job_queue.shutdown()
+    await prefetcher.shutdown()
+    await close_llm_clients()
+    shutdown_pool()
+    render_pool.shutdown()
+    tracer.close()
 
-app = FastAPI(title="AI Data Analyst Agent")
+app = FastAPI(title="AI Data Analyst Agent", lifespan=lifespan)
 
 # Allow CORS for local Gradio UI
 app.add_middleware(
@@ -19,60 +79,869 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last, so it is outermost and times the whole request
+app.add_middleware(InstrumentationMiddleware)
+
+# Counters the components keep anyway (cache hits, evictions, ...) are exported on every scrape
+registry.collect("dataset_cache", dataset_store.stats)
+registry.collect("llm_response_cache", response_cache.stats)
+registry.collect("chat_sessions", chat_sessions.stats)
+registry.collect("render_pool", render_pool.stats)
+registry.collect("batch_jobs", job_queue.stats)
+registry.collect("prefetch", prefetcher.stats)
+registry.collect("tracing", tracer.stats)
+
+@contextmanager
+def _timed(name, histogram, **labels):
+    # One stage of a request: a child trace span and an observation of `histogram`
+    with tracer.span(name, **labels) as span, histogram.time(**labels):
+        yield span
 
 @app.get("/ping")
 def ping():
     return {"message": "API is running"}
 
+def _check_dataset_id(dataset_id: str) -> None:
+    # Ids become file names under DATA_DIR
+    if not valid_dataset_id(dataset_id):
+        raise HTTPException(status_code=422, detail=f"Invalid dataset_id '{dataset_id}': expected 32 hexadecimal characters.")
+
+def _dataset(dataset_id: Optional[str]) -> Optional[dict]:
+    if dataset_id is None:
+        return None
+    _check_dataset_id(dataset_id)
+    entry = dataset_store.load(dataset_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired dataset_id '{dataset_id}'. Please upload the file again.")
+    return entry
+
+def _sse(deltas, **leading) -> StreamingResponse:
+    """
+    Relays an async generator of text deltas as Server-Sent Events: one leading `event: <name>`
+    per keyword argument (e.g. prompt_stats), one `data: {"delta": ...}` event per fragment,
+    then a final `event: done`.
+    """
+    async def events():
+        for name, data in leading.items():
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+        async for delta in deltas:
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _require(**fields):
+    missing = [name for name, value in fields.items() if value is None]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Provide dataset_id or: {', '.join(missing)}")
+
+# Prompt contexts fitted to the per-endpoint token budgets. A stored dataset contributes its
+# frames so columns can be selected; raw request strings are truncated instead.
+def _cleaning_context(entry, issues, columns):
+    if entry is not None:
+        issues, columns = entry["issues"], entry["columns"]
+        if entry.get("outliers"):
+            # The latest POST /datasets/{id}/outliers run joins the report's issues
+            issues = {**issues, **prompt_issues(entry["outliers"])}
+    _require(issues=issues, columns=columns)
+    with _timed("prompt_build", PROMPT_BUILD_SECONDS, endpoint="cleaning"):
+        fitted, stats = fit_cleaning_prompt(issues, columns, n_rows=entry.get("n_rows") if entry else None)
+    return fitted["issues"], fitted["columns"], stats
+
+def _story_context(entry, df_head, df_describe, columns):
+    issues = None
+    if entry is not None:
+        df_head = dataset_store.head_frame(entry)
+        df_describe = dataset_store.describe_frame(entry)
+        df_head = entry["head"] if df_head is None else df_head
+        df_describe = "" if df_describe is None else df_describe
+        columns, issues = entry["columns"], entry["issues"]
+    _require(df_head=df_head, df_describe=df_describe, columns=columns)
+    with _timed("prompt_build", PROMPT_BUILD_SECONDS, endpoint="story"):
+        fitted, stats = fit_story_prompt(df_head, df_describe, columns, issues)
+    return fitted["head"], fitted["describe"], fitted["columns"], stats
+
+def _columns_and_head_context(endpoint, entry, columns, df_head):
+    issues = None
+    if entry is not None:
+        df_head = dataset_store.head_frame(entry)
+        df_head = entry["head"] if df_head is None else df_head
+        columns, issues = entry["columns"], entry["issues"]
+    _require(columns=columns, df_head=df_head)
+    with _timed("prompt_build", PROMPT_BUILD_SECONDS, endpoint=endpoint):
+        fitted, stats = fit_columns_and_head(endpoint, df_head, columns, issues)
+    return fitted["columns"], fitted["head"], stats
+
+def _chat_session(session_id, dataset_id, columns, df_head, history):
+    """
+    The chat session for this request; its dataset context block is only built when it starts.
+    """
+    entry = _dataset(dataset_id)
+    def build_context():
+        columns_text, head_text, stats = _columns_and_head_context("chat", entry, columns, df_head)
+        return {"columns": columns_text, "head": head_text, "prompt_stats": stats}
+    return chat_sessions.open(session_id, dataset_id, build_context, history)
+
+def _record_turn(session, message, response):
+    # Fallback error messages are not part of the conversation
+    if response and response != CHAT_FALLBACK:
+        chat_sessions.record(session, message, response, summarize_chat_hf)
+
+async def _chat_fast_path(dataset_id, message):
+    """
+    (direct answer or None, profile slice for the LLM prompt) for a chat message. Statistical
+    questions the dataset profile can answer skip the LLM; other questions about named columns
+    get those columns' exact statistics in the prompt.
+    """
+    if dataset_id is None:
+        return None, ""
+    entry = await run_in_threadpool(_dataset, dataset_id)
+    profile = await run_in_threadpool(dataset_store.profile, entry)
+    if profile is None:
+        return None, ""
+    answer = answer_from_profile(message, profile)
+    if answer is not None:
+        return answer, ""
+    mentions, _ = mentioned_columns(message, [summary["name"] for summary in profile["columns"]])
+    return None, format_profile(profile, [col for _, col in mentions]) if mentions else ""
+
+async def _single(text):
+    yield text
+
+async def _recorded(session, message, deltas):
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+    _record_turn(session, message, "".join(parts).strip())
+
+# Quick reports read at most this many sampled rows unless the request sets row_budget
+QUICK_REPORT_ROW_BUDGET = int(os.environ.get("QUICK_REPORT_ROW_BUDGET", 50_000))
+
+def _is_append(fileobj, base, size) -> bool:
+    """
+    Whether the upload is the base version's file with rows appended: it starts with exactly
+    the base's bytes, which end at a line break.
+    """
+    base_size = base.get("source_bytes")
+    if not base_size or size <= base_size:
+        return False
+    fileobj.seek(base_size - 1)
+    ends_line = fileobj.read(1) == b"\n"
+    fileobj.seek(0)
+    return ends_line and hash_upload(fileobj, limit=base_size) == base["dataset_id"]
+
+def _analyze_append(dataset_id, fileobj, chunksize, base, size):
+    """
+    Updates the base version's mergeable statistics with the appended rows only.
+    """
+    acc = load_state(base["dataset_id"])
+    if acc is None:
+        # The base was analyzed in memory: build its accumulator once and keep it for later appends
+        acc = accumulate_chunks(frame_chunks(base["df"], base["dataset_id"], chunksize))
+        save_state(base["dataset_id"], acc)
+    with _timed("detect", DETECT_SECONDS, mode="append"):
+        acc, tail_fingerprints, appended_rows = analyze_append(fileobj, base["source_bytes"], base["columns"], acc, chunksize)
+    issues, approximate = acc.report()
+    # Storage still gets the whole file, in one streaming pass
+    convert_csv(dataset_id, fileobj)
+    stats = acc.column_stats()
+    fingerprints = extend_fingerprints(base["fingerprints"], tail_fingerprints) if base.get("fingerprints") else None
+    entry = dataset_store.put(dataset_id, None, issues, base["columns"], head=base["head"],
+                              numeric_columns=stats["numeric_columns"], n_rows=stats["n_rows"], approximate=approximate,
+                              report_status="ready", fingerprints=fingerprints, source_bytes=size,
+                              incremental={"base_dataset_id": base["dataset_id"], "mode": "append", "appended_rows": appended_rows})
+    dataset_store.persist(entry)
+    save_state(dataset_id, acc)
+    return entry
+
+def _analyze_chunked(dataset_id, fileobj, chunksize, size, columns=None):
+    # Parsing and detection are interleaved chunk by chunk
+    with _timed("detect", DETECT_SECONDS, mode="chunked"):
+        acc = accumulate_csv(fileobj, chunksize=chunksize, read_csv_kwargs={"usecols": columns} if columns else None)
+    issues, approximate = acc.report()
+    fileobj.seek(0)
+    head = pd.read_csv(fileobj, nrows=5, usecols=columns).to_string()
+    fileobj.seek(0)
+    convert_csv(dataset_id, fileobj, columns=columns)
+    # The full frame is not held in memory in chunked mode; it is read back from disk on demand
+    stats = acc.column_stats()
+    entry = dataset_store.put(dataset_id, None, issues, list(acc.columns), head=head, numeric_columns=stats["numeric_columns"],
+                              n_rows=stats["n_rows"], approximate=approximate, report_status="ready", source_bytes=size)
+    dataset_store.persist(entry)
+    save_state(dataset_id, acc)
+    return entry
+
+def _analyze_exact(dataset_id, staged, chunked, chunksize, base=None, columns=None):
+    """
+    The exact issues report of a staged upload (see src.storage.ingest), optionally of just
+    `columns`, stored under `dataset_id`. Returns the entry; entries holding a frame in memory
+    still need _persist(), the others are persisted.
+    With a `base` entry (an earlier version of the dataset), appended rows are folded into the
+    base's statistics, and otherwise only columns whose fingerprint changed are recomputed.
+    Parquet and Feather files are always loaded whole.
+    """
+    size = staged["bytes"]
+    if staged["format"] == "csv":
+        with open(staged["path"], "rb") as fileobj:
+            if base is not None and not columns and _is_append(fileobj, base, size):
+                return _analyze_append(dataset_id, fileobj, chunksize, base, size)
+            if chunked:
+                return _analyze_chunked(dataset_id, fileobj, chunksize, size, columns)
+    with _timed("parse", PARSE_SECONDS, format=staged["format"]) as span:
+        df, ingest = read_frame(staged["path"], staged["format"], columns)
+        span.set(rows=len(df), engine=ingest["engine"])
+    with _timed("detect", DETECT_SECONDS, mode="incremental" if base else "exact"):
+        issues, stats, fingerprints, recomputed = analyze_incremental(
+            df, base.get("fingerprints") if base else None, base.get("column_stats") if base else None)
+    incremental = {"base_dataset_id": base["dataset_id"], "mode": "columns", "recomputed_columns": recomputed} if base else None
+    return dataset_store.put(dataset_id, df, issues, list(df.columns), approximate=[], report_status="ready",
+                             fingerprints=fingerprints, column_stats=column_partials(stats), source_bytes=size,
+                             incremental=incremental, ingest=dict(ingest, compression=staged["compression"]))
+
+def _persist(entry):
+    # Fingerprints only matter once a newer version is uploaded, and the profile once someone
+    # chats about the dataset, so both are computed off the request path
+    if entry.get("fingerprints") is None and entry["df"] is not None:
+        entry["fingerprints"] = column_fingerprints(entry["df"])
+    dataset_store.profile(entry)
+    try:
+        dataset_store.persist(entry)
+    except Exception as e:
+        # Reported as `persist_error` by /datasets/{id}/report; the dataset is lost once evicted
+        print(f"Persisting dataset {entry['dataset_id']} failed: {e}")
+
+def _exact_report(dataset_id, staged, chunked, chunksize, base_dataset_id=None, columns=None):
+    """
+    Background job behind a quick report: computes the exact report from the staged upload
+    and swaps it in for the sampled entry.
+    """
+    try:
+        base = dataset_store.load(base_dataset_id) if base_dataset_id else None
+        entry = _analyze_exact(dataset_id, staged, chunked, chunksize, base, columns)
+        if entry["df"] is not None:
+            _persist(entry)
+    except Exception as e:
+        print(f"Exact report for {dataset_id} failed: {e}")
+        entry = dataset_store.get(dataset_id)
+        if entry is not None:
+            entry["report_status"] = "failed"
+    finally:
+        os.remove(staged["path"])
+
+def _report(entry):
+    report = {
+        "dataset_id": entry["dataset_id"],
+        "issues": entry["issues"],
+        "columns": entry["columns"],
+        "approximate": entry.get("approximate", []),
+        # Entries restored from disk always hold an exact report
+        "status": entry.get("report_status", "ready"),
+    }
+    if report["status"] != "ready":
+        report.update({key: entry[key] for key in ("intervals", "cardinality_class", "sample")})
+    if entry.get("incremental"):
+        report["incremental"] = entry["incremental"]
+    if entry.get("ingest"):
+        report["ingest"] = entry["ingest"]
+    if entry.get("persist_error"):
+        report["persist_error"] = entry["persist_error"]
+    return report
+
+async def _ready_entry(dataset_id):
+    # A quick report's artifacts are built from the exact report, so the cached completions
+    # match what the endpoints will ask for once it lands
+    while True:
+        entry = await run_in_threadpool(_dataset, dataset_id)
+        status = entry.get("report_status", "ready")
+        if status == "failed":
+            raise RuntimeError("The exact report failed")
+        if status == "ready":
+            return entry
+        await asyncio.sleep(0.5)
+
+def _render_frame(dataset_id, entry):
+    # Workers memory-map the stored copy; a frame not written yet (or a quick-report sample) is sent along
+    return None if has_dataset(dataset_id) else dataset_store.frame(entry)
+
+async def _prefetch_cleaning(dataset_id):
+    issues, columns, prompt_stats = _cleaning_context(await _ready_entry(dataset_id), None, None)
+    return {"suggestions": await get_cleaning_suggestions_hf(issues, columns), "prompt_stats": prompt_stats}
+
+async def _prefetch_story(dataset_id):
+    df_head, df_describe, columns, prompt_stats = await run_in_threadpool(_story_context, await _ready_entry(dataset_id), None, None, None)
+    return {"story": await get_data_story_hf(df_head, df_describe, columns), "prompt_stats": prompt_stats}
+
+async def _prefetch_visualization(dataset_id):
+    entry = await _ready_entry(dataset_id)
+    columns, df_head, prompt_stats = await run_in_threadpool(_columns_and_head_context, "visualization", entry, None, None)
+    code = await get_visualization_suggestion_hf(columns, df_head)
+    result = {"visualization_code": code, "code_id": plot_code_store.put(code), "prompt_stats": prompt_stats}
+    # Rendered too, so /render-visualization with this code_id is a cache hit
+    frame = await run_in_threadpool(_render_frame, dataset_id, entry)
+    try:
+        await run_in_threadpool(render_pool.render, code, dataset_id, frame)
+        result["rendered"] = True
+    except (RenderError, RenderTimeout) as e:
+        result.update(rendered=False, render_error=str(e))
+    return result
+
+def _start_prefetch(dataset_id):
+    return prefetcher.start(dataset_id, {
+        "cleaning": lambda: _prefetch_cleaning(dataset_id),
+        "story": lambda: _prefetch_story(dataset_id),
+        "visualization": lambda: _prefetch_visualization(dataset_id),
+    })
+
+def _check_columns(staged, columns):
+    unknown = [col for col in columns if col not in column_names(staged["path"], staged["format"])]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown columns: {', '.join(unknown)}")
+
+def _quick_entry(dataset_id, staged, row_budget, time_budget, columns):
+    """
+    The quick-report entry of a staged CSV, computed on a sample; None when the sample is
+    the whole file, which then gets the exact report.
+    """
+    with open(staged["path"], "rb") as f:
+        sample, info = sample_csv(f, row_budget or QUICK_REPORT_ROW_BUDGET, time_budget=time_budget)
+    if info["complete"]:
+        return None
+    sample = sample[columns] if columns else sample
+    with _timed("detect", DETECT_SECONDS, mode="quick"):
+        quick = quick_report(sample, info["estimated_total_rows"], info["block_sizes"])
+    # Until the exact report lands, the other endpoints work on the sample
+    return dataset_store.put(dataset_id, sample, quick["issues"], list(sample.columns),
+                             n_rows=info["estimated_total_rows"], approximate=quick["approximate"],
+                             intervals=quick["intervals"], cardinality_class=quick["cardinality_class"],
+                             sample={k: v for k, v in info.items() if k != "block_sizes"}, report_status="pending")
+
+_FORM_BOOLS = {"true": True, "1": True, "yes": True, "on": True, "false": False, "0": False, "no": False, "off": False}
+
+def _form_value(fields, name, parse, default=None):
+    # Form fields of /analyze-csv, read by read_upload_form rather than FastAPI's Form()
+    values = fields.get(name)
+    if not values or values[-1] == "":
+        return default
+    try:
+        return parse(values[-1])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=422, detail=f"Invalid value for form field '{name}': {values[-1]!r}")
+
+def _form_bool(value):
+    return _FORM_BOOLS[value.strip().lower()]
+
+_ANALYZE_FORM = {
+    "type": "object",
+    "required": ["file"],
+    "properties": {
+        "file": {"type": "string", "format": "binary"},
+        "chunked": {"type": "boolean", "default": False},
+        "chunksize": {"type": "integer", "default": 100_000},
+        "row_budget": {"type": "integer"},
+        "time_budget": {"type": "number"},
+        "base_dataset_id": {"type": "string"},
+        "columns": {"type": "array", "items": {"type": "string"}},
+        "prefetch": {"type": "boolean", "default": False},
+    },
+}
+
 # Data cleaning: upload and analyze CSV
-@app.post("/analyze-csv")
-async def analyze_csv(file: UploadFile = File(...)):
-    df = pd.read_csv(file.file)
-    issues = analyze_issues(df)
-    return {"issues": issues, "columns": list(df.columns)}
+@app.post("/analyze-csv", openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": _ANALYZE_FORM}}}})
+async def analyze_csv(request: Request, background_tasks: BackgroundTasks):
+    """
+    Analyzes an uploaded CSV (plain, gzip or zstd) or Parquet/Feather file, optionally only
+    the given `columns`, and keeps the parsed dataset server-side under `dataset_id`, in
+    memory and as a memory-mappable Arrow file under DATA_DIR. `ingest` reports the parser,
+    parse time and the memory saved by compact dtypes.
+    With chunked=true the file is streamed in chunks with bounded memory; `approximate`
+    then lists the issue keys estimated from sketches.
+    With row_budget and/or time_budget (seconds) a quick report is returned first: it is
+    computed on a stratified sample, counts are scaled to the estimated row count with 95%
+    `intervals`, and `status` is "pending" until the exact report, computed in the background,
+    replaces it (poll GET /datasets/{dataset_id}/report).
+    With base_dataset_id (an earlier upload of the same dataset), only what changed is analyzed:
+    appended rows update the base's statistics, and otherwise only columns whose content
+    fingerprint changed are recomputed; `incremental` describes what was done.
+    With prefetch=true, cleaning suggestions, the data story and a rendered visualization are
+    generated concurrently in the background (after the exact report, for a quick report);
+    `prefetch` lists them. Collect them from GET /datasets/{dataset_id}/artifacts.
+    The body is read as it arrives: the file goes straight to its staged copy on disk
+    (decompressed, and hashed on the way) without being spooled first.
+    """
+    def respond(entry):
+        report = _report(entry)
+        if prefetch:
+            report["prefetch"] = _start_prefetch(entry["dataset_id"])
+        return report
+
+    # Parsing and detection run in the threadpool too, so a large upload does not stall other requests
+    staged, fields = await read_upload_form(request, "file")
+    handed_off = False
+    try:
+        chunked = _form_value(fields, "chunked", _form_bool, False)
+        chunksize = _form_value(fields, "chunksize", int, 100_000)
+        row_budget = _form_value(fields, "row_budget", int)
+        time_budget = _form_value(fields, "time_budget", float)
+        base_dataset_id = _form_value(fields, "base_dataset_id", str)
+        columns = fields.get("columns") or None
+        prefetch = _form_value(fields, "prefetch", _form_bool, False)
+        if columns:
+            await run_in_threadpool(_check_columns, staged, columns)
+        dataset_id = dataset_key(staged["digest"], columns)
+        base = await run_in_threadpool(_dataset, base_dataset_id)
+        if (row_budget is not None or time_budget is not None) and staged["format"] == "csv":
+            entry = await run_in_threadpool(dataset_store.load, dataset_id)
+            if entry is not None:
+                return respond(entry)
+            entry = await run_in_threadpool(_quick_entry, dataset_id, staged, row_budget, time_budget, columns)
+            if entry is not None:
+                # The background job reads the staged file and removes it
+                background_tasks.add_task(_exact_report, dataset_id, staged, chunked, chunksize, base_dataset_id, columns)
+                handed_off = True
+                return respond(entry)
+            # The sample is the whole file: nothing to approximate
+        entry = await run_in_threadpool(_analyze_exact, dataset_id, staged, chunked, chunksize, base, columns)
+        if entry["df"] is not None:
+            background_tasks.add_task(_persist, entry)
+        return respond(entry)
+    finally:
+        if not handed_off:
+            os.remove(staged["path"])
+
+# Directories batch jobs may read local paths from (os.pathsep-separated); none by default
+JOB_LOCAL_DIRS = [os.path.realpath(d) for d in os.environ.get("JOB_LOCAL_DIRS", "").split(os.pathsep) if d]
+# Files a directory in `paths` stands for
+_BATCH_PATTERNS = ("*.csv", "*.csv.gz", "*.csv.zst", "*.parquet", "*.feather")
+
+def _analyze_path(path, chunked, chunksize):
+    staged = stage_path(path)
+    try:
+        entry = dataset_store.load(staged["digest"])
+        if entry is not None and entry.get("report_status", "ready") == "ready":
+            return entry
+        entry = _analyze_exact(staged["digest"], staged, chunked, chunksize)
+    finally:
+        if staged["owned"]:
+            os.remove(staged["path"])
+    if entry["df"] is not None:
+        # No response is waiting on a batch job, so the entry is persisted right away
+        _persist(entry)
+    return entry
+
+async def _run_job(job, set_stage):
+    """
+    One batch job: the exact report of its file and, when asked for, cleaning suggestions.
+    """
+    options = job["options"]
+    set_stage("analyzing")
+    entry = await run_in_threadpool(_analyze_path, job["path"], options["chunked"], options["chunksize"])
+    result = {"report": _report(entry)}
+    if options["suggest_cleaning"]:
+        set_stage("suggesting")
+        issues, columns, prompt_stats = _cleaning_context(entry, None, None)
+        result["suggestions"] = await get_cleaning_suggestions_hf(issues, columns)
+        result["prompt_stats"] = prompt_stats
+    return result
+
+def _local_files(path) -> List[str]:
+    real = os.path.realpath(path)
+    if not any(os.path.commonpath([real, root]) == root for root in JOB_LOCAL_DIRS):
+        raise HTTPException(status_code=403, detail=f"'{path}' is not under a directory listed in JOB_LOCAL_DIRS.")
+    if os.path.isdir(real):
+        return sorted(path for pattern in _BATCH_PATTERNS for path in glob.glob(os.path.join(real, pattern)))
+    if not os.path.isfile(real):
+        raise HTTPException(status_code=404, detail=f"No such file: '{path}'")
+    return [real]
+
+def _spool_job(fileobj, job_id) -> str:
+    path = job_queue.spool_path(job_id)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out, 1 << 20)
+    return path
+
+@app.post("/batch/analyze-csv")
+async def batch_analyze_csv(
+    files: Optional[List[UploadFile]] = File(None),
+    paths: Optional[List[str]] = Form(None),
+    chunked: bool = Form(False),
+    chunksize: int = Form(100_000),
+    suggest_cleaning: bool = Form(False)
+):
+    """
+    Queues one analysis job per uploaded file and per local file in `paths` (a directory stands
+    for the CSV, Parquet and Feather files directly inside it; only directories in
+    JOB_LOCAL_DIRS may be read), and returns at once with a `batch_id` and the job ids. Jobs
+    run on a bounded worker pool and survive restarts; poll GET /batch/{batch_id} for progress
+    and GET /jobs/{job_id} for each result. With suggest_cleaning=true each job also asks for
+    cleaning suggestions.
+    """
+    local = [found for path in paths or [] for found in _local_files(path)]
+    if not files and not local:
+        raise HTTPException(status_code=422, detail="Provide files or paths with at least one data file.")
+    items = [{"job_id": new_job_id(), "name": os.path.basename(found), "path": found, "owned": False} for found in local]
+    for upload in files or []:
+        job_id = new_job_id()
+        path = await run_in_threadpool(_spool_job, upload.file, job_id)
+        items.append({"job_id": job_id, "name": upload.filename or job_id, "path": path, "owned": True})
+    batch_id = new_job_id()
+    jobs = job_queue.submit(batch_id, items, {"chunked": chunked, "chunksize": chunksize, "suggest_cleaning": suggest_cleaning})
+    return {"batch_id": batch_id, "jobs": jobs}
+
+@app.get("/batch/{batch_id}")
+def batch_progress(batch_id: str):
+    """
+    Job counts per status and each job's status and stage.
+    """
+    batch = job_queue.batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch_id '{batch_id}'")
+    return batch
+
+@app.get("/jobs/stats")
+def job_stats():
+    return job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+def job_result(job_id: str):
+    """
+    A batch job's status and, once done, its result: the issues report (with its dataset_id,
+    usable with the other endpoints) and any cleaning suggestions.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id '{job_id}'")
+    return job
+
+@app.get("/datasets/{dataset_id}/report")
+def dataset_report(dataset_id: str):
+    """
+    The dataset's current issues report; `status` turns from "pending" to "ready" (or "failed")
+    when the exact report behind a quick report is done.
+    """
+    return _report(_dataset(dataset_id))
+
+@app.get("/datasets/{dataset_id}/profile")
+def dataset_profile(dataset_id: str):
+    """
+    Per-column statistics, histograms, top values and correlations of the dataset.
+    """
+    profile = dataset_store.profile(_dataset(dataset_id))
+    if profile is None:
+        raise HTTPException(status_code=409, detail="The profile is built once the exact report is ready.")
+    return profile
+
+@app.get("/datasets/{dataset_id}/artifacts")
+async def dataset_artifacts(dataset_id: str, wait: float = Query(0.0, ge=0, le=60)):
+    """
+    The artifacts prefetched for the dataset (see /analyze-csv prefetch=true): each one's
+    status (pending, ready or failed) and, once ready, the same body as its endpoint. With
+    `wait` (seconds) it first waits for one more pending artifact to finish, so a client can
+    long-poll and show each as it arrives; `complete` is true when none is pending.
+    """
+    artifacts = await prefetcher.collect(dataset_id, wait)
+    if artifacts is None:
+        raise HTTPException(status_code=404, detail=f"Nothing was prefetched for dataset '{dataset_id}'.")
+    return artifacts
+
+@app.get("/datasets/{dataset_id}/duplicates")
+async def dataset_duplicates(
+    dataset_id: str,
+    columns: Optional[List[str]] = Query(None),
+    near: bool = True,
+    threshold: float = 0.8,
+    max_clusters: int = 20,
+):
+    """
+    Exact duplicate rows on `columns` (default all), and rows that are near-duplicates once
+    case, whitespace and trailing timestamps are ignored and small edits are tolerated
+    (MinHash similarity at least `threshold`), each with the largest clusters and sample rows.
+    """
+    entry = await run_in_threadpool(_dataset, dataset_id)
+    unknown = [col for col in columns or [] if col not in entry["columns"]]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown columns: {', '.join(unknown)}")
+    if not 0 < threshold <= 1:
+        raise HTTPException(status_code=422, detail="threshold must be in (0, 1]")
+    df = await run_in_threadpool(dataset_store.frame, entry, columns or None)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' is no longer stored")
+    return await run_in_threadpool(find_duplicates, df, None, near, threshold, max_clusters)
+
+def _score_outliers(entry, columns, method, threshold, time_budget):
+    df = dataset_store.frame(entry, columns or entry["numeric_columns"] or None)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{entry['dataset_id']}' is no longer stored")
+    try:
+        result = score_rows(df, columns or None, method, threshold, time_budget=time_budget)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    scores = result.pop("scores")
+    dataset_store.attach(entry, "outliers", result)
+    # Stored next to the dataset for render workers and later requests
+    write_outlier_scores(entry["dataset_id"], scores)
+    dataset_store.persist(entry)
+    return result, scores
+
+@app.post("/datasets/{dataset_id}/outliers")
+async def dataset_outliers(
+    dataset_id: str,
+    method: str = Body("robust"),
+    columns: Optional[List[str]] = Body(None),
+    threshold: Optional[float] = Body(None),
+    time_budget: float = Body(OUTLIER_TIME_BUDGET),
+    include_scores: bool = Body(False),
+):
+    """
+    Scores every row for outlyingness on numeric `columns` (default all): `iqr` (distance
+    beyond the quartiles), `robust` (modified z-score from median and MAD) or
+    `isolation_forest` (multivariate). Models are fitted on a sample and rows are scored in
+    batches until `time_budget` seconds; `complete` tells whether all rows were scored. The
+    scores are kept for the cleaning prompt and as `outlier_scores` in /render-visualization.
+    """
+    entry = await run_in_threadpool(_dataset, dataset_id)
+    if entry.get("report_status") == "pending":
+        raise HTTPException(status_code=409, detail="Outliers are scored once the exact report is ready.")
+    if method not in OUTLIER_METHODS:
+        raise HTTPException(status_code=422, detail=f"Unknown method '{method}'. Use one of: {', '.join(OUTLIER_METHODS)}")
+    unknown = [col for col in columns or [] if col not in entry["numeric_columns"]]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Not numeric columns: {', '.join(unknown)}")
+    result, scores = await run_in_threadpool(_score_outliers, entry, columns, method, threshold, time_budget)
+    if include_scores:
+        result = dict(result, scores=[None if s != s else round(s, 4) for s in scores.tolist()])
+    return result
+
+@app.get("/datasets/{dataset_id}/cleaning-plan")
+def dataset_cleaning_plan(dataset_id: str):
+    """
+    The cleaning plan suggested by the dataset's issues report, for POST /datasets/{id}/clean
+    as is or edited.
+    """
+    entry = _dataset(dataset_id)
+    if entry.get("report_status") == "pending":
+        raise HTTPException(status_code=409, detail="The cleaning plan is built once the exact report is ready.")
+    return {"dataset_id": dataset_id, "plan": plan_from_issues(entry["issues"], dataset_store.profile(entry))}
+
+def _clean(entry, plan, chunk_rows):
+    # The pipeline streams from the memory-mapped columnar copy
+    try:
+        dataset_store.persist(entry)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not store dataset '{entry['dataset_id']}': {e}")
+    table = load_table(entry["dataset_id"])
+    if table is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{entry['dataset_id']}' is no longer stored")
+    if plan is None:
+        plan = plan_from_issues(entry["issues"], dataset_store.profile(entry))
+    try:
+        return run_pipeline(table, plan, lambda schema, batches: write_cleaned(entry["dataset_id"], schema, batches), chunk_rows)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/datasets/{dataset_id}/clean")
+async def dataset_clean(
+    dataset_id: str,
+    plan: Optional[List[dict]] = Body(None),
+    chunk_rows: int = Body(PIPELINE_CHUNK_ROWS, ge=1),
+):
+    """
+    Applies a cleaning plan (default: GET /datasets/{id}/cleaning-plan) to the whole dataset,
+    `chunk_rows` rows at a time, and stores the result as an Arrow file (GET
+    /datasets/{id}/cleaned). Returns rows and bytes in and out and, per stage and per step,
+    the time taken, rows in and out and the values changed.
+    """
+    entry = await run_in_threadpool(_dataset, dataset_id)
+    if entry.get("report_status") == "pending":
+        raise HTTPException(status_code=409, detail="Datasets are cleaned once the exact report is ready.")
+    result = await run_in_threadpool(_clean, entry, plan, chunk_rows)
+    result["output"] = f"/datasets/{dataset_id}/cleaned"
+    return result
+
+@app.get("/datasets/{dataset_id}/cleaned")
+def dataset_cleaned(dataset_id: str):
+    """
+    The dataset as last cleaned by POST /datasets/{id}/clean, as an Arrow IPC file.
+    """
+    _check_dataset_id(dataset_id)
+    path = cleaned_path(dataset_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' was not cleaned yet.")
+    return FileResponse(path, media_type="application/vnd.apache.arrow.file", filename=f"{dataset_id}.cleaned.arrow")
+
+@app.get("/datasets/stats")
+def dataset_cache_stats():
+    return dataset_store.stats()
+
+@app.get("/llm/cache/stats")
+def llm_cache_stats():
+    return response_cache.stats()
+
+@app.get("/chat/stats")
+def chat_session_stats():
+    return chat_sessions.stats()
+
+@app.get("/metrics")
+def metrics():
+    """
+    Request, parsing, detection, prompt building and LLM metrics, with the components' cache
+    counters, in the Prometheus text format.
+    """
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 # Hugging Face-powered cleaning suggestions
 @app.post("/suggest-cleaning")
 async def suggest_cleaning(
-    issues: dict = Body(...),
-    columns: list = Body(...)
+    issues: Optional[dict] = Body(None),
+    columns: Optional[list] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
 ):
-    suggestions_md = get_cleaning_suggestions_hf(issues, columns)
-    return {"suggestions": suggestions_md}
+    issues, columns, prompt_stats = _cleaning_context(await run_in_threadpool(_dataset, dataset_id), issues, columns)
+    suggestions_md = await get_cleaning_suggestions_hf(issues, columns, use_cache=use_cache)
+    return {"suggestions": suggestions_md, "prompt_stats": prompt_stats}
+
+@app.post("/suggest-cleaning/stream")
+async def suggest_cleaning_stream(
+    issues: Optional[dict] = Body(None),
+    columns: Optional[list] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
+):
+    """
+    Same as /suggest-cleaning, streamed as Server-Sent Events.
+    """
+    issues, columns, prompt_stats = _cleaning_context(await run_in_threadpool(_dataset, dataset_id), issues, columns)
+    return _sse(stream_cleaning_suggestions_hf(issues, columns, use_cache=use_cache), prompt_stats=prompt_stats)
 
 @app.post("/generate-story")
 async def generate_story(
-    df_head: str = Body(...),
-    df_describe: str = Body(...),
-    columns: list = Body(...)
+    df_head: Optional[str] = Body(None),
+    df_describe: Optional[str] = Body(None),
+    columns: Optional[list] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
+):
+    """
+    Receives dataframe summaries (or a dataset_id) and generates a data story.
+    """
+    # describe() over a whole dataset is too slow for the event loop
+    df_head, df_describe, columns, prompt_stats = await run_in_threadpool(
+        _story_context, await run_in_threadpool(_dataset, dataset_id), df_head, df_describe, columns)
+    story = await get_data_story_hf(df_head, df_describe, columns, use_cache=use_cache)
+    return {"story": story, "prompt_stats": prompt_stats}
+
+@app.post("/generate-story/stream")
+async def generate_story_stream(
+    df_head: Optional[str] = Body(None),
+    df_describe: Optional[str] = Body(None),
+    columns: Optional[list] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
 ):
     """
-    Receives dataframe summaries and generates a data story.
+    Same as /generate-story, streamed as Server-Sent Events.
     """
-    story = get_data_story_hf(df_head, df_describe, columns)
-    return {"story": story}
+    df_head, df_describe, columns, prompt_stats = await run_in_threadpool(
+        _story_context, await run_in_threadpool(_dataset, dataset_id), df_head, df_describe, columns)
+    return _sse(stream_data_story_hf(df_head, df_describe, columns, use_cache=use_cache), prompt_stats=prompt_stats)
 
 @app.post("/suggest-visualization")
 async def suggest_visualization(
-    columns: list = Body(...),
-    df_head: str = Body(...)
+    columns: Optional[list] = Body(None),
+    df_head: Optional[str] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
 ):
     """
-    Receives dataframe info and generates a visualization suggestion.
+    Receives dataframe info (or a dataset_id) and generates a visualization suggestion.
+    The returned `code_id` is what /render-visualization takes.
     """
-    code = get_visualization_suggestion_hf(columns, df_head)
-    return {"visualization_code": code}
+    # A dataset not in memory is loaded from disk, off the event loop
+    entry = await run_in_threadpool(_dataset, dataset_id)
+    columns, df_head, prompt_stats = await run_in_threadpool(_columns_and_head_context, "visualization", entry, columns, df_head)
+    code = await get_visualization_suggestion_hf(columns, df_head, use_cache=use_cache)
+    return {"visualization_code": code, "code_id": plot_code_store.put(code), "prompt_stats": prompt_stats}
+
+@app.post("/render-visualization")
+async def render_visualization(
+    code_id: str = Body(...),
+    dataset_id: str = Body(...),
+    format: str = Body("png"),
+    dpi: int = Body(100)
+):
+    """
+    Runs plot code generated by /suggest-visualization (by its `code_id`; code from the
+    request is never run) against the dataset as `df` in a sandboxed render worker and
+    returns the image. X-Render-Cache tells whether it was cached.
+    """
+    entry = await run_in_threadpool(_dataset, dataset_id)
+    if format not in FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unsupported format '{format}'. Use one of: {', '.join(FORMATS)}")
+    if not DPI_RANGE[0] <= dpi <= DPI_RANGE[1]:
+        raise HTTPException(status_code=422, detail=f"dpi must be between {DPI_RANGE[0]} and {DPI_RANGE[1]}")
+    code = plot_code_store.get(code_id)
+    if code is None:
+        raise HTTPException(status_code=404, detail=f"Unknown code_id '{code_id}'. Get one from /suggest-visualization.")
+    frame = await run_in_threadpool(_render_frame, dataset_id, entry)
+    try:
+        image, cached = await run_in_threadpool(render_pool.render, code, dataset_id, frame, format, dpi)
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except RenderError as e:
+        raise HTTPException(status_code=422, detail=f"Could not render the visualization: {e}")
+    return Response(content=image, media_type=FORMATS[format], headers={"X-Render-Cache": "hit" if cached else "miss"})
+
+@app.get("/render/stats")
+def render_stats():
+    return {**render_pool.stats(), "plot_code": plot_code_store.stats()}
 
 @app.post("/chat")
 async def chat(
     message: str = Body(...),
-    history: list = Body(...),
-    columns: list = Body(...),
-    df_head: str = Body(...)
+    history: Optional[list] = Body(None),
+    columns: Optional[list] = Body(None),
+    df_head: Optional[str] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    session_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
 ):
     """
-    Handles chatbot conversation.
+    Handles chatbot conversation. The conversation is kept server-side under `session_id`
+    (returned, and created when missing); `history` only seeds a new session.
+    Statistical questions about a stored dataset are answered from its profile without the
+    LLM (`fast_path` is true).
     """
-    response = get_chat_response_hf(message, history, columns, df_head)
-    return {"response": response}
+    session = await run_in_threadpool(_chat_session, session_id, dataset_id, columns, df_head, history)
+    context = session["context"]
+    answer, profile = await _chat_fast_path(dataset_id, message)
+    if answer is not None:
+        _record_turn(session, message, answer)
+        return {"response": answer, "session_id": session["session_id"], "prompt_stats": context["prompt_stats"], "fast_path": True}
+    response = await get_chat_response_hf(message, chat_sessions.window(session), context["columns"], context["head"],
+                                          use_cache=use_cache, summary=session["summary"], profile=profile)
+    _record_turn(session, message, response)
+    return {"response": response, "session_id": session["session_id"], "prompt_stats": context["prompt_stats"], "fast_path": False}
 
+@app.post("/chat/stream")
+async def chat_stream(
+    message: str = Body(...),
+    history: Optional[list] = Body(None),
+    columns: Optional[list] = Body(None),
+    df_head: Optional[str] = Body(None),
+    dataset_id: Optional[str] = Body(None),
+    session_id: Optional[str] = Body(None),
+    use_cache: bool = Body(True)
+):
+    """
+    Same as /chat, streamed as Server-Sent Events; the session id comes first as `event: session`.
+    """
+    session = await run_in_threadpool(_chat_session, session_id, dataset_id, columns, df_head, history)
+    context = session["context"]
+    answer, profile = await _chat_fast_path(dataset_id, message)
+    if answer is not None:
+        deltas = _single(answer)
+    else:
+        deltas = stream_chat_response_hf(message, chat_sessions.window(session), context["columns"], context["head"],
+                                         use_cache=use_cache, summary=session["summary"], profile=profile)
+    return _sse(_recorded(session, message, deltas), session={"session_id": session["session_id"]},
+                prompt_stats=context["prompt_stats"])
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class Prefetcher:
+    """
+    Speculative AI artifacts for freshly analyzed datasets. start() runs one asyncio task per
+    artifact (e.g. cleaning suggestions, story, visualization) concurrently on the event
+    loop, so all of them are ready about as soon as the slowest one. collect() reports
+    whichever are done. Results of the `max_datasets` most recent datasets are kept; the
+    tasks of an evicted dataset run to completion (interactive requests may have joined
+    their LLM calls) but their results are dropped.
+    """
+
+    def __init__(self, max_datasets: int = 64):
+        self.max_datasets = max_datasets
+        self._datasets: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        # Tasks of evicted datasets still running; the loop only keeps weak references to tasks
+        self._detached = set()
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def _run(self, state: Dict[str, Any], produce: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        start = time.perf_counter()
+        try:
+            state["result"] = await produce()
+            state["status"] = "ready"
+            self.completed += 1
+        except asyncio.CancelledError:
+            state["status"] = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Prefetching {state['name']} failed: {e}")
+            state["status"] = "failed"
+            state["error"] = str(e) or type(e).__name__
+            self.failed += 1
+        finally:
+            state["seconds"] = round(time.perf_counter() - start, 3)
+
+    def start(self, dataset_id: str, producers: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]]) -> List[str]:
+        """
+        Starts producing each artifact of `producers` (name -> coroutine function) for the
+        dataset, unless it is already pending or ready. Returns the artifact names.
+        """
+        artifacts = self._datasets.setdefault(dataset_id, {})
+        self._datasets.move_to_end(dataset_id)
+        loop = asyncio.get_running_loop()
+        for name, produce in producers.items():
+            if name in artifacts and artifacts[name]["status"] in ("pending", "ready"):
+                continue
+            state = {"name": name, "status": "pending"}
+            state["task"] = loop.create_task(self._run(state, produce))
+            artifacts[name] = state
+            self.started += 1
+        while len(self._datasets) > self.max_datasets:
+            _, evicted = self._datasets.popitem(last=False)
+            for state in evicted.values():
+                if not state["task"].done():
+                    self._detached.add(state["task"])
+                    state["task"].add_done_callback(self._detached.discard)
+        return list(artifacts)
+
+    async def collect(self, dataset_id: str, wait: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        Status of each artifact of the dataset, with the result of those that are ready. With
+        `wait` (seconds), first waits until one more pending artifact finishes, or the time is up.
+        None when nothing was prefetched for the dataset.
+        """
+        artifacts = self._datasets.get(dataset_id)
+        if artifacts is None:
+            return None
+        pending = [state["task"] for state in artifacts.values() if state["status"] == "pending"]
+        if pending and wait > 0:
+            await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+        report = {}
+        for name, state in artifacts.items():
+            report[name] = {key: value for key, value in state.items() if key not in ("name", "task")}
+        return {"dataset_id": dataset_id, "complete": all(s["status"] != "pending" for s in report.values()),
+                "artifacts": report}
+
+    async def shutdown(self) -> None:
+        tasks = [state["task"] for artifacts in self._datasets.values() for state in artifacts.values()]
+        tasks += self._detached
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._datasets.clear()
+        self._detached.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        pending = sum(state["status"] == "pending" for artifacts in self._datasets.values() for state in artifacts.values())
+        return {
+            "datasets": len(self._datasets),
+            "pending": pending,
+            "detached": len(self._detached),
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+prefetcher = Prefetcher(max_datasets=int(os.environ.get("PREFETCH_MAX_DATASETS", 64)))
@@ -0,0 +1,119 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from src.storage.ingest import UploadStager
+
+# Request body bytes handed to the parser (and so written to disk) at a time
+_BLOCK_BYTES = 1 << 20
+# Form fields other than the file are kept in memory
+_MAX_FIELD_BYTES = 64 << 10
+
+
+class _FormReader:
+    """
+    Callbacks for MultipartParser: the `file_field` part goes to an UploadStager, the other
+    parts are collected as strings.
+    """
+
+    def __init__(self, file_field: str, directory: Optional[str]):
+        self.file_field = file_field
+        self.directory = directory
+        self.fields: Dict[str, List[str]] = {}
+        self.stager: Optional[UploadStager] = None
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._name: Optional[str] = None
+        self._value = b""
+        self._is_file = False
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._value = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._is_file = self._name == self.file_field
+        if self._is_file:
+            if self.stager is not None:
+                raise HTTPException(status_code=422, detail=f"Send a single '{self.file_field}'.")
+            filename = options.get(b"filename")
+            self.stager = UploadStager(filename.decode("utf-8", "replace") if filename else None, self.directory)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.stager.write(data[start:end])
+            return
+        self._value += data[start:end]
+        if len(self._value) > _MAX_FIELD_BYTES:
+            raise HTTPException(status_code=422, detail=f"Form field '{self._name}' is too large.")
+
+    def on_part_end(self) -> None:
+        if not self._is_file:
+            self.fields.setdefault(self._name, []).append(self._value.decode("utf-8", "replace"))
+
+
+async def read_upload_form(request: Request, file_field: str = "file",
+                           directory: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+    """
+    Reads a multipart/form-data request body as it arrives. The `file_field` part is staged on
+    disk by UploadStager in the same pass, instead of being spooled by the framework first.
+    Returns the staged file (see src.storage.ingest.stage_upload; the caller removes it) and
+    the other fields, each as a list of strings. Raises HTTPException(422) for a body that is
+    not a form or has no `file_field`.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=422, detail="Send the upload as multipart/form-data.")
+    reader = _FormReader(file_field, directory)
+    parser = MultipartParser(boundary, reader.callbacks())
+    try:
+        # Parsing and the file writes run in the threadpool, a block at a time
+        buffered = bytearray()
+        async for chunk in request.stream():
+            buffered += chunk
+            if len(buffered) >= _BLOCK_BYTES:
+                await run_in_threadpool(parser.write, bytes(buffered))
+                buffered.clear()
+        if buffered:
+            await run_in_threadpool(parser.write, bytes(buffered))
+        parser.finalize()
+        if reader.stager is None:
+            raise HTTPException(status_code=422, detail=f"Form field '{file_field}' is required.")
+        staged = await run_in_threadpool(reader.stager.finish)
+    except MultipartParseError as e:
+        if reader.stager is not None:
+            reader.stager.abort()
+        raise HTTPException(status_code=422, detail=f"Malformed form data: {e}")
+    except BaseException:
+        if reader.stager is not None:
+            reader.stager.abort()
+        raise
+    return staged, reader.fields
@@ -1,82 +1,253 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from pandas.api.types import infer_dtype
+from typing import Dict, Any, List, Optional
 
-def analyze_issues(df: pd.DataFrame) -> Dict[str, Any]:
+from src.cleaning.duplicates import count_duplicates
+from src.cleaning.outliers import iqr_outlier_counts
+from src.cleaning.type_inference import TypeInferenceEngine
+
+# numpy dtype kinds whose cells always map to a single Python type
+_HOMOGENEOUS_KINDS = "iufcb"
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start)
+
+
+def is_string_category(dtype) -> bool:
+    # Categoricals of strings (e.g. compacted on ingestion, see src.storage.ingest) encode an
+    # object column of strings, and are checked like one
+    return isinstance(dtype, pd.CategoricalDtype) and infer_dtype(dtype.categories, skipna=True) == 'string'
+
+
+def object_columns(df: pd.DataFrame) -> List[Any]:
+    return [col for col, dtype in df.dtypes.items() if dtype == object or is_string_category(dtype)]
+
+
+def _type_counts(series: pd.Series, engine: TypeInferenceEngine, null_mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+    if series.dtype == object:
+        counts = engine.type_counter(series.to_numpy(), null_mask)
+    elif is_string_category(series.dtype):
+        # Codes tell strings (-1 is missing, read back as NaN) apart without boxing a cell
+        codes = series.cat.codes.to_numpy()
+        missing = int((codes < 0).sum())
+        order = [(float, missing), (str, len(codes) - missing)]
+        counts = Counter({t: n for t, n in (order if len(codes) and codes[0] < 0 else order[::-1]) if n})
+    else:
+        # Counter over the raw values is a C-level loop, unlike Series.map(type)
+        counts = Counter(map(type, series))
+    return {str(k): int(v) for k, v in counts.most_common()}
+
+
+def _dtype_kind(dtype) -> str:
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'O' if is_string_category(dtype) else 'category'
+    return dtype.kind
+
+
+def compute_column_stats(df: pd.DataFrame, timings: Optional[Dict[str, float]] = None,
+                         engine: Optional[TypeInferenceEngine] = None) -> Dict[str, Any]:
+    """
+    Computes every per-column statistic the issue checks need in as few passes as possible.
+    Each statistic is a dict keyed by column name so partial results can be merged.
+    """
+    timings = {} if timings is None else timings
+    engine = TypeInferenceEngine() if engine is None else engine
+    n_rows = len(df)
+    object_cols = object_columns(df)
+    categorical_cols = list(df.select_dtypes(include=['object', 'category']).columns)
+    numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
+    categorical_set = set(categorical_cols)
+
+    stats = {
+        'n_rows': n_rows,
+        'columns': list(df.columns),
+        'object_columns': object_cols,
+        'categorical_columns': categorical_cols,
+        'numeric_columns': numeric_cols,
+    }
+
+    # Null masks: one pass over the frame
+    with _timed(timings, 'null_counts'):
+        is_null = df.isnull()
+        null_count = {col: int(v) for col, v in is_null.sum().items()}
+        # Object columns' masks are reused by the type checks below
+        null_masks = {col: is_null[col].to_numpy() for col in object_cols}
+        del is_null
+    stats['null_count'] = null_count
+
+    # Value counts for object/category columns give nunique and the top frequency together
+    nunique, top_freq, uniques = {}, {}, {}
+    with _timed(timings, 'value_counts'):
+        for col in categorical_cols:
+            vc = df[col].value_counts(dropna=True, sort=False)
+            vc = vc[vc > 0]  # unused categories
+            nunique[col] = int(len(vc))
+            total = vc.sum()
+            top_freq[col] = float(vc.max() / total) if total > 0 else 0.0
+            # Distinct non-null values in order of first appearance
+            uniques[col] = vc.index
+
+    with _timed(timings, 'nunique'):
+        for col in df.columns:
+            if col not in categorical_set:
+                nunique[col] = int(df[col].nunique())
+    stats['nunique'] = nunique
+    stats['top_freq'] = top_freq
+
+    # nunique(dropna=False) counts each kind of null (None, NaN, NaT) as its own value
+    nunique_all = {}
+    for col in df.columns:
+        nulls = null_count[col]
+        if nulls == 0:
+            nunique_all[col] = nunique[col]
+        elif df[col].dtype == object:
+            null_values = df[col].to_numpy()[null_masks[col]]
+            nunique_all[col] = nunique[col] + len(set(map(type, null_values)))
+        else:
+            nunique_all[col] = nunique[col] + 1
+    stats['nunique_all'] = nunique_all
+
+    # dtype-class histograms; numpy numeric/bool columns hold a single Python type by construction
+    with _timed(timings, 'type_histograms'):
+        type_counts = {}
+        for col in df.columns:
+            if df[col].dtype.kind in _HOMOGENEOUS_KINDS and isinstance(df[col].dtype, np.dtype):
+                continue
+            type_counts[col] = _type_counts(df[col], engine, null_masks.get(col))
+    stats['type_counts'] = type_counts
+
+    # IQR outliers: the quartiles of a block of columns from one sort
+    with _timed(timings, 'outliers'):
+        outliers = iqr_outlier_counts(df, numeric_cols)
+    stats['outliers'] = outliers
+
+    with _timed(timings, 'all_zero_columns'):
+        all_zero = {}
+        for col in df.columns:
+            if n_rows == 0:
+                all_zero[col] = True
+            elif col in categorical_set:
+                # Equal values share a hash bucket, so a single non-null key decides it
+                all_zero[col] = bool(null_count[col] == 0 and nunique[col] == 1 and uniques[col][0] == 0)
+            else:
+                all_zero[col] = bool((df[col] == 0).all())
+    stats['all_zero'] = all_zero
+
+    # Parsing the distinct values is equivalent to parsing the column: the first non-null
+    # value (used for format inference) and the set of values are unchanged
+    with _timed(timings, 'potential_datetime_parse_issues'):
+        datetime_unparseable = {}
+        for col in object_cols:
+            datetime_unparseable[col] = engine.datetime_unparseable(col, uniques[col].to_numpy())
+    stats['datetime_unparseable'] = datetime_unparseable
+
+    with _timed(timings, 'inferred_types'):
+        inferred_types = {}
+        for col in df.columns:
+            inferred_types[col] = engine.infer_type(
+                col, _dtype_kind(df[col].dtype), n_rows, null_count[col], nunique[col],
+                uniques=uniques[col].to_numpy() if col in uniques else None,
+                datetime_unparseable=datetime_unparseable.get(col),
+            )
+    stats['inferred_types'] = inferred_types
+
+    return stats
+
+
+def issues_from_stats(stats: Dict[str, Any], duplicate_rows: int) -> Dict[str, Any]:
+    """
+    Derives the issues report from precomputed column statistics.
+    """
+    n_rows = stats['n_rows']
+    columns = stats['columns']
+    object_cols = stats['object_columns']
+    nunique = stats['nunique']
     issues = {}
     # Missing values
-    missing = df.isnull().sum()
-    issues['missing_values'] = missing[missing > 0].to_dict()
+    issues['missing_values'] = {col: n for col, n in stats['null_count'].items() if n > 0}
     # Duplicates
-    issues['duplicate_rows'] = int(df.duplicated().sum())
+    issues['duplicate_rows'] = int(duplicate_rows)
     # Data type inconsistencies
-    type_issues = {}
-    for col in df.columns:
-        types = df[col].map(type).value_counts()
-        if len(types) > 1:
-            type_issues[col] = {str(k): int(v) for k, v in types.items()}
-    issues['type_inconsistencies'] = type_issues
+    issues['type_inconsistencies'] = {col: counts for col, counts in stats['type_counts'].items() if len(counts) > 1}
     # Outliers (using IQR for numeric columns)
-    outliers = {}
-    for col in df.select_dtypes(include=[np.number]).columns:
-        q1 = df[col].quantile(0.25)
-        q3 = df[col].quantile(0.75)
-        iqr = q3 - q1
-        lower = q1 - 1.5 * iqr
-        upper = q3 + 1.5 * iqr
-        outlier_count = ((df[col] < lower) | (df[col] > upper)).sum()
-        if outlier_count > 0:
-            outliers[col] = int(outlier_count)
-    issues['outliers'] = outliers
+    issues['outliers'] = {col: n for col, n in stats['outliers'].items() if n > 0}
 
     # Constant columns (zero variance)
-    constant_cols = [col for col in df.columns if df[col].nunique(dropna=False) == 1]
-    issues['constant_columns'] = constant_cols
+    issues['constant_columns'] = [col for col in columns if stats['nunique_all'][col] == 1]
 
     # High cardinality columns (arbitrary threshold: >50 unique values or >20% of rows)
-    high_cardinality = [col for col in df.columns if df[col].nunique() > max(50, 0.2*len(df))]
-    issues['high_cardinality_columns'] = high_cardinality
+    issues['high_cardinality_columns'] = [col for col in columns if nunique[col] > max(50, 0.2 * n_rows)]
 
     # Columns with a single unique value
-    single_unique = [col for col in df.columns if df[col].nunique() == 1]
-    issues['single_unique_columns'] = single_unique
+    issues['single_unique_columns'] = [col for col in columns if nunique[col] == 1]
 
     # Columns with mixed data types (object columns)
-    mixed_types = {}
-    for col in df.select_dtypes(include=['object']).columns:
-        types = df[col].map(type).value_counts()
-        if len(types) > 1:
-            mixed_types[col] = {str(k): int(v) for k, v in types.items()}
-    issues['mixed_type_object_columns'] = mixed_types
+    issues['mixed_type_object_columns'] = {
+        col: issues['type_inconsistencies'][col] for col in object_cols if col in issues['type_inconsistencies']
+    }
 
     # Columns with high percentage of missing values (>50%)
-    high_missing = [col for col in df.columns if (df[col].isnull().mean() > 0.5)]
-    issues['high_missing_pct_columns'] = high_missing
+    issues['high_missing_pct_columns'] = [
+        col for col in columns if n_rows > 0 and stats['null_count'][col] / n_rows > 0.5
+    ]
 
     # Highly imbalanced categorical columns (top value >95% of non-null values)
-    imbalanced = {}
-    for col in df.select_dtypes(include=['object', 'category']).columns:
-        top_freq = df[col].value_counts(normalize=True, dropna=True).max() if not df[col].dropna().empty else 0
-        if top_freq > 0.95:
-            imbalanced[col] = float(top_freq)
-    issues['highly_imbalanced_categoricals'] = imbalanced
+    issues['highly_imbalanced_categoricals'] = {
+        col: freq for col, freq in stats['top_freq'].items() if freq > 0.95
+    }
 
     # Columns with all zeros
-    all_zeros = [col for col in df.columns if (df[col] == 0).all()]
-    issues['all_zero_columns'] = all_zeros
+    issues['all_zero_columns'] = [col for col in columns if stats['all_zero'][col]]
 
     # Columns with all same string
-    all_same_str = [col for col in df.select_dtypes(include=['object']).columns if df[col].nunique() == 1]
-    issues['all_same_string_columns'] = all_same_str
+    issues['all_same_string_columns'] = [col for col in object_cols if nunique[col] == 1]
 
     # Columns with potential date/time parsing issues
-    date_parse_issues = []
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            try:
-                pd.to_datetime(df[col], errors='raise')
-            except Exception:
-                date_parse_issues.append(col)
-    issues['potential_datetime_parse_issues'] = date_parse_issues
+    issues['potential_datetime_parse_issues'] = [
+        col for col in object_cols if stats['datetime_unparseable'][col]
+    ]
+
+    # Semantic type of every column (context for the cleaning and story prompts, not an issue)
+    issues['inferred_types'] = stats['inferred_types']
+
+    return issues
+
+
+def column_stats(df: pd.DataFrame, timings: Optional[Dict[str, float]] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    compute_column_stats(), with the columns of large frames spread over `workers` processes
+    (default DETECTOR_WORKERS); small frames, or workers=1, run serially.
+    """
+    from src.cleaning.parallel import parallel_column_stats, resolve_workers, use_parallel
+
+    timings = {} if timings is None else timings
+    workers = resolve_workers(workers)
+    stats = parallel_column_stats(df, workers, timings) if use_parallel(df, workers) else None
+    return compute_column_stats(df, timings) if stats is None else stats
+
 
+def analyze_issues(df: pd.DataFrame, return_timings: bool = False, workers: Optional[int] = None):
+    """
+    Builds the data-issues report. Shared column statistics are computed once and every
+    check is derived from them. With return_timings=True, returns (issues, timings) where
+    timings maps each statistic/check to seconds spent (summed over workers).
+    """
+    timings = {}
+    stats = column_stats(df, timings, workers)
+    with _timed(timings, 'duplicate_rows'):
+        duplicate_rows = count_duplicates(df)
+    with _timed(timings, 'derive_issues'):
+        issues = issues_from_stats(stats, duplicate_rows)
+    if return_timings:
+        return issues, timings
     return issues
@@ -0,0 +1,405 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from src.cleaning.sketches import BloomFilter, hash_values
+
+_U64 = np.uint64
+_GOLDEN = _U64(0x9E3779B97F4A7C15)
+# Two independent row hashes: groups are formed on the first and checked with the second
+_SEEDS = (_U64(0x243F6A8885A308D3), _U64(0x13198A2E03707344))
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+# Trailing dates/times ("... 2024-05-01 10:22:03", "... 10:22", "... 2024/05/01T10:22Z") are
+# dropped when comparing records for near-duplicates, as are case and runs of whitespace
+_TRAILING_TIMESTAMP = (r"(?:[\s,;@_-]*\d{4}[-/]\d{1,2}[-/]\d{1,2}(?:[ t]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?"
+                       r"|[\s,;@_-]*\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)(?:\s*(?:z|utc|[+-]\d{2}:?\d{2}))?\s*$")
+
+
+def _mix(z: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer; numpy wraps uint64 arithmetic
+    z = (z ^ (z >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return z ^ (z >> _U64(31))
+
+
+def row_hashes(df: pd.DataFrame, columns: Optional[List[Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Two independent 64-bit hashes of each row, built one column at a time from factorized
+    codes, so rows df.duplicated() treats as equal (None/NaN alike, 0.0 == -0.0) hash alike
+    and memory stays at a few arrays of the row count however wide the frame is. Codes are
+    local to the frame: compare hashes across chunks with chunk_row_hashes() instead.
+    """
+    n = len(df)
+    h1 = np.full(n, _SEEDS[0], dtype=_U64)
+    h2 = np.full(n, _SEEDS[1], dtype=_U64)
+    with np.errstate(over="ignore"):
+        for col in columns if columns is not None else df.columns:
+            codes = pd.factorize(df[col])[0].astype(np.int64).view(_U64) + _U64(1)
+            h1 = _mix(h1 * _GOLDEN + codes)
+            h2 = _mix((h2 ^ codes) * _GOLDEN)
+    return h1, h2
+
+
+def chunk_row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    64-bit hashes of each row from its values, comparable across chunks of one file: int and
+    float chunks of a column hash alike, as do 0.0 and -0.0.
+    """
+    normalized = chunk.copy(deep=False)
+    for col in chunk.columns:
+        if chunk[col].dtype.kind in "iuf":
+            normalized[col] = chunk[col].astype(np.float64) + 0.0
+    return hash_values(normalized)
+
+
+def _groups(hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group code of each row (in order of first appearance), group sizes, and the first row of
+    each group. Hash-table factorization keeps this linear in the row count.
+    """
+    codes, uniques = pd.factorize(hashes)
+    counts = np.bincount(codes, minlength=len(uniques))
+    # Codes are handed out in order of first appearance, so a group starts where its code
+    # first exceeds every code before it
+    running = np.maximum.accumulate(codes)
+    starts = np.ones(len(codes), dtype=bool)
+    starts[1:] = running[1:] > running[:-1]
+    return codes, counts, np.flatnonzero(starts)
+
+
+def _exact_groups(df: pd.DataFrame, columns: Optional[List[Any]] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # None when two different rows share a first hash, which the second hash gives away
+    h1, h2 = row_hashes(df, columns)
+    codes, counts, firsts = _groups(h1)
+    if (h2 != h2[firsts][codes]).any():
+        return None
+    return codes, counts, firsts
+
+
+def count_duplicates(df: pd.DataFrame) -> int:
+    """
+    Rows equal to an earlier row, as df.duplicated().sum() counts them.
+    """
+    if df.empty:
+        return 0
+    groups = _exact_groups(df)
+    if groups is None:
+        # A 64-bit collision: practically never, but the count stays exact
+        return int(df.duplicated().sum())
+    return len(df) - len(groups[2])
+
+
+def _top_clusters(codes: np.ndarray, counts: np.ndarray, max_clusters: int, sample_rows: int,
+                  index: pd.Index) -> List[Dict[str, Any]]:
+    """
+    The largest groups with more than one row: size and the first `sample_rows` row positions
+    (and index labels) of each.
+    """
+    multi = np.flatnonzero(counts > 1)
+    if not len(multi) or max_clusters <= 0:
+        return []
+    k = min(max_clusters, len(multi))
+    top = multi[np.argpartition(-counts[multi], k - 1)[:k]]
+    top = top[np.lexsort((top, -counts[top]))]
+    rank = np.full(len(counts), -1)
+    rank[top] = np.arange(k)
+    # Rows of the reported groups, grouped and in row order within each group
+    rows = np.flatnonzero(rank[codes] >= 0)
+    rows = rows[np.argsort(rank[codes[rows]], kind="stable")]
+    bounds = np.searchsorted(rank[codes[rows]], np.arange(k + 1))
+    clusters = []
+    for i, code in enumerate(top):
+        sample = rows[bounds[i]:min(bounds[i] + sample_rows, bounds[i + 1])]
+        clusters.append({"size": int(counts[code]), "rows": sample.tolist(),
+                         "index": [_label(v) for v in index[sample]]})
+    return clusters
+
+
+def _label(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value if isinstance(value, (int, float, str)) else str(value)
+
+
+def exact_duplicates(df: pd.DataFrame, columns: Optional[List[Any]] = None, max_clusters: int = 20,
+                     sample_rows: int = 5) -> Dict[str, Any]:
+    """
+    Exact duplicate rows (on `columns`, default all): the count of rows repeating an earlier
+    one, the number of clusters of identical rows and the largest clusters with sample rows.
+    """
+    if df.empty:
+        return {"duplicate_rows": 0, "clusters": 0, "top_clusters": []}
+    groups = _exact_groups(df, columns)
+    if groups is None:
+        codes = df.groupby(list(columns if columns is not None else df.columns), dropna=False, sort=False, observed=True).ngroup().to_numpy()
+        counts = np.bincount(codes)
+    else:
+        codes, counts, _ = groups
+    return {
+        "duplicate_rows": int(len(df) - len(counts)),
+        "clusters": int((counts > 1).sum()),
+        "top_clusters": _top_clusters(codes, counts, max_clusters, sample_rows, df.index),
+    }
+
+
+def normalized_records(df: pd.DataFrame, columns: Optional[List[Any]] = None) -> pa.Array:
+    """
+    Each row's `columns` as one lower-cased string with whitespace collapsed and trailing
+    timestamps removed from every value; missing values are empty.
+    """
+    parts = []
+    for col in columns if columns is not None else df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        values = pa.array(series.astype(str).where(series.notna(), "") if series.dtype == object else series,
+                          from_pandas=True)
+        values = pc.fill_null(pc.cast(values, pa.string()), "")
+        values = pc.utf8_lower(values)
+        values = pc.replace_substring_regex(values, pattern=_TRAILING_TIMESTAMP, replacement="")
+        values = pc.utf8_trim_whitespace(pc.replace_substring_regex(values, pattern=r"\s+", replacement=" "))
+        parts.append(values)
+    if not parts:
+        return pa.array([""] * len(df), pa.string())
+    # A unit separator keeps "a b" + "c" apart from "a" + "b c"
+    return pc.binary_join_element_wise(*parts, "\x1f")
+
+
+def _densify(signatures: np.ndarray) -> np.ndarray:
+    # Each empty bin takes the next non-empty bin's value to the right (wrapping around),
+    # offset by the distance travelled
+    num_perm = signatures.shape[1]
+    empty = signatures == _EMPTY
+    if not empty.any():
+        return signatures
+    doubled = np.concatenate([signatures, signatures], axis=1)
+    # Bin positions fit in int16, which keeps the n x 2*num_perm scratch arrays small
+    positions = np.arange(2 * num_perm, dtype=np.int16)
+    index = np.where(np.concatenate([~empty, ~empty], axis=1), positions, np.int16(2 * num_perm))
+    nxt = np.minimum.accumulate(index[:, ::-1], axis=1)[:, ::-1][:, :num_perm]
+    found = nxt < 2 * num_perm
+    borrowed = np.take_along_axis(doubled, np.minimum(nxt, 2 * num_perm - 1), axis=1).astype(_U64)
+    distance = (nxt - positions[:num_perm]).astype(_U64)
+    dense = ((borrowed + distance * _U64(0x9E3779B1)) & _U64(0xFFFFFFFF)).astype(np.uint32)
+    return np.where(empty & found, dense, signatures)
+
+
+def minhash_signatures(records: pa.Array, num_perm: int = 64, shingle: int = 3, seed: int = 1,
+                       block_bytes: int = 4 << 20) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One-permutation MinHash signatures (rows x `num_perm`, uint32) of the `shingle`-byte
+    shingles of each string: every shingle is hashed once and lands in one of `num_perm`
+    bins, whose minimum is kept; empty bins borrow from the next non-empty one (circular
+    densification), so signatures of similar sets agree in about Jaccard-many positions.
+    Also returns which bins were filled before densification, for similarity estimates that
+    stay unbiased on short strings. Cost is one hash per input byte; records are processed
+    about `block_bytes` at a time. `num_perm` must be a power of two.
+    """
+    records = records.combine_chunks() if isinstance(records, pa.ChunkedArray) else records
+    n = len(records)
+    offsets = np.frombuffer(records.buffers()[1], dtype=np.int32, count=n + 1, offset=records.offset * 4).astype(np.int64)
+    data = np.frombuffer(records.buffers()[2], dtype=np.uint8) if records.buffers()[2] is not None else np.zeros(0, np.uint8)
+    bits = int(num_perm).bit_length() - 1
+    signatures = np.empty((n, num_perm), dtype=np.uint32)
+    filled = np.empty((n, num_perm), dtype=bool)
+    start = 0
+    while start < n:
+        stop = max(start + 1, int(np.searchsorted(offsets, offsets[start] + block_bytes, side="right")) - 1)
+        stop = min(stop, n)
+        lengths = np.diff(offsets[start:stop + 1])
+        total = int(lengths.sum())
+        # Each record's bytes followed by shingle - 1 zero bytes, so no shingle spans two records
+        owner = np.repeat(np.arange(stop - start), lengths)
+        positions = np.arange(total) + owner * (shingle - 1)
+        padded = np.zeros(total + (stop - start) * (shingle - 1) + shingle, dtype=np.uint8)
+        padded[positions] = data[offsets[start]:offsets[start] + total]
+        grams = np.zeros(total, dtype=_U64)
+        for j in range(shingle):
+            grams |= padded[positions + j].astype(_U64) << _U64(8 * j)
+        with np.errstate(over="ignore"):
+            hashed = _mix(grams ^ (_U64(seed) * _GOLDEN))
+        bins = (hashed >> _U64(64 - bits)).astype(np.int64) if bits else np.zeros(total, dtype=np.int64)
+        block = np.full((stop - start) * num_perm, _EMPTY, dtype=np.uint32)
+        np.minimum.at(block, owner * num_perm + bins, (hashed & _U64(0xFFFFFFFF)).astype(np.uint32))
+        block = block.reshape(stop - start, num_perm)
+        filled[start:stop] = block != _EMPTY
+        signatures[start:stop] = _densify(block)
+        start = stop
+    return signatures, filled
+
+
+def lsh_components(signatures: np.ndarray, filled: np.ndarray, bands: int = 16, threshold: float = 0.8) -> np.ndarray:
+    """
+    Component label of each signature after LSH banding: signatures that agree on every value
+    of some band are candidates, and a candidate is linked to its band bucket's first member
+    when their estimated Jaccard similarity is at least `threshold`. The estimate counts
+    equal bins among those filled in either signature, since densified bins of short strings
+    agree far more often than their shingle sets do.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    sources, targets = [], []
+    # Similar records tend to share a bucket, and so a head, in many bands: a pair is only
+    # checked again when a member's head differs from the one it had in the previous band
+    last_head = np.full(n, -1, dtype=np.int64)
+    with np.errstate(over="ignore"):
+        for band in range(bands):
+            key = np.full(n, _U64(band + 1), dtype=_U64)
+            for j in range(band * rows, (band + 1) * rows):
+                key = _mix(key * _GOLDEN + signatures[:, j].astype(_U64))
+            # A band of borrowed (densified) values only repeats other bands
+            empty = ~filled[:, band * rows:(band + 1) * rows].any(axis=1)
+            key[empty] = _mix(np.flatnonzero(empty).astype(_U64) ^ _U64(0xA5A5A5A5A5A5A5A5))
+            codes, counts, firsts = _groups(key)
+            members = np.flatnonzero(counts[codes] > 1)
+            heads = firsts[codes[members]]
+            keep = (members != heads) & (last_head[members] != heads)
+            last_head[members] = heads
+            sources.append(members[keep])
+            targets.append(heads[keep])
+    u = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    v = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+    if len(u):
+        # Filled-bin masks as bits, so a pair's masks are a few bytes to combine and count
+        bits = np.packbits(filled, axis=1)
+        similar = np.empty(len(u), dtype=bool)
+        for start in range(0, len(u), 1 << 18):
+            a, b = u[start:start + (1 << 18)], v[start:start + (1 << 18)]
+            both = np.packbits(signatures[a] == signatures[b], axis=1) & bits[a] & bits[b]
+            equal = np.bitwise_count(both).sum(axis=1)
+            either = np.bitwise_count(bits[a] | bits[b]).sum(axis=1)
+            similar[start:start + len(a)] = equal >= threshold * np.maximum(either, 1)
+        u, v = u[similar], v[similar]
+    graph = coo_matrix((np.ones(len(u), dtype=np.int8), (u, v)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
+
+def near_duplicates(df: pd.DataFrame, columns: Optional[List[Any]] = None, threshold: float = 0.8,
+                    num_perm: int = 64, bands: int = 16, max_clusters: int = 20, sample_rows: int = 5) -> Dict[str, Any]:
+    """
+    Clusters of rows whose `columns` (default all) are the same after normalization (case,
+    whitespace, trailing timestamps) or similar by MinHash-estimated Jaccard similarity of
+    their shingles (at least `threshold`). Distinct normalized records are hashed once, so
+    cost grows linearly with the rows and the text length.
+    """
+    columns = list(columns if columns is not None else df.columns)
+    if df.empty:
+        return {"columns": [str(c) for c in columns], "threshold": threshold, "duplicate_rows": 0,
+                "beyond_exact": 0, "clusters": 0, "top_clusters": []}
+    records = normalized_records(df, columns)
+    record_codes, distinct = pd.factorize(records.to_numpy(zero_copy_only=False))
+    signatures, filled = minhash_signatures(pa.array(distinct, pa.string()), num_perm)
+    labels = lsh_components(signatures, filled, bands, threshold)
+    # Rows with nothing to compare are never near-duplicates of each other
+    blank = np.flatnonzero(distinct == "")
+    labels = labels[record_codes]
+    if len(blank):
+        empty_rows = record_codes == blank[0]
+        labels = np.where(empty_rows, labels.max() + 1 + np.arange(len(df)), labels)
+    codes, counts, _ = _groups(labels.astype(_U64))
+    exact = exact_duplicates(df, columns, max_clusters=0)["duplicate_rows"]
+    near = int(len(df) - len(counts))
+    return {
+        "columns": [str(c) for c in columns],
+        "threshold": threshold,
+        "duplicate_rows": near,
+        # Rows that only match another once normalized or approximately
+        "beyond_exact": near - exact,
+        "clusters": int((counts > 1).sum()),
+        "top_clusters": _top_clusters(codes, counts, max_clusters, sample_rows, df.index),
+    }
+
+
+def find_duplicates(df: pd.DataFrame, columns: Optional[List[Any]] = None, near: bool = True, threshold: float = 0.8,
+                    max_clusters: int = 20, sample_rows: int = 5) -> Dict[str, Any]:
+    """
+    Exact duplicate rows over all columns and, with `near`, near-duplicate clusters over
+    `columns` (see near_duplicates).
+    """
+    report = {"rows": len(df), "exact": exact_duplicates(df, max_clusters=max_clusters, sample_rows=sample_rows)}
+    if near:
+        report["near"] = near_duplicates(df, columns, threshold, max_clusters=max_clusters, sample_rows=sample_rows)
+    return report
+
+
+class DuplicateCounter:
+    """
+    Exact count of rows repeating an earlier row across a stream of chunks, from their 64-bit
+    value hashes (see chunk_row_hashes). Seen hashes are kept as a few sorted runs merged like
+    a binary counter, so adding n rows costs O(n log n) and membership checks stay vectorized.
+    Past `max_hashes` distinct rows the runs are folded into a Bloom filter, bounding memory;
+    counts are approximate from then on. Counters of two streams merge exactly.
+    """
+
+    def __init__(self, max_hashes: int = 1 << 25, bloom_bits: int = 1 << 27):
+        self.max_hashes = max_hashes
+        self.bloom_bits = bloom_bits
+        self.runs: List[np.ndarray] = []
+        self.bloom: Optional[BloomFilter] = None
+        self.duplicates = 0
+
+    @property
+    def exact(self) -> bool:
+        return self.bloom is None
+
+    def _seen(self, distinct: np.ndarray) -> np.ndarray:
+        if self.bloom is not None:
+            return self.bloom.add_and_check(distinct)
+        seen = np.zeros(len(distinct), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, distinct), len(run) - 1)
+            seen |= run[pos] == distinct
+        self._push(distinct[~seen])
+        return seen
+
+    def _push(self, run: np.ndarray) -> None:
+        if not len(run):
+            return
+        self.runs.append(run)
+        # Merge equal-sized neighbours so there are O(log n) runs
+        while len(self.runs) > 1 and len(self.runs[-1]) * 2 >= len(self.runs[-2]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]))
+        if sum(len(r) for r in self.runs) > self.max_hashes:
+            self.bloom = BloomFilter(num_bits=self.bloom_bits)
+            for r in self.runs:
+                self.bloom.add_and_check(r)
+            self.runs = []
+
+    def add(self, hashes: np.ndarray) -> int:
+        """
+        Adds the hashes of a chunk's rows; returns how many of them repeat an earlier row.
+        """
+        distinct = np.unique(hashes)
+        repeated = len(hashes) - len(distinct) + int(self._seen(distinct).sum())
+        self.duplicates += repeated
+        return repeated
+
+    def repeated(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Like add(), but returns which rows of the chunk repeat an earlier row (the first
+        occurrence is kept, as drop_duplicates() does).
+        """
+        distinct, first = np.unique(hashes, return_index=True)
+        mask = np.ones(len(hashes), dtype=bool)
+        mask[first[~self._seen(distinct)]] = False
+        self.duplicates += int(mask.sum())
+        return mask
+
+    def merge(self, other: "DuplicateCounter") -> None:
+        self.duplicates += other.duplicates
+        if other.bloom is not None:
+            # Rows seen by both streams cannot be recovered from a Bloom filter
+            if self.bloom is None:
+                self.bloom = BloomFilter(num_bits=self.bloom_bits)
+                for r in self.runs:
+                    self.bloom.add_and_check(r)
+                self.runs = []
+            self.bloom.merge(other.bloom)
+            return
+        for run in other.runs:
+            self.duplicates += int(self._seen(run).sum())
@@ -0,0 +1,160 @@
+import os
+import pickle
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+from src.cleaning.detector import column_stats, issues_from_stats
+from src.cleaning.duplicates import count_duplicates
+from src.cleaning.parallel import merge_column_stats
+from src.cleaning.streaming import ChunkedIssueAccumulator
+from src.storage import columnar
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(hashes: np.ndarray, offset: int) -> np.ndarray:
+    # splitmix64 of each row hash with its position, so reordering rows changes the fingerprint
+    z = hashes ^ (np.arange(offset, offset + len(hashes), dtype=np.uint64) * _GOLDEN)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def column_fingerprints(df: pd.DataFrame, offset: int = 0) -> Dict[Any, str]:
+    """
+    Content fingerprint of every column, "<rows>:<hash>:<kind>". The hash is a wrapping sum of
+    position-mixed row hashes, so the fingerprint of rows appended at `offset` can be added to
+    the existing one (see extend_fingerprints) without reading the old rows again. Object columns
+    also record infer_dtype, because hashing them goes through their string form.
+    """
+    fingerprints = {}
+    for col in df.columns:
+        values = df[col].to_numpy() if isinstance(df[col].dtype, np.dtype) else df[col].astype(object).to_numpy()
+        total = int(_mix(pd.util.hash_array(values), offset).sum(dtype=np.uint64))
+        kind = infer_dtype(values, skipna=False) if values.dtype == object else values.dtype.str
+        fingerprints[col] = f"{len(values)}:{total:016x}:{kind}"
+    return fingerprints
+
+
+def extend_fingerprints(base: Dict[Any, str], appended: Dict[Any, str]) -> Dict[Any, str]:
+    """
+    Fingerprints after appending rows: row counts and hashes add up. A kind that differs between
+    the two parts becomes "mixed", which never matches a freshly computed fingerprint, so at worst
+    the column is recomputed once more.
+    """
+    fingerprints = {}
+    for col, fp in appended.items():
+        if col not in base:
+            continue
+        rows, total, kind = base[col].split(":", 2)
+        more_rows, more_total, more_kind = fp.split(":", 2)
+        total = (int(total, 16) + int(more_total, 16)) & 0xFFFFFFFFFFFFFFFF
+        fingerprints[col] = f"{int(rows) + int(more_rows)}:{total:016x}:{kind if kind == more_kind else 'mixed'}"
+    return fingerprints
+
+
+def column_partials(stats: Dict[str, Any]) -> Dict[Any, Dict[str, Any]]:
+    """
+    The per-column part of compute_column_stats() output, keyed by column, so each column's
+    statistics can be cached and reused on their own.
+    """
+    partials = {col: {} for col in stats['columns']}
+    for key, values in stats.items():
+        if isinstance(values, dict):
+            for col, value in values.items():
+                partials[col][key] = value
+    return partials
+
+
+def analyze_incremental(df: pd.DataFrame, base_fingerprints: Optional[Dict[Any, str]] = None,
+                        base_partials: Optional[Dict[Any, Dict[str, Any]]] = None,
+                        workers: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[Any, str], List[Any]]:
+    """
+    The issues report of a (new version of a) dataset, recomputing only the columns whose
+    fingerprint differs from the base version's, or that are new; without a base every column
+    is computed, and fingerprinting (which costs about a third of the column statistics) is
+    left to the caller. Duplicate rows span every column and are always counted afresh.
+    Returns (issues, stats, fingerprints or None, recomputed columns).
+    """
+    if base_partials:
+        fingerprints = column_fingerprints(df)
+        changed = [col for col in df.columns
+                   if col not in base_partials or (base_fingerprints or {}).get(col) != fingerprints[col]]
+    else:
+        fingerprints, changed = None, list(df.columns)
+    fresh = column_stats(df[changed], workers=workers)
+    reused = {}
+    for col in df.columns:
+        if col not in changed:
+            for key, value in base_partials[col].items():
+                reused.setdefault(key, {})[col] = value
+    stats = merge_column_stats(df, [fresh, reused])
+    return issues_from_stats(stats, count_duplicates(df)), stats, fingerprints, changed
+
+
+def state_path(dataset_id: str) -> str:
+    return columnar.data_path(dataset_id, ".state.pkl")
+
+
+def save_state(dataset_id: str, acc: ChunkedIssueAccumulator) -> None:
+    """
+    Persists a dataset's mergeable accumulator so appended versions only process the new rows.
+    """
+    os.makedirs(columnar.DATA_DIR, exist_ok=True)
+    path = state_path(dataset_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(acc, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_state(dataset_id: str) -> Optional[ChunkedIssueAccumulator]:
+    try:
+        with open(state_path(dataset_id), "rb") as f:
+            acc = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    # States saved before duplicates were counted exactly are rebuilt from the stored rows
+    return acc if hasattr(acc, "duplicates") else None
+
+
+def frame_chunks(df: Optional[pd.DataFrame], dataset_id: str, chunksize: int):
+    """
+    A stored dataset in row chunks, from memory or from its columnar copy. Nulls in string
+    columns read back from Arrow become NaN again, as read_csv leaves them.
+    """
+    if df is not None:
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    table = columnar.load_table(dataset_id)
+    if table is None:
+        return
+    for batch in table.to_batches(max_chunksize=chunksize):
+        chunk = batch.to_pandas()
+        for col in chunk.columns:
+            if chunk[col].dtype == object:
+                chunk[col] = chunk[col].where(chunk[col].notna(), np.nan)
+        yield chunk
+
+
+def analyze_append(fileobj, offset: int, columns: List[Any], acc: ChunkedIssueAccumulator,
+                   chunksize: int = 100_000) -> Tuple[ChunkedIssueAccumulator, Dict[Any, str], int]:
+    """
+    Feeds the rows of a CSV that start at byte `offset` (an appended tail without a header)
+    into `acc`, the base version's accumulator. Returns (acc, tail fingerprints, appended rows).
+    """
+    base_rows = acc.rows
+    fingerprints = None
+    fileobj.seek(offset)
+    with pd.read_csv(fileobj, header=None, names=columns, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk_fingerprints = column_fingerprints(chunk, acc.rows)
+            fingerprints = chunk_fingerprints if fingerprints is None else extend_fingerprints(fingerprints, chunk_fingerprints)
+            acc.update(chunk)
+    fileobj.seek(0)
+    return acc, fingerprints or {}, acc.rows - base_rows
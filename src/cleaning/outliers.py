@@ -0,0 +1,250 @@
+import os
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("iqr", "robust", "isolation_forest")
+# Numeric columns are converted this many at a time, bounding the float64 copy
+_BLOCK_COLUMNS = 64
+# Iglewicz and Hoaglin's modified z-score, 0.6745 * (x - median) / MAD, flags values above 3.5
+_MAD_SCALE = 0.6745
+# When over half the values tie at the median (MAD = 0), the mean absolute deviation, scaled
+# to a normal's standard deviation, stands in
+_MEANAD_SCALE = 1.253314
+# Per-row score above which a row is flagged: distance beyond the quartiles in IQRs, or |z|
+DEFAULT_THRESHOLDS = {"iqr": 1.5, "robust": 3.5}
+
+# The forest itself draws 256 rows per tree; its threshold comes from scoring what it was fitted on
+_FOREST_FIT_ROWS = 20_000
+
+OUTLIER_SAMPLE_ROWS = int(os.environ.get("OUTLIER_SAMPLE_ROWS", 100_000))
+OUTLIER_BATCH_ROWS = int(os.environ.get("OUTLIER_BATCH_ROWS", 100_000))
+OUTLIER_TIME_BUDGET = float(os.environ.get("OUTLIER_TIME_BUDGET_SECONDS", 30))
+
+
+def numeric_columns(df: pd.DataFrame) -> List[Any]:
+    return list(df.select_dtypes(include=[np.number]).columns)
+
+
+def _values(df: pd.DataFrame, columns: List[Any]) -> np.ndarray:
+    # Column-major, so each column sorts and scans contiguously
+    values = np.empty((len(df), len(columns)), dtype=np.float64, order="F")
+    for j, col in enumerate(columns):
+        values[:, j] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return values
+
+
+def quantiles(values: np.ndarray, qs: List[float]) -> np.ndarray:
+    """
+    Quantiles (len(qs) x columns) of every column of `values`, NaN skipped, interpolated
+    linearly as Series.quantile does, from one sort of the whole block. A quantile call per
+    column, or np.nanquantile, which loops over columns with missing values, is several
+    times slower. All-NaN columns give NaN.
+    """
+    if not len(values):
+        return np.full((len(qs), values.shape[1]), np.nan)
+    ordered = np.sort(values, axis=0)  # NaN sorts last
+    count = (~np.isnan(values)).sum(axis=0)
+    last = np.maximum(count - 1, 0)
+    columns = np.arange(values.shape[1])
+    result = np.empty((len(qs), values.shape[1]))
+    with np.errstate(invalid="ignore"):
+        for i, q in enumerate(qs):
+            # numpy's own arithmetic for the 'linear' method, so results match it to the bit
+            virtual = (count - 1) * q
+            below = np.floor(virtual)
+            gamma = virtual - below
+            lo = np.clip(below.astype(np.int64), 0, last)
+            hi = np.minimum(lo + 1, last)
+            a, b = ordered[lo, columns], ordered[hi, columns]
+            diff = b - a
+            result[i] = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    result[:, count == 0] = np.nan
+    return result
+
+
+def iqr_outlier_counts(df: pd.DataFrame, columns: List[Any]) -> Dict[Any, int]:
+    """
+    Values outside the 1.5 * IQR fences of each column, with the quartiles of a block of
+    columns from a single quantiles() call.
+    """
+    counts = {}
+    for start in range(0, len(columns), _BLOCK_COLUMNS):
+        block = columns[start:start + _BLOCK_COLUMNS]
+        values = _values(df, block)
+        q1, q3 = quantiles(values, [0.25, 0.75])
+        iqr = q3 - q1
+        with np.errstate(invalid="ignore"):
+            outside = ((values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)).sum(axis=0)
+        counts.update({col: int(n) for col, n in zip(block, outside)})
+    return counts
+
+
+def _robust_scale(values: np.ndarray, median: np.ndarray) -> np.ndarray:
+    # MAD / 0.6745, or the scaled mean absolute deviation where the MAD is 0
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        deviation = np.abs(values - median)
+        scale = quantiles(deviation, [0.5])[0] / _MAD_SCALE
+        mean_ad = np.nanmean(deviation, axis=0) * _MEANAD_SCALE
+    return np.where(scale > 0, scale, mean_ad)
+
+
+def _sample(n_rows: int, sample_rows: int, random_state: int) -> np.ndarray:
+    if n_rows <= sample_rows:
+        return np.arange(n_rows)
+    return np.sort(np.random.default_rng(random_state).choice(n_rows, sample_rows, replace=False))
+
+
+def fit(df: pd.DataFrame, columns: List[Any], method: str, sample_rows: int = OUTLIER_SAMPLE_ROWS,
+        random_state: int = 0, contamination: float = 0.01) -> Dict[str, Any]:
+    """
+    The scoring model of `method`, fitted on at most `sample_rows` rows: quartiles (iqr),
+    medians and robust scales (robust), or an IsolationForest over all `columns` together,
+    with missing values filled by column medians.
+    """
+    rows = _sample(len(df), sample_rows, random_state)
+    sample = _values(df.iloc[rows], columns)
+    q1, median, q3 = quantiles(sample, [0.25, 0.5, 0.75])
+    model = {"method": method, "columns": columns, "fit_rows": len(rows), "q1": q1, "median": median, "q3": q3}
+    if method == "iqr":
+        iqr = q3 - q1
+        model["scale"] = np.where(iqr > 0, iqr, _robust_scale(sample, median) * 1.349)
+    elif method == "robust":
+        model["scale"] = _robust_scale(sample, median)
+    elif method == "isolation_forest":
+        from sklearn.ensemble import IsolationForest
+        fill = np.nan_to_num(median)
+        sample = sample[_sample(len(sample), _FOREST_FIT_ROWS, random_state)]
+        sample = np.where(np.isnan(sample), fill, sample)
+        forest = IsolationForest(n_estimators=100, contamination=contamination, random_state=random_state)
+        forest.fit(sample)
+        model.update(forest=forest, fill=fill, threshold=float(-forest.offset_), fit_rows=len(sample))
+    else:
+        raise ValueError(f"Unknown outlier method '{method}'. Use one of: {', '.join(METHODS)}")
+    return model
+
+
+def score(model: Dict[str, Any], values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-row scores of `values` (rows x the model's columns), higher is more anomalous, and for
+    the per-column methods each row's most anomalous column and each value's outlier flag.
+    """
+    method = model["method"]
+    if method == "isolation_forest":
+        filled = np.where(np.isnan(values), model["fill"], values)
+        # score_samples is the negated anomaly score of the original paper, in (0, 1]
+        return {"scores": -model["forest"].score_samples(filled)}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "iqr":
+            beyond = np.maximum(np.maximum(model["q1"] - values, values - model["q3"]), 0)
+            per_value = beyond / model["scale"]
+            # The fences themselves, so a column with IQR 0 flags every value off the quartiles
+            flags = beyond > model["threshold"] * (model["q3"] - model["q1"])
+        else:
+            per_value = np.abs(values - model["median"]) / model["scale"]
+            flags = per_value > model["threshold"]
+        # 0 / 0 where every sampled value equals the median is no outlier; x / 0 is the largest score
+        per_value = np.nan_to_num(per_value, nan=0.0, posinf=np.finfo(np.float32).max)
+    return {"scores": per_value.max(axis=1), "column": per_value.argmax(axis=1), "flags": flags}
+
+
+def score_rows(df: pd.DataFrame, columns: Optional[List[Any]] = None, method: str = "robust",
+               threshold: Optional[float] = None, sample_rows: int = OUTLIER_SAMPLE_ROWS,
+               batch_rows: int = OUTLIER_BATCH_ROWS, time_budget: Optional[float] = OUTLIER_TIME_BUDGET,
+               contamination: float = 0.01, top_rows: int = 20, random_state: int = 0) -> Dict[str, Any]:
+    """
+    Scores every row of `df` on its numeric `columns` (default all) with one of METHODS:
+    - iqr: distance beyond the quartiles in IQRs, the largest over the columns; rows with a
+      value outside the `threshold` * IQR fences are flagged (the issues report's rule)
+    - robust: largest modified z-score (median and MAD based) over the columns
+    - isolation_forest: multivariate anomaly score in (0, 1] from an IsolationForest; the
+      `contamination` share of the fitted sample scores above the threshold
+    The model is fitted on a random sample of at most `sample_rows` rows, and rows are then
+    scored `batch_rows` at a time until `time_budget` seconds have passed; rows left unscored
+    have a NaN score and `complete` is False. Returns the summary, the `top_rows` highest
+    scored rows, and the per-row `scores` (float32, in row order).
+    """
+    start = time.perf_counter()
+    columns = list(columns) if columns is not None else numeric_columns(df)
+    if method not in METHODS:
+        raise ValueError(f"Unknown outlier method '{method}'. Use one of: {', '.join(METHODS)}")
+    if not columns:
+        raise ValueError("There are no numeric columns to score")
+    model = fit(df, columns, method, sample_rows, random_state, contamination)
+    if threshold is None:
+        threshold = model["threshold"] if method == "isolation_forest" else DEFAULT_THRESHOLDS[method]
+    model["threshold"] = threshold
+    fit_seconds = time.perf_counter() - start
+
+    n_rows = len(df)
+    scores = np.full(n_rows, np.nan, dtype=np.float32)
+    flagged = np.zeros(n_rows, dtype=bool)
+    worst = np.full(n_rows, -1, dtype=np.int64)
+    flagged_values = np.zeros(len(columns), dtype=np.int64)
+    scored = 0
+    while scored < n_rows:
+        if scored and time_budget is not None and time.perf_counter() - start > time_budget:
+            break
+        stop = min(scored + batch_rows, n_rows)
+        result = score(model, _values(df.iloc[scored:stop], columns))
+        scores[scored:stop] = result["scores"]
+        if "flags" in result:
+            worst[scored:stop] = result["column"]
+            flagged[scored:stop] = result["flags"].any(axis=1)
+            flagged_values += result["flags"].sum(axis=0)
+        else:
+            flagged[scored:stop] = result["scores"] > threshold
+        scored = stop
+
+    summary = {
+        "method": method,
+        "columns": [str(c) for c in columns],
+        "threshold": float(threshold),
+        "rows": n_rows,
+        "scored_rows": scored,
+        "complete": scored == n_rows,
+        "fit_rows": model["fit_rows"],
+        "flagged_rows": int(flagged.sum()),
+        "fit_seconds": round(fit_seconds, 3),
+        "score_seconds": round(time.perf_counter() - start - fit_seconds, 3),
+    }
+    if method != "isolation_forest":
+        summary["flagged_values"] = {str(col): int(n) for col, n in zip(columns, flagged_values) if n}
+    summary["top_rows"] = _top_rows(df, scores, worst, columns, top_rows)
+    summary["scores"] = scores
+    return summary
+
+
+def _top_rows(df: pd.DataFrame, scores: np.ndarray, worst: np.ndarray, columns: List[Any], k: int) -> List[Dict[str, Any]]:
+    ranked = np.flatnonzero(~np.isnan(scores))
+    k = min(k, len(ranked))
+    if not k:
+        return []
+    top = ranked[np.argpartition(-scores[ranked], k - 1)[:k]]
+    top = top[np.lexsort((top, -scores[top]))]
+    rows = []
+    for row in top:
+        label = df.index[row]
+        item = {"row": int(row), "index": label.item() if isinstance(label, np.generic) else label, "score": round(float(scores[row]), 4)}
+        if worst[row] >= 0:
+            col = columns[worst[row]]
+            value = df[col].iloc[row]
+            item.update(column=str(col), value=None if pd.isna(value) else (value.item() if isinstance(value, np.generic) else value))
+        rows.append(item)
+    return rows
+
+
+def prompt_issues(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Issue entries for the cleaning prompt from an outlier summary: robust per-column counts,
+    or the rows an IsolationForest flags. IQR counts are already in the issues report.
+    """
+    if summary["method"] == "robust":
+        return {"robust_outliers": dict(summary.get("flagged_values", {}))}
+    if summary["method"] == "isolation_forest":
+        return {"multivariate_outliers": summary["flagged_rows"]}
+    return {}
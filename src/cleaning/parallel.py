@@ -0,0 +1,204 @@
+import heapq
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import infer_dtype
+
+# DETECTOR_WORKERS=0 uses every core; 1 keeps the detector serial. Frames below either size
+# threshold are always analyzed serially, where pool round trips would cost more than they save.
+DETECTOR_WORKERS = int(os.environ.get("DETECTOR_WORKERS", 0))
+PARALLEL_MIN_COLUMNS = int(os.environ.get("DETECTOR_PARALLEL_MIN_COLUMNS", 32))
+PARALLEL_MIN_CELLS = int(os.environ.get("DETECTOR_PARALLEL_MIN_CELLS", 1_000_000))
+
+# Object columns cost roughly this many times more per cell than numeric ones
+_OBJECT_COST = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    workers = DETECTOR_WORKERS if workers is None else workers
+    return (os.cpu_count() or 1) if workers <= 0 else workers
+
+
+def use_parallel(df: pd.DataFrame, workers: int) -> bool:
+    return workers > 1 and len(df.columns) >= PARALLEL_MIN_COLUMNS and df.size >= PARALLEL_MIN_CELLS
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver children start clean, so forking from a threaded server is safe
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _shared_array(series: pd.Series) -> Optional[Tuple[pa.Array, Optional[str], Optional[str]]]:
+    """
+    An Arrow array that rebuilds the column exactly, with the numpy dtype to view it as and how
+    to restore object nulls; None when the column has to be pickled instead. Shared columns are
+    plain numpy ones and object columns holding only strings plus a single kind of null.
+    """
+    dtype = series.dtype
+    if not isinstance(dtype, np.dtype):
+        return None
+    values = series.to_numpy()
+    if dtype.kind in "iufb":
+        return pa.array(values), None, None
+    if dtype.kind in "Mm":
+        # As raw int64 so NaT survives unchanged
+        return pa.array(values.view("i8")), dtype.str, None
+    if dtype.kind != "O":
+        return None
+    null_mask = pd.isna(values)
+    if infer_dtype(values[~null_mask], skipna=False) != "string":
+        return None
+    null_types = set(map(type, values[null_mask]))
+    if null_types and null_types != {float} and null_types != {type(None)}:
+        return None
+    return pa.array(values, type=pa.large_string(), from_pandas=True), None, "nan" if null_types == {float} else None
+
+
+def _write_shared(df: pd.DataFrame) -> Tuple[Optional[str], Dict[Any, Tuple[str, Optional[str], Optional[str]]], Dict[Any, pd.Series]]:
+    """
+    Writes the shareable columns to one Arrow IPC file (in /dev/shm when available) that workers
+    memory-map. Returns (path, {column: (field, view dtype, null restore)}, {column: pickled series}).
+    """
+    arrays, names, shared, pickled = [], [], {}, {}
+    for i, col in enumerate(df.columns):
+        converted = _shared_array(df[col])
+        if converted is None:
+            pickled[col] = df[col].reset_index(drop=True)
+            continue
+        array, view, nulls = converted
+        arrays.append(array)
+        names.append(f"c{i}")
+        shared[col] = (names[-1], view, nulls)
+    if not arrays:
+        return None, shared, pickled
+    directory = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+    fd, path = tempfile.mkstemp(suffix=".arrow", prefix="detector-", dir=directory)
+    os.close(fd)
+    table = pa.Table.from_arrays(arrays, names=names)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path, shared, pickled
+
+
+def _column_stats_task(path: Optional[str], n_rows: int, columns: List[Any], shared: Dict[Any, Tuple[str, Optional[str], Optional[str]]],
+                       pickled: Dict[Any, pd.Series]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Worker side: rebuilds its columns from the memory-mapped file (zero-copy for numeric columns
+    without nulls) and the pickled ones, then runs the serial column statistics on them.
+    """
+    from src.cleaning.detector import compute_column_stats
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all() if path is not None else None
+    data = {}
+    for col in columns:
+        if col in pickled:
+            data[col] = pickled[col]
+            continue
+        field, view, nulls = shared[col]
+        values = table.column(field).to_numpy(zero_copy_only=False)
+        if view is not None:
+            values = values.view(view)
+        elif nulls == "nan":
+            values = values.copy()
+            values[pd.isna(values)] = np.nan
+        data[col] = pd.Series(values, copy=False)
+    df = pd.DataFrame(data, index=pd.RangeIndex(n_rows), columns=pd.Index(columns, dtype=object), copy=False)
+    timings = {}
+    return compute_column_stats(df, timings), timings
+
+
+def _partition(df: pd.DataFrame, parts: int) -> List[List[Any]]:
+    # Longest-processing-time-first: each column goes to the currently cheapest partition
+    costs = [(_OBJECT_COST if df[col].dtype == object else 1, i, col) for i, col in enumerate(df.columns)]
+    heap = [(0, p, []) for p in range(parts)]
+    for cost, _, col in sorted(costs, key=lambda c: (-c[0], c[1])):
+        load, p, cols = heapq.heappop(heap)
+        cols.append(col)
+        heapq.heappush(heap, (load + cost, p, cols))
+    return [cols for _, _, cols in heap if cols]
+
+
+def merge_column_stats(df: pd.DataFrame, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combines the statistics of column partitions into those of the whole frame, with every
+    per-column dict in the frame's column order.
+    """
+    from src.cleaning.detector import object_columns
+
+    stats = {
+        'n_rows': len(df),
+        'columns': list(df.columns),
+        'object_columns': object_columns(df),
+        'categorical_columns': list(df.select_dtypes(include=['object', 'category']).columns),
+        'numeric_columns': list(df.select_dtypes(include=[np.number]).columns),
+    }
+    for key, value in parts[0].items():
+        if key in stats or not isinstance(value, dict):
+            continue
+        merged = {}
+        for part in parts:
+            merged.update(part.get(key, {}))
+        stats[key] = {col: merged[col] for col in df.columns if col in merged}
+    return stats
+
+
+def parallel_column_stats(df: pd.DataFrame, workers: int, timings: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+    """
+    compute_column_stats() with the columns spread over a process pool. Worker timings are
+    summed per check. Returns None if the pool fails, so the caller can fall back to serial.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    path, shared, pickled = _write_shared(df)
+    timings['share_columns'] = time.perf_counter() - start
+    try:
+        pool = _get_pool(workers)
+        # A few partitions per worker even out columns of unequal cost
+        futures = [
+            pool.submit(_column_stats_task, path, len(df), cols, {c: shared[c] for c in cols if c in shared},
+                        {c: pickled[c] for c in cols if c in pickled})
+            for cols in _partition(df, min(len(df.columns), workers * 4))
+        ]
+        parts = []
+        for future in futures:
+            part, part_timings = future.result()
+            parts.append(part)
+            for name, seconds in part_timings.items():
+                timings[name] = timings.get(name, 0.0) + seconds
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Parallel detector failed, falling back to serial: {e}")
+        shutdown_pool()
+        return None
+    finally:
+        if path is not None:
+            os.remove(path)
+    return merge_column_stats(df, parts)
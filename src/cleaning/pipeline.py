@@ -0,0 +1,408 @@
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.cleaning.duplicates import DuplicateCounter, chunk_row_hashes
+from src.cleaning.sketches import TDigest
+
+# A cleaning plan is a list of JSON steps, applied in this order whatever their order in the list:
+#   {"op": "drop_columns", "columns": [...]}                    the columns are never read
+#   {"op": "dedupe"}                                            rows repeating an earlier row are dropped
+#   {"op": "cast", "column": c, "to": "numeric"|"datetime"|"string", "format": optional}
+#   {"op": "impute", "column": c, "strategy": "median"|"mean"|"mode"|"constant", "value": optional}
+#   {"op": "clip", "column": c, "lower": optional, "upper": optional}
+# Per column, casts come before imputation and imputation before clipping. A missing impute
+# value or clip bound is fitted in a first pass over the cast values of just those columns.
+OPS = ("drop_columns", "dedupe", "cast", "impute", "clip")
+CAST_TYPES = {"numeric": pa.float64(), "datetime": pa.timestamp("ns"), "string": pa.string()}
+IMPUTE_STRATEGIES = ("median", "mean", "mode", "constant")
+_COLUMN_OPS = ("cast", "impute", "clip")
+# Clip bounds are the issues report's outlier fences: quartiles -/+ 1.5 IQR
+_IQR_K = 1.5
+
+PIPELINE_CHUNK_ROWS = int(os.environ.get("PIPELINE_CHUNK_ROWS", 250_000))
+# Distinct rows dedupe tracks exactly (8 bytes each); past that, a Bloom filter may drop a few unique rows
+PIPELINE_DEDUPE_MAX_ROWS = int(os.environ.get("PIPELINE_DEDUPE_MAX_ROWS", 1 << 28))
+
+
+def plan_from_issues(issues: Dict[str, Any], profile: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    The cleaning plan for an issues report: drop constant, all-zero and mostly-missing
+    columns, drop duplicate rows, cast numeric and date strings (and mixed columns to
+    strings), impute missing values (median for numbers, most frequent value otherwise;
+    datetimes are left alone) and clip outliers to the report's IQR fences. Values come from
+    the dataset profile (see src.analysis.profile) when there is one; otherwise, or for a
+    cast column, they are left to be fitted when the plan runs.
+    """
+    types = issues.get("inferred_types", {})
+    summaries = {summary["name"]: summary for summary in profile["columns"]} if profile else {}
+    drop = []
+    for key in ("constant_columns", "all_zero_columns", "high_missing_pct_columns"):
+        drop += [col for col in issues.get(key, []) if col not in drop]
+    plan = []
+    if drop:
+        plan.append({"op": "drop_columns", "columns": drop})
+    if issues.get("duplicate_rows"):
+        plan.append({"op": "dedupe"})
+
+    casts = {}
+    mixed = issues.get("mixed_type_object_columns", {})
+    for col, kind in types.items():
+        if col in drop:
+            continue
+        if kind == "numeric_string":
+            casts[col] = {"op": "cast", "column": col, "to": "numeric"}
+        elif kind.startswith("datetime_string"):
+            casts[col] = {"op": "cast", "column": col, "to": "datetime"}
+            if kind.endswith("]"):
+                casts[col]["format"] = kind[len("datetime_string["):-1]
+        elif kind == "mixed" or col in mixed:
+            casts[col] = {"op": "cast", "column": col, "to": "string"}
+    plan += casts.values()
+
+    for col in issues.get("missing_values", {}):
+        cast = casts.get(col, {}).get("to")
+        if col in drop or cast == "datetime" or types.get(col) == "datetime":
+            continue
+        summary = summaries.get(col, {})
+        numeric = cast == "numeric" or (cast is None and (summary.get("kind") == "numeric" or types.get(col) in ("integer", "float")))
+        step = {"op": "impute", "column": col, "strategy": "median" if numeric else "mode"}
+        # The profile describes the column before any cast
+        if cast is None and numeric and summary.get("median") is not None:
+            step["value"] = summary["median"]
+        elif cast is None and not numeric and summary.get("top_values"):
+            step["value"] = summary["top_values"][0][0]
+        plan.append(step)
+
+    for col in issues.get("outliers", {}):
+        if col in drop:
+            continue
+        step = {"op": "clip", "column": col}
+        summary = summaries.get(col, {})
+        if col not in casts and summary.get("p25") is not None and summary.get("p75") is not None:
+            iqr = summary["p75"] - summary["p25"]
+            step.update(lower=summary["p25"] - _IQR_K * iqr, upper=summary["p75"] + _IQR_K * iqr)
+        plan.append(step)
+    return plan
+
+
+def compile_plan(plan: List[Dict[str, Any]], schema: pa.Schema) -> Dict[str, Any]:
+    """
+    Checks `plan` against the source `schema` and fuses it: the columns to read, whether to
+    dedupe, and per column the ordered program of its cast/impute/clip steps, so each column
+    is transformed in one go. Raises ValueError for an invalid plan.
+    """
+    names = schema.names
+    steps = [dict(step) for step in plan]
+    drop, dedupe, programs = set(), None, {}
+    for index, step in enumerate(steps):
+        op = step.get("op")
+        if op not in OPS:
+            raise ValueError(f"Step {index}: unknown op '{op}'. Use one of: {', '.join(OPS)}")
+        if op == "drop_columns":
+            unknown = [col for col in step.get("columns", []) if col not in names]
+            if unknown:
+                raise ValueError(f"Step {index}: unknown columns: {', '.join(map(str, unknown))}")
+            drop.update(step.get("columns", []))
+        elif op == "dedupe":
+            dedupe = index
+        else:
+            col = step.get("column")
+            if col not in names:
+                raise ValueError(f"Step {index}: unknown column '{col}'")
+            if op == "cast" and step.get("to") not in CAST_TYPES:
+                raise ValueError(f"Step {index}: cannot cast to '{step.get('to')}'. Use one of: {', '.join(CAST_TYPES)}")
+            if op == "impute":
+                if step.get("strategy", "constant") not in IMPUTE_STRATEGIES:
+                    raise ValueError(f"Step {index}: unknown strategy '{step.get('strategy')}'. Use one of: {', '.join(IMPUTE_STRATEGIES)}")
+                if step.get("strategy", "constant") == "constant" and step.get("value") is None:
+                    raise ValueError(f"Step {index}: a constant imputation needs a value")
+            programs.setdefault(col, []).append(index)
+    dropped_programs = [col for col in programs if col in drop]
+    if dropped_programs:
+        raise ValueError(f"Steps target dropped columns: {', '.join(map(str, dropped_programs))}")
+
+    for col, indices in programs.items():
+        indices.sort(key=lambda i: _COLUMN_OPS.index(steps[i]["op"]))
+        casts = [steps[i]["to"] for i in indices if steps[i]["op"] == "cast"]
+        output = CAST_TYPES[casts[-1]] if casts else schema.field(col).type
+        for i in indices:
+            if steps[i]["op"] == "clip" and not (pa.types.is_integer(output) or pa.types.is_floating(output)):
+                raise ValueError(f"Step {i}: cannot clip non-numeric column '{col}'")
+            if steps[i].get("strategy") in ("median", "mean") and not (pa.types.is_integer(output) or pa.types.is_floating(output)):
+                raise ValueError(f"Step {i}: cannot take the {steps[i]['strategy']} of non-numeric column '{col}'")
+    return {
+        "steps": steps,
+        "read": [col for col in names if col not in drop],
+        "drop": [col for col in names if col in drop],
+        "dedupe": dedupe,
+        "programs": programs,
+    }
+
+
+def _cast(series: pd.Series, step: Dict[str, Any]) -> pd.Series:
+    to = step["to"]
+    if to == "numeric":
+        return pd.to_numeric(series, errors="coerce").astype(np.float64)
+    if to == "datetime":
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            result = series
+        else:
+            result = pd.to_datetime(series, format=step.get("format"), errors="coerce")
+        if getattr(result.dt, "tz", None) is not None:
+            result = result.dt.tz_convert(None)
+        return result.astype("datetime64[ns]")
+    # Strings: every present value as its text
+    return series.astype(object).where(series.isna(), series.astype(str))
+
+
+def _cast_all(series: pd.Series, steps: List[Dict[str, Any]], indices: List[int]) -> pd.Series:
+    for i in indices:
+        if steps[i]["op"] == "cast":
+            series = _cast(series, steps[i])
+    return series
+
+
+def _fit(compiled: Dict[str, Any], table: pa.Table, chunk_rows: int) -> List[int]:
+    """
+    Fills in missing impute values and clip bounds from one pass over the columns that need
+    them: quantiles from a t-digest, means from running sums, modes from merged value counts.
+    Returns the indices of the fitted steps.
+    """
+    steps = compiled["steps"]
+    pending = [i for indices in compiled["programs"].values() for i in indices
+               if (steps[i]["op"] == "impute" and steps[i].get("value") is None)
+               or (steps[i]["op"] == "clip" and "lower" not in steps[i] and "upper" not in steps[i])]
+    if not pending:
+        return []
+    columns = list(dict.fromkeys(steps[i]["column"] for i in pending))
+    digests = {col: TDigest() for col in columns}
+    sums = {col: [0.0, 0] for col in columns}
+    modes: Dict[Any, pd.Series] = {}
+    wants_mode = {steps[i]["column"] for i in pending if steps[i].get("strategy") == "mode"}
+    for batch in table.select(columns).to_batches(max_chunksize=chunk_rows):
+        for j, col in enumerate(columns):
+            series = _cast_all(batch.column(j).to_pandas(), steps, compiled["programs"][col])
+            if col in wants_mode:
+                counts = series.value_counts(dropna=True, sort=False)
+                modes[col] = counts if col not in modes else modes[col].add(counts, fill_value=0)
+            if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                digests[col].update(values)
+                present = values[~np.isnan(values)]
+                sums[col][0] += float(present.sum())
+                sums[col][1] += len(present)
+
+    for i in pending:
+        step, col = steps[i], steps[i]["column"]
+        if step["op"] == "clip":
+            q1, q3 = digests[col].quantile(0.25), digests[col].quantile(0.75)
+            if np.isnan(q1):
+                step.update(lower=None, upper=None)
+            else:
+                step.update(lower=q1 - _IQR_K * (q3 - q1), upper=q3 + _IQR_K * (q3 - q1))
+        elif step["strategy"] == "median":
+            step["value"] = digests[col].quantile(0.5)
+        elif step["strategy"] == "mean":
+            step["value"] = sums[col][0] / sums[col][1] if sums[col][1] else np.nan
+        elif col in modes and len(modes[col]):
+            mode = modes[col].idxmax()
+            step["value"] = mode.item() if isinstance(mode, np.generic) else mode
+        value = step.get("value")
+        if step["op"] == "impute" and (value is None or (isinstance(value, float) and np.isnan(value))):
+            # Nothing to fit on: every value is missing
+            step.pop("value", None)
+    return pending
+
+
+def _output_schema(compiled: Dict[str, Any], schema: pa.Schema) -> pa.Schema:
+    # Also rounds the clip bounds of integer columns inwards, so clipped values stay integers
+    steps = compiled["steps"]
+    fields = []
+    for col in compiled["read"]:
+        field = schema.field(col)
+        indices = compiled["programs"].get(col)
+        if not indices:
+            fields.append(field)
+            continue
+        output = field.type
+        for i in indices:
+            step = steps[i]
+            if step["op"] == "cast":
+                output = CAST_TYPES[step["to"]]
+            elif pa.types.is_integer(output):
+                # Integer columns stay integers unless filled with a fraction
+                if step["op"] == "impute" and not float(step.get("value", 0)).is_integer():
+                    output = pa.float64()
+                elif step["op"] == "clip":
+                    step.update(lower=None if step.get("lower") is None else float(np.ceil(step["lower"])),
+                                upper=None if step.get("upper") is None else float(np.floor(step["upper"])))
+        if pa.types.is_dictionary(output):
+            # A fill value outside the dictionary would change it between chunks
+            output = output.value_type
+        fields.append(pa.field(col, output))
+    return pa.schema(fields)
+
+
+def _numeric(values: np.ndarray, owned: bool) -> np.ndarray:
+    # The first in-place step copies (chunk arrays may be read-only views of the mapped file)
+    return values if owned and values.flags.writeable else values.copy()
+
+
+def _run_column(series: pd.Series, steps: List[Dict[str, Any]], indices: List[int],
+                timings: List[Dict[str, Any]]) -> pd.Series:
+    """
+    Applies a column's fused program. Numeric steps work in place on one owned array.
+    """
+    values, owned = None, False
+    for i in indices:
+        step, stats = steps[i], timings[i]
+        start = time.perf_counter()
+        if step["op"] == "cast":
+            before = int(series.isna().sum())
+            series = _cast(series, step)
+            owned = True
+            changed = int(series.isna().sum()) - before
+        elif step["op"] == "impute":
+            changed = 0
+            if "value" in step:
+                if values is None and series.dtype.kind == "f":
+                    values = series.to_numpy()
+                if values is not None:
+                    mask = np.isnan(values)
+                    changed = int(mask.sum())
+                    if changed:
+                        values = _numeric(values, owned)
+                        owned = True
+                        values[mask] = step["value"]
+                else:
+                    changed = int(series.isna().sum())
+                    if changed:
+                        if isinstance(series.dtype, pd.CategoricalDtype) and step["value"] not in series.cat.categories:
+                            series = series.cat.add_categories([step["value"]])
+                        series = series.fillna(step["value"])
+        else:
+            if values is None:
+                values = series.to_numpy()
+            lower, upper = step.get("lower"), step.get("upper")
+            with np.errstate(invalid="ignore"):
+                outside = np.zeros(len(values), dtype=bool)
+                if lower is not None:
+                    outside |= values < lower
+                if upper is not None:
+                    outside |= values > upper
+            changed = int(outside.sum())
+            if changed:
+                values = _numeric(values, owned)
+                owned = True
+                # Integer bounds for integer arrays, which were rounded inwards
+                cast = values.dtype.type
+                np.clip(values, None if lower is None else cast(lower), None if upper is None else cast(upper), out=values)
+        stats["seconds"] += time.perf_counter() - start
+        stats["rows_in"] += len(series)
+        stats["rows_out"] += len(series)
+        stats["values_changed"] += changed
+    return pd.Series(values, copy=False) if values is not None else series
+
+
+def run_pipeline(table: pa.Table, plan: List[Dict[str, Any]], write: Callable[[pa.Schema, Iterator[pa.RecordBatch]], str],
+                 chunk_rows: int = PIPELINE_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Runs a cleaning plan over `table` (typically memory-mapped, see
+    src.storage.columnar.load_table) `chunk_rows` rows at a time. Only the kept columns are
+    read, duplicate rows are dropped before anything else touches them, and each column's
+    steps run back to back on one array. `write(schema, batches)` stores the cleaned batches
+    as they are produced and returns where. Returns the output location and a summary:
+    rows and bytes in and out, time per stage (fit, read, dedupe, transform, convert, write),
+    and per step its time, rows in and out and the values it changed.
+    """
+    start = time.perf_counter()
+    compiled = compile_plan(plan, table.schema)
+    steps = compiled["steps"]
+    fitted = _fit(compiled, table, chunk_rows)
+    schema = _output_schema(compiled, table.schema)
+    stages = {"fit": time.perf_counter() - start, "read": 0.0, "dedupe": 0.0, "transform": 0.0, "convert": 0.0}
+    timings = [{"seconds": 0.0, "rows_in": 0, "rows_out": 0, "values_changed": 0} for _ in steps]
+    counter = DuplicateCounter(max_hashes=PIPELINE_DEDUPE_MAX_ROWS) if compiled["dedupe"] is not None else None
+    columns_bytes = {col: {"bytes_in": 0, "bytes_out": 0} for col in compiled["read"]}
+    totals = {"rows_in": 0, "rows_out": 0, "chunks": 0}
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        for batch in table.select(compiled["read"]).to_batches(max_chunksize=chunk_rows):
+            t0 = time.perf_counter()
+            chunk = batch.to_pandas(split_blocks=True)
+            t1 = time.perf_counter()
+            stages["read"] += t1 - t0
+            totals["rows_in"] += len(chunk)
+            totals["chunks"] += 1
+            for j, col in enumerate(compiled["read"]):
+                columns_bytes[col]["bytes_in"] += batch.column(j).nbytes
+            if counter is not None:
+                stats = timings[compiled["dedupe"]]
+                stats["rows_in"] += len(chunk)
+                repeated = counter.repeated(chunk_row_hashes(chunk))
+                if repeated.any():
+                    chunk = chunk[~repeated]
+                stats["rows_out"] += len(chunk)
+                stats["values_changed"] += int(repeated.sum())
+                elapsed = time.perf_counter() - t1
+                stats["seconds"] += elapsed
+                stages["dedupe"] += elapsed
+            arrays = []
+            for col, field in zip(compiled["read"], schema):
+                t2 = time.perf_counter()
+                series = chunk[col]
+                if col in compiled["programs"]:
+                    series = _run_column(series, steps, compiled["programs"][col], timings)
+                t3 = time.perf_counter()
+                if isinstance(series.dtype, pd.CategoricalDtype) and not pa.types.is_dictionary(field.type):
+                    array = pa.array(series, from_pandas=True).cast(field.type)
+                else:
+                    array = pa.array(series, type=field.type, from_pandas=True)
+                stages["transform"] += t3 - t2
+                stages["convert"] += time.perf_counter() - t3
+                columns_bytes[col]["bytes_out"] += array.nbytes
+                arrays.append(array)
+            totals["rows_out"] += len(chunk)
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    write_start = time.perf_counter()
+    output = write(schema, batches())
+    elapsed = time.perf_counter() - write_start
+    stages["write"] = elapsed - stages["read"] - stages["dedupe"] - stages["transform"] - stages["convert"]
+
+    for col in compiled["drop"]:
+        for index, step in enumerate(steps):
+            if step["op"] == "drop_columns" and col in step.get("columns", []):
+                timings[index]["bytes_in"] = timings[index].get("bytes_in", 0) + table.column(col).nbytes
+                timings[index]["bytes_out"] = 0
+    for index, step in enumerate(steps):
+        if step["op"] == "drop_columns":
+            timings[index].update(rows_in=totals["rows_in"], rows_out=totals["rows_in"])
+    report = []
+    for index, (step, stats) in enumerate(zip(steps, timings)):
+        item = dict(step)
+        item.update(stats, seconds=round(stats["seconds"], 4))
+        if index in fitted:
+            item["fitted"] = True
+        report.append(item)
+    return {
+        "output": output,
+        "rows_in": table.num_rows,
+        "rows_out": totals["rows_out"],
+        "columns_in": table.num_columns,
+        "columns_out": len(schema),
+        "bytes_in": table.nbytes,
+        "bytes_out": sum(item["bytes_out"] for item in columns_bytes.values()),
+        "chunks": totals["chunks"],
+        "chunk_rows": chunk_rows,
+        "dedupe_exact": counter.exact if counter is not None else True,
+        "seconds": round(time.perf_counter() - start, 4),
+        "stages": {name: round(seconds, 4) for name, seconds in stages.items()},
+        "columns": {str(col): item for col, item in columns_bytes.items()},
+        "steps": report,
+    }
@@ -0,0 +1,192 @@
+import io
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning.detector import analyze_issues
+
+# Two-sided 95% normal quantile
+_Z = 1.96
+
+
+def sample_csv(fileobj, row_budget: int = 50_000, strata: int = 256, time_budget: Optional[float] = None,
+               seed: int = 0) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Stratified sample of a CSV without parsing all of it: the data section is split into
+    `strata` equal byte ranges and up to row_budget / strata whole lines are read from the
+    start of each. Strata after the first are visited in random order and reading stops once
+    half the time budget is used, so the rest is left for the detector. Falls back to the first
+    `row_budget` rows when lines cannot be sliced safely (e.g. quoted newlines).
+    Returns (sample, info); info has the estimated total row count, the rows taken from each
+    stratum and whether the sample is the whole file.
+    """
+    start = time.perf_counter()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    header = fileobj.readline()
+    data_start = fileobj.tell()
+    strata = max(1, min(strata, row_budget))
+    per_stratum = max(1, row_budget // strata)
+    bounds = data_start + ((size - data_start) * np.arange(strata + 1) / strata).astype(np.int64)
+
+    order = [0] + list(np.random.default_rng(seed).permutation(np.arange(1, strata)))
+    blocks, complete = {}, True
+    for i in order:
+        if time_budget is not None and blocks and time.perf_counter() - start > time_budget / 2:
+            complete = False
+            break
+        lo, hi = int(bounds[i]), int(bounds[i + 1])
+        # Lines belong to the stratum they start in; a line starting exactly at `lo` is kept
+        fileobj.seek(lo - 1 if lo > data_start else lo)
+        if lo > data_start:
+            fileobj.readline()
+        lines = []
+        while fileobj.tell() < hi and len(lines) < per_stratum:
+            line = fileobj.readline()
+            if not line:
+                break
+            lines.append(line)
+        if fileobj.tell() < hi:
+            complete = False
+        blocks[i] = lines
+
+    lines = [line for i in sorted(blocks) for line in blocks[i]]
+    method = "stratified_blocks"
+    try:
+        sample = pd.read_csv(io.BytesIO(header + b"".join(lines)))
+        if len(sample) != len(lines):
+            raise ValueError("quoted newlines")
+    except Exception:
+        fileobj.seek(0)
+        sample = pd.read_csv(fileobj, nrows=row_budget)
+        lines, method, complete = None, "head", len(sample) < row_budget
+        blocks = {0: range(len(sample))}
+    fileobj.seek(0)
+
+    if complete:
+        total_rows = len(sample)
+    elif lines:
+        # Average line length of the sample extrapolated over the data section
+        total_rows = int(round((size - data_start) * len(lines) / sum(map(len, lines))))
+    else:
+        total_rows = len(sample)
+    info = {
+        "method": method,
+        "rows": len(sample),
+        "estimated_total_rows": max(total_rows, len(sample)),
+        "complete": complete,
+        "block_sizes": [len(blocks[i]) for i in sorted(blocks)],
+        "seconds": time.perf_counter() - start,
+    }
+    return sample, info
+
+
+def wilson_interval(k: int, n: int, z: float = _Z) -> Tuple[float, float]:
+    """
+    Wilson score interval for a proportion observed as k successes in n trials.
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = k / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def _scale(k: int, n: int, total: int) -> Tuple[int, List[int]]:
+    """
+    Sample count scaled to the full row count, with its 95% interval (never below k itself).
+    """
+    lo, hi = wilson_interval(k, n)
+    estimate = int(round(k / n * total)) if n else 0
+    return estimate, [max(k, int(math.floor(lo * total))), max(k, int(math.ceil(hi * total)))]
+
+
+def _poisson_interval(k: int, z: float = _Z) -> Tuple[float, float]:
+    # Square-root approximation; the upper bound for k = 0 is close to the rule of three
+    return (max(0.0, math.sqrt(k) - z / 2) ** 2 if k else 0.0), (math.sqrt(k + 1) + z / 2) ** 2
+
+
+def estimate_duplicates(sample: pd.DataFrame, block_sizes: List[int], total: int) -> Tuple[int, List[int]]:
+    """
+    Duplicate rows in the whole file from a sample of contiguous blocks. A repeat of a row in
+    the same block is a local duplicate (e.g. a repeated run) and is scaled by total / n like any
+    rate; a repeat of a row from another block means both copies were sampled independently,
+    which happens with probability (n / total)^2, so those are scaled by its inverse.
+    """
+    n = len(sample)
+    hashes = pd.util.hash_pandas_object(sample, index=False).to_numpy()
+    duplicated = pd.Series(hashes).duplicated().to_numpy()
+    blocks = np.repeat(np.arange(len(block_sizes)), block_sizes)
+    first_block = pd.Series(blocks).groupby(hashes).transform("first").to_numpy()
+    local = int((duplicated & (blocks == first_block)).sum())
+    far = int(duplicated.sum()) - local
+    f = n / total
+    estimate, (lo, hi) = _scale(local, n, total)
+    far_lo, far_hi = _poisson_interval(far)
+    cap = max(total - 1, 0)
+    return (min(cap, estimate + int(round(far / f ** 2))),
+            [min(cap, max(local + far, lo + int(far_lo / f ** 2))), min(cap, hi + int(math.ceil(far_hi / f ** 2)))])
+
+
+def estimate_distinct(value_counts: pd.Series, n: int, total: int) -> int:
+    """
+    GEE estimate of a column's distinct count: values seen once in the sample are scaled by
+    sqrt(total / n), values seen more often are counted as they are.
+    """
+    if n == 0 or n >= total:
+        return int(len(value_counts))
+    singletons = int((value_counts == 1).sum())
+    return int(round(math.sqrt(total / n) * singletons + (len(value_counts) - singletons)))
+
+
+def cardinality_class(distinct: int, total: int) -> str:
+    if distinct <= 1:
+        return "constant"
+    if distinct <= 50:
+        return "low"
+    if distinct <= max(50, 0.2 * total):
+        return "medium"
+    return "unique" if distinct >= 0.95 * total else "high"
+
+
+def quick_report(sample: pd.DataFrame, total_rows: int, block_sizes: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    The issues report of a sample, with counts scaled to `total_rows`. Returns
+    {issues, intervals, approximate, cardinality_class}; intervals hold 95% bounds for the
+    scaled counts. `block_sizes` are the row counts of the sample's contiguous blocks, in order
+    (one block when omitted).
+    """
+    n = len(sample)
+    issues = analyze_issues(sample)
+    if n >= total_rows:
+        return {"issues": issues, "intervals": {}, "approximate": [], "cardinality_class": {}}
+
+    intervals = {"missing_values": {}, "outliers": {}}
+    for key in ("missing_values", "outliers"):
+        for col, k in issues[key].items():
+            issues[key][col], intervals[key][col] = _scale(k, n, total_rows)
+    issues["duplicate_rows"], intervals["duplicate_rows"] = estimate_duplicates(sample, block_sizes or [n], total_rows)
+    for key in ("type_inconsistencies", "mixed_type_object_columns"):
+        issues[key] = {col: {t: _scale(k, n, total_rows)[0] for t, k in counts.items()} for col, counts in issues[key].items()}
+
+    classes = {}
+    for col in sample.columns:
+        counts = sample[col].value_counts(dropna=True, sort=False)
+        classes[col] = cardinality_class(estimate_distinct(counts, n, total_rows), total_rows)
+    issues["high_cardinality_columns"] = [col for col, c in classes.items() if c in ("high", "unique")]
+
+    # Ratios (missing share, top-value share) are unbiased from the sample; everything that
+    # depends on a rare value being present or absent is only as good as the sample
+    return {
+        "issues": issues,
+        "intervals": intervals,
+        "approximate": [key for key in issues if key not in ("highly_imbalanced_categoricals",)],
+        "cardinality_class": classes,
+    }
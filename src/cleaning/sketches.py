@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values) -> np.ndarray:
+    """
+    64-bit hashes of a Series/array/DataFrame (rows), independent of the index.
+    """
+    if not isinstance(values, (pd.Series, pd.DataFrame)):
+        values = pd.Series(values)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (merging t-digest with the arcsine scale function).
+    Memory is bounded by roughly `compression / 2` centroids regardless of input size.
+    """
+
+    def __init__(self, compression: float = 200.0):
+        self.compression = compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.count = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(values.size)]),
+        )
+
+    def merge(self, other: "TDigest") -> None:
+        if other.count == 0:
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        cum = np.cumsum(weights)
+        q_mid = (cum - weights / 2) / total
+        # Points whose midpoint falls into the same unit interval of k(q) share a centroid
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q_mid - 1)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+        new_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / new_weights
+        self.weights = new_weights
+        self.count = float(total)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return np.nan
+        if self.means.size == 1:
+            return float(self.means[0])
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xp = np.r_[0.0, centers, self.count]
+        fp = np.r_[self.min, self.means, self.max]
+        return float(np.interp(q * self.count, xp, fp))
+
+    def cdf(self, x: float) -> float:
+        """
+        Estimated fraction of values <= x.
+        """
+        if self.count == 0:
+            return np.nan
+        if x < self.min:
+            return 0.0
+        if x >= self.max:
+            return 1.0
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xp = np.r_[self.min, self.means, self.max]
+        fp = np.r_[0.0, centers, self.count]
+        return float(np.interp(x, xp, fp) / self.count)
+
+
+class HyperLogLog:
+    """
+    Mergeable distinct-count sketch over 64-bit hashes; standard error ~1.04 / sqrt(2**p).
+    """
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        if hashes.size == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # frexp's exponent is the bit length of the remaining bits
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (64 - self.p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, values) -> None:
+        self.update_hashes(hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros > 0:
+            # Linear counting is more accurate for small cardinalities
+            return float(m * np.log(m / zeros))
+        return float(raw)
+
+
+class BloomFilter:
+    """
+    Fixed-size set-membership filter over 64-bit hashes (no false negatives).
+    The default 2**27 bits (16 MiB) keeps the false-positive rate near 1% up to ~13M items.
+    """
+
+    def __init__(self, num_bits: int = 1 << 27, num_hashes: int = 7):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = np.zeros((num_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        hashes = hashes.astype(np.uint64, copy=False)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add_and_check(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Inserts distinct hashes and returns a mask of those that were probably present already.
+        """
+        if hashes.size == 0:
+            return np.zeros(0, dtype=bool)
+        pos = self._positions(hashes)
+        byte, bit = (pos >> np.uint64(3)).astype(np.int64), (pos & np.uint64(7)).astype(np.uint8)
+        present = ((self.bits[byte] >> bit) & 1).all(axis=1)
+        np.bitwise_or.at(self.bits, byte.ravel(), (np.uint8(1) << bit).ravel())
+        return present
+
+    def merge(self, other: "BloomFilter") -> None:
+        np.bitwise_or(self.bits, other.bits, out=self.bits)
@@ -0,0 +1,247 @@
+from collections import Counter
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Tuple, Iterable, Optional
+
+from src.cleaning.detector import issues_from_stats
+from src.cleaning.type_inference import TypeInferenceEngine
+from src.cleaning.sketches import TDigest, HyperLogLog
+from src.cleaning.duplicates import DuplicateCounter, chunk_row_hashes
+
+# Python type of each cell of a numpy column, by dtype kind
+_KIND_TYPES = {'i': int, 'u': int, 'f': float, 'b': bool, 'c': complex}
+
+
+class _ColumnAccumulator:
+    """
+    Mergeable per-column state. Null counts, zero flags and type histograms are exact;
+    cardinality falls back to HyperLogLog and quartiles always come from a t-digest.
+    """
+
+    def __init__(self, name, max_tracked_values: int, engine: TypeInferenceEngine):
+        self.name = name
+        self.max_tracked_values = max_tracked_values
+        # Shared by all columns of a stream; caches each column's datetime format across chunks
+        self.engine = engine
+        self.rows = 0
+        self.nulls = 0
+        self.kinds = set()
+        self.all_zero = True
+        # Python types of every cell, as Series.map(type) would see them
+        self.type_counts_seen = Counter()
+        self.values = pd.Series(dtype=np.int64)
+        self.values_truncated = False
+        self.hll = HyperLogLog()
+        self.digest = TDigest()
+        self.datetime_unparseable = False
+
+    def update(self, s: pd.Series) -> None:
+        n = len(s)
+        null_mask = s.isnull().to_numpy()
+        nulls = int(null_mask.sum())
+        self.rows += n
+        self.nulls += nulls
+        if n == 0:
+            return
+        self.all_zero = self.all_zero and bool((s == 0).all())
+        if nulls == n:
+            # All-null chunks are read as float64 NaN whatever the column's real type is
+            self.type_counts_seen[float] += n
+            return
+        kind = s.dtype.kind if isinstance(s.dtype, np.dtype) else 'O'
+        self.kinds.add(kind)
+
+        if kind in _KIND_TYPES:
+            self.type_counts_seen[_KIND_TYPES[kind]] += n
+        elif kind == 'O':
+            self.type_counts_seen.update(self.engine.type_counter(s.to_numpy(), null_mask))
+        else:
+            self.type_counts_seen.update(map(type, s.to_numpy()))
+        if kind == 'O':
+            if not self.datetime_unparseable:
+                self.datetime_unparseable = self.engine.datetime_unparseable(self.name, s.dropna().unique())
+        elif kind in 'iuf':
+            self.digest.update(s.to_numpy(dtype=np.float64, na_value=np.nan))
+
+        non_null = s[~null_mask]
+        self.hll.update(non_null)
+        self._update_values(non_null.value_counts(sort=False))
+
+    def _update_values(self, vc: pd.Series) -> None:
+        self.values = self.values.add(vc, fill_value=0) if len(self.values) else vc.astype(np.int64)
+        if len(self.values) > self.max_tracked_values:
+            # Keep the heaviest values only; counts of the rest are lost from here on
+            self.values = self.values.nlargest(self.max_tracked_values)
+            self.values_truncated = True
+
+    def merge(self, other: "_ColumnAccumulator") -> None:
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.kinds |= other.kinds
+        self.all_zero = self.all_zero and other.all_zero
+        self.type_counts_seen.update(other.type_counts_seen)
+        self.values_truncated = self.values_truncated or other.values_truncated
+        if len(other.values):
+            self._update_values(other.values)
+        self.hll.merge(other.hll)
+        self.digest.merge(other.digest)
+        self.datetime_unparseable = self.datetime_unparseable or other.datetime_unparseable
+
+    @property
+    def is_object(self) -> bool:
+        # Mirrors the dtype a single read_csv would infer for the whole column
+        return 'O' in self.kinds or ('b' in self.kinds and len(self.kinds) > 1)
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.kinds <= set('iuf')
+
+    @property
+    def nunique(self) -> int:
+        if not self.values_truncated:
+            return int(len(self.values))
+        return int(round(self.hll.estimate()))
+
+    def inferred_type(self, n_rows: int) -> str:
+        if self.is_object:
+            # The tracked (heaviest) values stand in for the distinct values
+            return self.engine.infer_type(self.name, 'O', n_rows, self.nulls, self.nunique,
+                                          uniques=self.values.index.to_numpy(),
+                                          datetime_unparseable=self.datetime_unparseable)
+        kind = 'f' if 'f' in self.kinds else (min(self.kinds) if self.kinds else 'f')
+        return self.engine.infer_type(self.name, kind, n_rows, self.nulls, self.nunique)
+
+    def type_counts(self) -> Dict[str, int]:
+        if not self.is_object:
+            return {}
+        # Like a low_memory read_csv, cells of numeric chunks keep their numeric type
+        return {str(k): int(v) for k, v in self.type_counts_seen.most_common()}
+
+
+class ChunkedIssueAccumulator:
+    """
+    Builds the `analyze_issues` report from DataFrame chunks with bounded memory.
+    Accumulators from different chunk streams can be merged.
+    """
+
+    def __init__(self, max_tracked_values: int = 2048, bloom_bits: int = 1 << 27):
+        self.max_tracked_values = max_tracked_values
+        self.columns: Dict[Any, _ColumnAccumulator] = {}
+        self.rows = 0
+        self.chunks = 0
+        # Exact until a stream has more distinct rows than it keeps hashes for
+        self.duplicates = DuplicateCounter(bloom_bits=bloom_bits)
+        self.engine = TypeInferenceEngine()
+
+    def _column(self, col) -> _ColumnAccumulator:
+        if col not in self.columns:
+            self.columns[col] = _ColumnAccumulator(col, self.max_tracked_values, self.engine)
+        return self.columns[col]
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.chunks += 1
+        self.rows += len(chunk)
+        for col in chunk.columns:
+            self._column(col).update(chunk[col])
+        if not chunk.empty:
+            self.duplicates.add(chunk_row_hashes(chunk))
+
+    @property
+    def duplicate_rows(self) -> int:
+        return self.duplicates.duplicates
+
+    def merge(self, other: "ChunkedIssueAccumulator") -> None:
+        for col, acc in other.columns.items():
+            self._column(col).merge(acc)
+        self.rows += other.rows
+        self.chunks += other.chunks
+        self.duplicates.merge(other.duplicates)
+        for col, fmt in other.engine.formats.items():
+            self.engine.formats.setdefault(col, fmt)
+
+    def column_stats(self) -> Dict[str, Any]:
+        """
+        The same statistics layout `compute_column_stats` produces for an in-memory frame.
+        """
+        columns = list(self.columns)
+        object_cols = [c for c in columns if self.columns[c].is_object]
+        numeric_cols = [c for c in columns if self.columns[c].is_numeric]
+        stats = {
+            'n_rows': self.rows,
+            'columns': columns,
+            'object_columns': object_cols,
+            'categorical_columns': object_cols,
+            'numeric_columns': numeric_cols,
+            'null_count': {c: acc.nulls for c, acc in self.columns.items()},
+            'nunique': {c: acc.nunique for c, acc in self.columns.items()},
+            'nunique_all': {c: acc.nunique + (1 if acc.nulls else 0) for c, acc in self.columns.items()},
+            'type_counts': {c: acc.type_counts() for c, acc in self.columns.items()},
+            'all_zero': {c: acc.all_zero and not acc.is_object for c, acc in self.columns.items()},
+            'datetime_unparseable': {c: self.columns[c].datetime_unparseable for c in object_cols},
+            'inferred_types': {c: acc.inferred_type(self.rows) for c, acc in self.columns.items()},
+        }
+
+        top_freq = {}
+        for col in object_cols:
+            acc = self.columns[col]
+            non_null = acc.rows - acc.nulls
+            top_freq[col] = float(acc.values.max() / non_null) if non_null > 0 and len(acc.values) else 0.0
+        stats['top_freq'] = top_freq
+
+        outliers = {}
+        for col in numeric_cols:
+            digest = self.columns[col].digest
+            if digest.count == 0:
+                outliers[col] = 0
+                continue
+            q1, q3 = digest.quantile(0.25), digest.quantile(0.75)
+            iqr = q3 - q1
+            lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+            below = digest.cdf(lower) if lower > digest.min else 0.0
+            above = 1.0 - digest.cdf(upper) if upper < digest.max else 0.0
+            outliers[col] = int(round(digest.count * (below + above)))
+        stats['outliers'] = outliers
+        return stats
+
+    def approximate_fields(self) -> List[str]:
+        approximate = []
+        if self.chunks > 1:
+            approximate += ['potential_datetime_parse_issues', 'inferred_types']
+        # Cells such as '1' and 1 are different values to df.duplicated() but may read alike
+        # in differently typed chunks
+        if not self.duplicates.exact or any(acc.is_object and len(acc.kinds) > 1 for acc in self.columns.values()):
+            approximate.insert(0, 'duplicate_rows')
+        if any(acc.is_numeric and acc.digest.count for acc in self.columns.values()):
+            approximate.append('outliers')
+        if any(acc.is_object and len(acc.kinds) > 1 for acc in self.columns.values()):
+            # Which cells keep a numeric type depends on where the chunk boundaries fall
+            approximate += ['type_inconsistencies', 'mixed_type_object_columns']
+        if any(acc.values_truncated for acc in self.columns.values()):
+            approximate += ['high_cardinality_columns', 'highly_imbalanced_categoricals']
+        return approximate
+
+    def report(self) -> Tuple[Dict[str, Any], List[str]]:
+        return issues_from_stats(self.column_stats(), self.duplicate_rows), self.approximate_fields()
+
+
+def accumulate_chunks(chunks: Iterable[pd.DataFrame], max_tracked_values: int = 2048) -> ChunkedIssueAccumulator:
+    acc = ChunkedIssueAccumulator(max_tracked_values=max_tracked_values)
+    for chunk in chunks:
+        acc.update(chunk)
+    return acc
+
+
+def analyze_issues_chunked(chunks: Iterable[pd.DataFrame], max_tracked_values: int = 2048) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Streams DataFrame chunks through mergeable accumulators.
+    Returns (issues, approximate) where approximate lists issue keys backed by sketches.
+    """
+    return accumulate_chunks(chunks, max_tracked_values).report()
+
+
+def accumulate_csv(source, chunksize: int = 100_000, read_csv_kwargs: Optional[Dict[str, Any]] = None) -> ChunkedIssueAccumulator:
+    """
+    Out-of-core pass over a CSV too large for memory; call `.report()` on the result.
+    """
+    with pd.read_csv(source, chunksize=chunksize, **(read_csv_kwargs or {})) as reader:
+        return accumulate_chunks(reader)
@@ -0,0 +1,174 @@
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Categorical strings: few distinct values, absolutely or relative to the row count
+_CATEGORICAL_MAX_UNIQUE = 50
+_CATEGORICAL_MAX_RATIO = 0.05
+
+_UNSET = object()
+
+
+def stratified_positions(n: int, size: int, seed: int = 0) -> np.ndarray:
+    """
+    `size` sorted positions in [0, n): one random position from each of `size` equal strata,
+    with position 0 always included. Returns every position when n <= size.
+    """
+    if n <= size:
+        return np.arange(n)
+    edges = np.linspace(0, n, size + 1).astype(np.int64)
+    rng = np.random.default_rng(seed)
+    positions = edges[:-1] + (rng.random(size) * (edges[1:] - edges[:-1])).astype(np.int64)
+    positions[0] = 0
+    return positions
+
+
+class TypeInferenceEngine:
+    """
+    Sample-first type and datetime inference. Each check looks at a stratified sample of the
+    column and only runs the full-column vectorized check when the sample cannot decide it.
+    The datetime format inferred for a column is cached and reused, e.g. across chunks.
+    """
+
+    def __init__(self, sample_size: int = 256, seed: int = 0):
+        self.sample_size = sample_size
+        self.seed = seed
+        self.formats: Dict[Any, Optional[str]] = {}
+        # How often each check was decided by the sample vs. escalated to the full column
+        self.decided_by_sample = Counter()
+        self.escalated = Counter()
+
+    def _sample(self, values: np.ndarray) -> np.ndarray:
+        return values[stratified_positions(len(values), self.sample_size, self.seed)]
+
+    def type_counter(self, values: np.ndarray, null_mask: Optional[np.ndarray] = None) -> Counter:
+        """
+        Counter of the Python type of every cell of an object array, keyed in order of first
+        appearance like Counter(map(type, values)). When the sample holds only strings and nulls,
+        one vectorized pass verifies the column instead of a Python-level loop over every cell.
+        Pass the column's null mask if it is already known.
+        """
+        if len(values) == 0:
+            return Counter()
+        sample = self._sample(values)
+        if set(map(type, sample[~pd.isna(sample)])) - {str}:
+            # Other types already show up in the sample: every cell has to be counted
+            self.decided_by_sample['type_counts'] += 1
+            return Counter(map(type, values))
+        self.escalated['type_counts'] += 1
+        null_mask = pd.isna(values) if null_mask is None else null_mask
+        non_null = values[~null_mask]
+        if len(non_null) and infer_dtype(non_null, skipna=False) != 'string':
+            return Counter(map(type, values))
+        # Only the null cells (None, NaN, NaT) still need their types looked at
+        null_types = Counter(map(type, values[null_mask]))
+        if not len(non_null):
+            return null_types
+        counts = Counter({str: len(non_null)})
+        if null_mask[0]:
+            # Keep first-appearance order: the column starts with a null
+            null_types.update(counts)
+            return null_types
+        counts.update(null_types)
+        return counts
+
+    def datetime_format(self, col, first: Any) -> Optional[str]:
+        """
+        The strftime format pandas would infer from a column's first non-null value, cached per column.
+        """
+        fmt = self.formats.get(col, _UNSET)
+        if fmt is _UNSET:
+            fmt = guess_datetime_format(first) if isinstance(first, str) else None
+            self.formats[col] = fmt
+        return fmt
+
+    def datetime_unparseable(self, col, uniques: np.ndarray) -> bool:
+        """
+        Whether `pd.to_datetime(uniques, errors='raise')` fails. The format is inferred from the
+        first value, as pandas does, so a sampled value that fails to parse decides the column;
+        only a fully parseable sample needs the check on every distinct value.
+        """
+        if len(uniques) == 0:
+            return False
+        fmt = self.datetime_format(col, uniques[0])
+        sample = self._sample(uniques)
+        if not self._parses(sample, fmt):
+            self.decided_by_sample['datetime'] += 1
+            return True
+        if len(sample) == len(uniques):
+            self.decided_by_sample['datetime'] += 1
+            return False
+        self.escalated['datetime'] += 1
+        return not self._parses(uniques, fmt)
+
+    @staticmethod
+    def _parses(values: np.ndarray, fmt: Optional[str]) -> bool:
+        try:
+            if fmt is None:
+                pd.to_datetime(values, errors='raise')
+            else:
+                pd.to_datetime(values, format=fmt, errors='raise')
+            return True
+        except Exception:
+            return False
+
+    def numeric_strings(self, uniques: np.ndarray) -> bool:
+        """
+        Whether every distinct value is a string that parses as a number.
+        """
+        if len(uniques) == 0:
+            return False
+        sample = self._sample(uniques)
+        if pd.to_numeric(pd.Series(sample, dtype=object), errors='coerce').isna().any():
+            self.decided_by_sample['numeric_strings'] += 1
+            return False
+        if len(sample) == len(uniques):
+            self.decided_by_sample['numeric_strings'] += 1
+            return True
+        self.escalated['numeric_strings'] += 1
+        return not pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').isna().any()
+
+    def infer_type(self, col, kind: str, n_rows: int, null_count: int, nunique: int,
+                   uniques: Optional[np.ndarray] = None, datetime_unparseable: Optional[bool] = None) -> str:
+        """
+        Semantic type of a column: integer, float, boolean, complex, datetime, timedelta,
+        categorical, numeric_string, datetime_string[<format>], text, mixed, empty, or another
+        `infer_dtype` name for uncommon object contents. `kind` is the numpy dtype kind, or
+        'category'; object columns ('O') are classified from their distinct non-null `uniques`.
+        """
+        if null_count >= n_rows:
+            return 'empty'
+        simple = {'i': 'integer', 'u': 'integer', 'f': 'float', 'b': 'boolean', 'c': 'complex',
+                  'M': 'datetime', 'm': 'timedelta', 'category': 'categorical'}
+        if kind in simple:
+            return simple[kind]
+        if uniques is None or len(uniques) == 0:
+            return 'empty' if uniques is not None else 'object'
+        inferred = infer_dtype(uniques, skipna=True)
+        if inferred.startswith('mixed'):
+            return 'mixed'
+        if inferred != 'string':
+            return inferred
+        if self.numeric_strings(uniques):
+            return 'numeric_string'
+        if datetime_unparseable is False:
+            fmt = self.formats.get(col)
+            return f'datetime_string[{fmt}]' if fmt else 'datetime_string'
+        if nunique <= max(_CATEGORICAL_MAX_UNIQUE, _CATEGORICAL_MAX_RATIO * n_rows):
+            return 'categorical'
+        return 'text'
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'decided_by_sample': dict(self.decided_by_sample),
+            'escalated': dict(self.escalated),
+            'formats': dict(self.formats),
+        }
@@ -0,0 +1,63 @@
+import time
+
+from starlette.routing import Match
+
+from src.observability.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS, METRICS_ENABLED
+from src.observability.tracing import tracer
+
+
+def _endpoint(scope) -> str:
+    # The route template (/datasets/{dataset_id}/report), so ids do not multiply label values
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware recording, per route template, request counts by status, latency up to
+    the last byte of the response (streamed responses included; background tasks excluded)
+    and requests in flight, and opening each request's root trace span. Passes requests
+    straight through when both metrics and tracing are disabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (METRICS_ENABLED or tracer.enabled):
+            await self.app(scope, receive, send)
+            return
+        method, endpoint = scope["method"], _endpoint(scope)
+        start = time.perf_counter()
+        status = 500
+        finished = False
+        span = tracer.span(f"{method} {endpoint}", method=method, path=scope["path"])
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+            HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+            span.set(status_code=status)
+            span.end()
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        HTTP_IN_FLIGHT.inc(endpoint=endpoint)
+        try:
+            with span:
+                await self.app(scope, receive, send_and_record)
+        finally:
+            finish()
@@ -0,0 +1,146 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+# Spans are appended as JSON lines to TRACE_FILE; without it tracing is off and span() hands
+# out one shared no-op span
+TRACE_FILE = os.environ.get("TRACE_FILE") or None
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> "_NoopSpan":
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    One timed operation. Spans opened while another is current (in the same task, or in a
+    thread it started through run_in_threadpool) become its children and share its trace_id.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        parent = _current.get()
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self._token = None
+        self._ended = False
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def activate(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "status": "error" if error is not None else "ok",
+            "attributes": self.attributes,
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        self.tracer.export(record)
+
+    def __enter__(self) -> "Span":
+        return self.activate()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        self.end(exc)
+
+
+class Tracer:
+    """
+    Writes finished spans to `path`, one JSON object per line, or does nothing when `path`
+    is None.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def span(self, name: str, **attributes):
+        """
+        A span to use as a context manager; with a span already current it becomes a child.
+        """
+        if self.path is None:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def export(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+                self.exported += 1
+            except OSError as e:
+                self.failures += 1
+                print(f"Writing a trace span to {self.path} failed: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "path": self.path, "exported": self.exported, "failures": self.failures}
+
+
+def current_span():
+    """
+    The innermost active span, or the no-op span; use it to attach attributes from code
+    that does not open spans itself.
+    """
+    span = _current.get()
+    return span if span is not None else _NOOP_SPAN
+
+
+tracer = Tracer(TRACE_FILE)
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Any, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Converted datasets live here as uncompressed Arrow IPC files so reads can be memory-mapped
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+
+# Dataset ids are truncated SHA-256 digests (see src.api.dataset_store.hash_upload)
+_DATASET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def valid_dataset_id(dataset_id: str) -> bool:
+    return isinstance(dataset_id, str) and bool(_DATASET_ID_RE.match(dataset_id))
+
+
+def data_path(dataset_id: str, suffix: str) -> str:
+    """
+    Path of one of a dataset's files under DATA_DIR. Raises ValueError for anything but a
+    dataset id, so a request cannot reach files outside it (e.g. with "../").
+    """
+    if not valid_dataset_id(dataset_id):
+        raise ValueError(f"Invalid dataset id '{dataset_id}'")
+    return os.path.join(DATA_DIR, f"{dataset_id}{suffix}")
+
+
+def dataset_path(dataset_id: str) -> str:
+    return data_path(dataset_id, ".arrow")
+
+
+def metadata_path(dataset_id: str) -> str:
+    return data_path(dataset_id, ".json")
+
+
+def has_dataset(dataset_id: str) -> bool:
+    return os.path.exists(dataset_path(dataset_id))
+
+
+def _write_ipc(path: str, schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> str:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    # Atomic so concurrent workers never map a half-written file
+    os.replace(tmp_path, path)
+    return path
+
+
+def _write_batches(dataset_id: str, schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> str:
+    return _write_ipc(dataset_path(dataset_id), schema, batches)
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    # pandas' C parser leaves columns mixing numbers and text (e.g. one "x" in an integer
+    # column) as object columns Arrow cannot type; those are stored as strings
+    columns = {}
+    for col in df.columns[(df.dtypes == object).to_numpy()]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df.assign(**columns) if columns else df, preserve_index=False)
+
+
+def write_dataset(dataset_id: str, df: pd.DataFrame) -> str:
+    """
+    Converts a DataFrame to an Arrow IPC file; content-addressed, so existing files are reused.
+    Object columns mixing types are stored as strings.
+    """
+    if has_dataset(dataset_id):
+        return dataset_path(dataset_id)
+    table = _to_table(df)
+    return _write_batches(dataset_id, table.schema, table.to_batches())
+
+
+def convert_csv(dataset_id: str, source, block_size: int = 16 << 20, columns: Optional[List[str]] = None) -> str:
+    """
+    Streams a CSV (optionally only `columns`) into an Arrow IPC file batch by batch, without
+    holding it in memory. Columns whose type changes after the first block are re-read as strings.
+    """
+    if has_dataset(dataset_id):
+        return dataset_path(dataset_id)
+    read_options = pa_csv.ReadOptions(block_size=block_size)
+    try:
+        reader = pa_csv.open_csv(source, read_options=read_options, convert_options=pa_csv.ConvertOptions(include_columns=columns))
+        return _write_batches(dataset_id, reader.schema, reader)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        header = columns or pa_csv.open_csv(source, read_options=read_options).schema.names
+        source.seek(0)
+        convert_options = pa_csv.ConvertOptions(column_types={name: pa.string() for name in header}, include_columns=columns)
+        reader = pa_csv.open_csv(source, read_options=read_options, convert_options=convert_options)
+        return _write_batches(dataset_id, reader.schema, reader)
+
+
+def load_table(dataset_id: str, columns: Optional[List[str]] = None) -> Optional[pa.Table]:
+    """
+    Memory-maps a stored dataset. Buffers point into the OS page cache (zero-copy), so only
+    the pages of the selected columns are ever read and worker processes share them.
+    """
+    if not has_dataset(dataset_id):
+        return None
+    source = pa.memory_map(dataset_path(dataset_id), "r")
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+
+def load_dataset(dataset_id: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    table = load_table(dataset_id, columns)
+    if table is None:
+        return None
+    # split_blocks avoids consolidating columns into 2D blocks, which would force a copy
+    return table.to_pandas(split_blocks=True)
+
+
+def write_metadata(dataset_id: str, metadata: Dict[str, Any]) -> None:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = metadata_path(dataset_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def read_metadata(dataset_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(metadata_path(dataset_id), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def outlier_scores_path(dataset_id: str) -> str:
+    return data_path(dataset_id, ".outliers.npy")
+
+
+def write_outlier_scores(dataset_id: str, scores: np.ndarray) -> None:
+    """
+    Stores a dataset's latest per-row outlier scores, where render workers can memory-map them.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = outlier_scores_path(dataset_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, scores)
+    os.replace(tmp_path, path)
+
+
+def load_outlier_scores(dataset_id: str) -> Optional[np.ndarray]:
+    try:
+        return np.load(outlier_scores_path(dataset_id), mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+
+def cleaned_path(dataset_id: str) -> str:
+    return data_path(dataset_id, ".cleaned.arrow")
+
+
+def write_cleaned(dataset_id: str, schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> str:
+    """
+    Streams a dataset's cleaned batches (see src.cleaning.pipeline) into an Arrow IPC file,
+    replacing the previous cleaned version.
+    """
+    return _write_ipc(cleaned_path(dataset_id), schema, batches)
@@ -0,0 +1,363 @@
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# "pyarrow" parses CSVs with Arrow's multithreaded reader (falling back to pandas' C parser
+# when a file needs pandas-specific handling); "c" always uses pandas' C parser
+INGEST_ENGINE = os.environ.get("INGEST_ENGINE", "pyarrow")
+# Low-cardinality string columns become categoricals and integers are downcast on load
+INGEST_COMPACT_DTYPES = os.environ.get("INGEST_COMPACT_DTYPES", "1") not in ("0", "false", "no")
+
+# Bytes of the CSV read first to plan column types
+_SAMPLE_BYTES = 1 << 20
+# String columns with at most this share of distinct values in the sample become categoricals
+_CATEGORY_MAX_RATIO = 0.5
+# Integers are not downcast below int32, so arithmetic in generated plot code rarely overflows
+_INT32 = np.iinfo(np.int32)
+
+# pandas' default NA strings and booleans, so both engines read the same cells as missing/bool
+_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>",
+              "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+_TRUE_VALUES = ["True", "TRUE", "true"]
+_FALSE_VALUES = ["False", "FALSE", "false"]
+
+_MAGIC = [(b"\x1f\x8b", "gzip"), (b"\x28\xb5\x2f\xfd", "zstd")]
+_EXTENSIONS = {".parquet": "parquet", ".pq": "parquet", ".feather": "feather", ".arrow": "feather", ".ipc": "feather"}
+
+
+def sniff(head: bytes, filename: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    (format, compression) of a file from its first bytes, or its extension: format is "csv",
+    "parquet" or "feather", compression "gzip", "zstd" or None.
+    """
+    for magic, compression in _MAGIC:
+        if head.startswith(magic):
+            return "csv", compression
+    if head.startswith(b"PAR1"):
+        return "parquet", None
+    if head.startswith((b"ARROW1", b"FEA1")):
+        return "feather", None
+    ext = os.path.splitext(filename or "")[1].lower()
+    return _EXTENSIONS.get(ext, "csv"), None
+
+
+def _copy(source, out, digest, block_size: int = 1 << 20) -> int:
+    size = 0
+    while True:
+        block = source.read(block_size)
+        if not block:
+            return size
+        digest.update(block)
+        out.write(block)
+        size += len(block)
+
+
+def stage_upload(fileobj, filename: Optional[str] = None, directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Streams an upload into a file on disk in one pass, hashing it on the way (the same digest
+    as src.api.dataset_store.hash_upload) and decompressing gzip/zstd CSVs, so the digest is
+    that of the data whichever way it was sent. Returns the staged file's `path`, `format`,
+    original `compression`, `digest` and size in `bytes`; the caller removes the file.
+    """
+    head = fileobj.read(8)
+    fileobj.seek(0)
+    fmt, compression = sniff(head, filename)
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}", prefix="upload-", dir=directory)
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if compression:
+                source = pa.CompressedInputStream(pa.PythonFile(fileobj, mode="r"), compression)
+                size = _copy(source, out, digest)
+            else:
+                size = _copy(fileobj, out, digest)
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        fileobj.seek(0)
+    return {"path": path, "format": fmt, "compression": compression, "digest": digest.hexdigest()[:32], "bytes": size}
+
+
+class UploadStager:
+    """
+    stage_upload() for an upload that arrives in pieces, e.g. a request body as it is read:
+    each piece is hashed and written to the staged file as it comes, so the upload is not
+    spooled anywhere else first. Compressed CSVs are written as they arrive and decompressed
+    into the staged file by finish(). Call abort() instead when the upload fails.
+    """
+
+    def __init__(self, filename: Optional[str] = None, directory: Optional[str] = None):
+        self.filename = filename
+        self.directory = directory
+        self.format: Optional[str] = None
+        self.compression: Optional[str] = None
+        self._head = b""
+        self._out = None
+        self._path: Optional[str] = None
+        self._digest = hashlib.sha256()
+        self._size = 0
+
+    def _open(self) -> None:
+        self.format, self.compression = sniff(self._head, self.filename)
+        fd, self._path = tempfile.mkstemp(suffix=f".{self.compression or self.format}", prefix="upload-",
+                                          dir=self.directory)
+        self._out = os.fdopen(fd, "wb")
+        head, self._head = self._head, b""
+        self._emit(head)
+
+    def _emit(self, data: bytes) -> None:
+        if not self.compression:
+            self._digest.update(data)
+        self._out.write(data)
+        self._size += len(data)
+
+    def write(self, data: bytes) -> None:
+        if self._out is not None:
+            self._emit(data)
+            return
+        # The format is sniffed from the first bytes, which may come in more than one piece
+        self._head += data
+        if len(self._head) >= 8:
+            self._open()
+
+    def finish(self) -> Dict[str, Any]:
+        if self._out is None:
+            self._open()
+        self._out.close()
+        if not self.compression:
+            return {"path": self._path, "format": self.format, "compression": None,
+                    "digest": self._digest.hexdigest()[:32], "bytes": self._size}
+        try:
+            with open(self._path, "rb") as f:
+                return stage_upload(f, self.filename, self.directory)
+        finally:
+            os.remove(self._path)
+
+    def abort(self) -> None:
+        if self._out is not None:
+            self._out.close()
+            if os.path.exists(self._path):
+                os.remove(self._path)
+
+
+def stage_path(path: str) -> Dict[str, Any]:
+    """
+    stage_upload() for a local file: compressed CSVs are decompressed to a temporary file
+    (`owned`, for the caller to remove); other files are only hashed where they are.
+    """
+    with open(path, "rb") as f:
+        fmt, compression = sniff(f.read(8), path)
+        f.seek(0)
+        if compression:
+            return dict(stage_upload(f, path), owned=True)
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+        size = f.tell()
+    return {"path": path, "format": fmt, "compression": None, "digest": digest.hexdigest()[:32], "bytes": size, "owned": False}
+
+
+def dataset_key(digest: str, columns: Optional[List[str]] = None) -> str:
+    # A projection is a different dataset than the whole file
+    if not columns:
+        return digest
+    return hashlib.sha256(f"{digest}:{','.join(map(str, columns))}".encode()).hexdigest()[:32]
+
+
+def column_names(path: str, fmt: str = "csv") -> List[str]:
+    if fmt == "parquet":
+        return pq.read_schema(path).names
+    if fmt == "feather":
+        # Memory-mapped, so no column data is read
+        return feather.read_table(path, memory_map=True).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _csv_options(columns: Optional[List[str]] = None, column_types: Optional[Dict[str, pa.DataType]] = None):
+    return pa_csv.ConvertOptions(null_values=_NA_VALUES, true_values=_TRUE_VALUES, false_values=_FALSE_VALUES,
+                                 strings_can_be_null=True, include_columns=columns, column_types=column_types)
+
+
+def _plan_types(sample: pa.RecordBatch, compact: bool) -> Optional[Dict[str, pa.DataType]]:
+    """
+    Column types for the full parse, chosen from the first block so they match what
+    pandas.read_csv would infer, with low-cardinality strings dictionary-encoded. None when
+    the sample shows something only pandas' parser reads the same way.
+    """
+    names = sample.schema.names
+    if len(set(names)) != len(names) or "" in names:
+        # pandas renames duplicate and empty headers ("a.1", "Unnamed: 0")
+        return None
+    types = {}
+    for name, column in zip(names, sample.columns):
+        kind = column.type
+        if pa.types.is_temporal(kind):
+            # pandas leaves dates and times as strings unless asked to parse them
+            column, kind = pc.cast(column, pa.string()), pa.string()
+        if pa.types.is_null(kind):
+            types[name] = pa.float64()
+        elif pa.types.is_string(kind):
+            trimmed = pc.utf8_trim_whitespace(column)
+            if not pc.all(pc.equal(trimmed, column)).as_py() and _parses_as_number(trimmed):
+                # pandas reads numbers padded with spaces as numbers
+                return None
+            distinct = pc.count_distinct(column).as_py()
+            low = distinct <= _CATEGORY_MAX_RATIO * (len(column) - column.null_count)
+            types[name] = pa.dictionary(pa.int32(), pa.string()) if compact and low else pa.string()
+        else:
+            types[name] = kind
+    return types
+
+
+def _parses_as_number(column: pa.Array) -> bool:
+    try:
+        pc.cast(column, pa.float64())
+        return True
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return False
+
+
+def _read_csv_arrow(path: str, columns: Optional[List[str]], compact: bool) -> Optional[pa.Table]:
+    try:
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=_SAMPLE_BYTES, use_threads=False),
+                                 convert_options=_csv_options(columns))
+        sample = reader.read_next_batch()
+        reader.close()
+    except StopIteration:
+        return None
+    except pa.ArrowInvalid as e:
+        print(f"Arrow CSV reader cannot read {path} ({e}); using pandas")
+        return None
+    types = _plan_types(sample, compact)
+    if types is None:
+        return None
+    try:
+        return pa_csv.read_csv(path, read_options=pa_csv.ReadOptions(use_threads=True, block_size=16 << 20),
+                               convert_options=_csv_options(columns, types))
+    except pa.ArrowInvalid as e:
+        # A value further down does not fit the type planned from the first block
+        print(f"Arrow CSV reader cannot read {path} ({e}); using pandas")
+        return None
+
+
+def _compact_table(table: pa.Table, strings: bool = True) -> pa.Table:
+    """
+    Downcasts int64 columns that fit to int32 and, with `strings`, dictionary-encodes
+    low-cardinality string columns (CSV columns are already encoded while parsing).
+    """
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if pa.types.is_int64(field.type) and len(column) and not column.null_count:
+            bounds = pc.min_max(column)
+            if _INT32.min <= bounds["min"].as_py() and bounds["max"].as_py() <= _INT32.max:
+                table = table.set_column(i, field.name, pc.cast(column, pa.int32()))
+        elif strings and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            present = len(column) - column.null_count
+            if present and pc.count_distinct(column).as_py() <= _CATEGORY_MAX_RATIO * present:
+                table = table.set_column(i, field.name, column.dictionary_encode())
+    return table
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    for col in df.columns:
+        # Arrow nulls come back as None in object columns; read_csv leaves NaN there
+        if df[col].dtype == object:
+            values = df[col].to_numpy()
+            missing = pd.isna(values)
+            if missing.any():
+                values = values.copy()
+                values[missing] = np.nan
+                df[col] = values
+    return df
+
+
+def _compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # _compact_table() for a frame read by pandas; categories keep the order of first appearance
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == np.int64 and len(series) and _INT32.min <= series.min() and series.max() <= _INT32.max:
+            df[col] = series.astype(np.int32)
+        elif series.dtype == object:
+            codes, uniques = pd.factorize(series)
+            present = int((codes >= 0).sum())
+            if present and len(uniques) <= _CATEGORY_MAX_RATIO * present and pd.api.types.infer_dtype(uniques) == "string":
+                df[col] = pd.Categorical.from_codes(codes, uniques)
+    return df
+
+
+def _default_nbytes(df: pd.DataFrame, usage: pd.Series) -> int:
+    """
+    Estimated deep memory of the frame as a plain read_csv would load it, from its own
+    memory `usage`: int64 instead of downcast integers, and Python strings (plus NaN for
+    missing cells) instead of categoricals.
+    """
+    total = int(usage.sum())
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == np.int32:
+            total += 4 * len(series)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+            sizes = np.fromiter(map(sys.getsizeof, series.cat.categories), dtype=np.int64, count=len(counts))
+            as_object = 8 * len(codes) + int(counts @ sizes) + sys.getsizeof(np.nan) * int((codes < 0).sum())
+            total += as_object - int(usage[col])
+    return total
+
+
+def read_frame(path: str, fmt: str = "csv", columns: Optional[List[str]] = None, compact: Optional[bool] = None,
+               engine: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Loads a staged CSV (see stage_upload), Parquet or Feather file, optionally only `columns`,
+    with compact dtypes (INGEST_COMPACT_DTYPES). CSVs are parsed by Arrow with pandas' type
+    rules (INGEST_ENGINE), so the frame holds the values read_csv would give. Returns the
+    frame and ingestion stats: engine, parse time, memory used and the memory saved compared
+    with a plain read_csv.
+    """
+    compact = INGEST_COMPACT_DTYPES if compact is None else compact
+    engine = INGEST_ENGINE if engine is None else engine
+    start = time.perf_counter()
+    table = None
+    if fmt == "parquet":
+        table = pq.read_table(path, columns=columns, use_threads=True, memory_map=True)
+        engine = "parquet"
+    elif fmt == "feather":
+        table = feather.read_table(path, columns=columns, use_threads=True, memory_map=True)
+        engine = "feather"
+    elif engine == "pyarrow":
+        table = _read_csv_arrow(path, columns, compact)
+    if table is not None:
+        df = _to_pandas(_compact_table(table, strings=fmt != "csv") if compact else table)
+    else:
+        engine = "c"
+        df = pd.read_csv(path, usecols=columns)
+        if compact:
+            df = _compact_frame(df)
+    parse_seconds = time.perf_counter() - start
+    usage = df.memory_usage(index=True, deep=True)
+    memory = int(usage.sum())
+    default = _default_nbytes(df, usage) if compact else memory
+    return df, {
+        "format": fmt,
+        "engine": engine,
+        "parse_seconds": round(parse_seconds, 4),
+        "rows": len(df),
+        "memory_bytes": memory,
+        "default_memory_bytes": default,
+        "memory_saved_bytes": default - memory,
+        "compacted_columns": {str(col): str(df[col].dtype) for col in df.columns
+                              if df[col].dtype == np.int32 or isinstance(df[col].dtype, pd.CategoricalDtype)},
+    }
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.storytelling.prompt_builder import estimate_tokens
+
+
+def _turn_tokens(turn: List[str]) -> int:
+    return estimate_tokens(f"User: {turn[0]}\nAssistant: {turn[1]}") + 2
+
+
+class ChatSessionStore:
+    """
+    Server-side chat sessions. Each keeps the dataset context block built when the session
+    started, a window of recent turns bounded by `history_budget` tokens, and a running summary
+    of the turns that fell out of the window. Summaries are refreshed by a background task after
+    a reply, so they never delay one.
+    """
+
+    def __init__(self, history_budget: int = 1000, max_sessions: int = 1000, idle_seconds: float = 3600.0):
+        self.history_budget = history_budget
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def open(self, session_id: Optional[str], dataset_id: Optional[str],
+             build_context: Callable[[], Dict[str, Any]], history: Optional[list] = None) -> Dict[str, Any]:
+        """
+        Returns the session for `session_id`, creating it (with a new id when none is given) if it is
+        unknown, expired or bound to another dataset. `build_context` only runs for new sessions;
+        `history` seeds the turns of a new session, e.g. from a client that kept its own.
+        """
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None and session["dataset_id"] == dataset_id:
+                session["last_access"] = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                return session
+        session = {
+            "session_id": session_id or uuid.uuid4().hex,
+            "dataset_id": dataset_id,
+            "context": build_context(),
+            "turns": [[str(h[0]), str(h[1])] for h in history or [] if len(h) >= 2 and h[1] is not None],
+            "summary": "",
+            "summary_task": None,
+            "last_access": time.monotonic(),
+        }
+        with self._lock:
+            self._sessions[session["session_id"]] = session
+            self._evict()
+        return session
+
+    def window(self, session: Dict[str, Any]) -> List[List[str]]:
+        """
+        The most recent turns whose total estimated size fits the history budget.
+        """
+        turns, used = session["turns"], 0
+        start = len(turns)
+        while start > 0:
+            cost = _turn_tokens(turns[start - 1])
+            if used + cost > self.history_budget:
+                break
+            used += cost
+            start -= 1
+        return turns[start:]
+
+    def record(self, session: Dict[str, Any], message: str, response: str,
+               summarize: Callable[[str, List[List[str]]], Awaitable[str]]) -> None:
+        """
+        Appends a finished turn and, when older turns no longer fit the window, starts folding
+        them into the summary in the background with `summarize(summary, turns)`.
+        """
+        session["turns"].append([message, response])
+        self._schedule_summary(session, summarize)
+
+    def _schedule_summary(self, session: Dict[str, Any], summarize) -> None:
+        if session["summary_task"] is not None and not session["summary_task"].done():
+            return
+        end = len(session["turns"]) - len(self.window(session))
+        if end <= 0:
+            return
+        session["summary_task"] = asyncio.get_running_loop().create_task(self._summarize(session, end, summarize))
+
+    async def _summarize(self, session: Dict[str, Any], end: int, summarize) -> None:
+        try:
+            session["summary"] = await summarize(session["summary"], session["turns"][:end])
+            # The summary replaces these turns, so they no longer need to be kept
+            session["turns"] = session["turns"][end:]
+            self.summaries += 1
+        except Exception as e:
+            self.summary_failures += 1
+            print(f"Could not summarize chat session {session['session_id']}: {e}")
+            return
+        # Turns that overflowed while this summary was running
+        self._schedule_summary(session, summarize)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for session_id in [k for k, s in self._sessions.items() if now - s["last_access"] > self.idle_seconds]:
+            del self._sessions[session_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = len(self._sessions)
+        return {
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "history_budget": self.history_budget,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+        }
+
+
+chat_sessions = ChatSessionStore(
+    history_budget=int(os.environ.get("CHAT_HISTORY_BUDGET", 1000)),
+    max_sessions=int(os.environ.get("CHAT_MAX_SESSIONS", 1000)),
+    idle_seconds=float(os.environ.get("CHAT_SESSION_IDLE_SECONDS", 3600)),
+)
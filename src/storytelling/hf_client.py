@@ -1,76 +1,183 @@
 import os
 import re
-from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+from src.observability.metrics import LLM_FALLBACKS
+from src.observability.tracing import current_span
+from src.storytelling.llm_client import get_llm_client
 
-# Load environment variables
-load_dotenv()
+DEFAULT_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+# Summaries of older chat turns can use a smaller, cheaper model
+SUMMARY_MODEL = os.environ.get("CHAT_SUMMARY_MODEL", DEFAULT_MODEL)
 
-def get_hf_token():
-    # Prefer environment variable for cloud deployment
-    token = os.environ.get("HF_TOKEN") or os.environ.get("HF_API_KEY")
-    if not token:
-        raise RuntimeError("Hugging Face token not found in environment variable 'HF_TOKEN' or 'HF_API_KEY'. Please set it in your deployment secrets or environment.")
-    return token
+CLEANING_SYSTEM_PROMPT = (
+    "You are an expert data-cleaning assistant. Return a clean, readable Markdown manual of issues.\n"
+    "For each issue, follow EXACTLY this structure and formatting (use headings, bold labels, and fenced code):\n\n"
+    "### Issue 1: <Concise Title>\n\n"
+    "**Why this needs to be fixed:**\n<Short, direct explanation in 1-3 sentences>\n\n"
+    "**Code:**\n"
+    "```python\n<Pure, runnable Python code only. No comments outside code.>\n```\n\n"
+    "**Result:**\n<Expected outcome in 1-2 sentences>\n\n"
+    "Then continue with '### Issue 2:', etc. Do not include extra sections or raw prose."
+)
 
-def get_cleaning_suggestions_hf(data_issues, columns, model_name="meta-llama/Meta-Llama-3-8B-Instruct"):
+STORY_SYSTEM_PROMPT = (
+    "You are a senior data analyst and an expert storyteller. Your task is to analyze the provided dataset summary "
+    "and write a compelling, easy-to-understand narrative for a non-technical audience. "
+    "Focus on the key insights, trends, potential outliers, and interesting relationships between variables. "
+    "Structure your story logically. Start with a high-level overview, then dive into specific, noteworthy findings. "
+    "Conclude with a summary of the most important takeaways or potential next steps for analysis. "
+    "Do NOT produce Python code. Generate a narrative story only."
+)
+
+VISUALIZATION_SYSTEM_PROMPT = (
+    "You are a data visualization expert. Your task is to suggest a relevant and insightful "
+    "data visualization based on the provided dataset columns and head. "
+    "Your output must be a single, clean block of executable Python code using seaborn or matplotlib. "
+    "The code should be complete and ready to run, assuming a pandas DataFrame named `df` already exists. "
+    "It must include all necessary imports. "
+    "Do not add any explanation, narrative, or markdown fences. Do NOT include `pd.read_csv()`. Just the plotting code."
+)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a data analyst assistant. "
+    "Merge the previous summary and the new exchanges into one concise summary of at most 150 words. "
+    "Keep the questions asked, conclusions reached, code or columns referred to, and open follow-ups. "
+    "Return only the summary."
+)
+
+CHAT_SYSTEM_PROMPT = (
+    "You are a friendly and helpful data analyst chatbot. Your role is to assist users in understanding and exploring their dataset. "
+    "You have access to the dataset's column names, the first few rows and, when available, exact statistics of the columns the user asks about. "
+    "Prefer those statistics over estimates from the first rows. "
+    "When a user asks for a visualization, provide the Python code (using seaborn or matplotlib) in a clean, executable block. "
+    "Assume the data is in a pandas DataFrame named `df`. Do NOT include `pd.read_csv()` in your code. "
+    "For other questions, provide clear, concise answers based on the provided data context."
+)
+
+# Fallback to a minimal Markdown example
+CLEANING_FALLBACK = (
+    "### Issue 1: Handling Missing Values\n\n"
+    "**Why this needs to be fixed:**\nMissing values can affect model accuracy and create bias.\n\n"
+    "**Code:**\n```python\nimport pandas as pd\ndf['Age'].fillna(df['Age'].median(), inplace=True)\nprint('Missing values:', df['Age'].isnull().sum())\n```\n\n"
+    "**Result:**\nAge column will have no missing values."
+)
+STORY_FALLBACK = "Error: Could not generate the data story. Please check the logs."
+VISUALIZATION_FALLBACK = "import matplotlib.pyplot as plt\nimport seaborn as sns\n\n# Error generating suggestion. Please check logs.\nplt.figure()\nplt.title('Error Generating Plot')\nplt.show()"
+CHAT_FALLBACK = "Error: I'm having trouble connecting to my brain right now. Please try again in a moment."
+
+
+def _failed(caller: str, error: Exception) -> None:
+    print(f"An error occurred in {caller}: {error}")
+    LLM_FALLBACKS.inc(caller=caller)
+    current_span().set(llm_error=f"{type(error).__name__}: {error}")
+
+def _messages(system_prompt: str, user_prompt: str) -> list:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+async def _complete(system_prompt: str, user_prompt: str, model_name: str, max_tokens: int, temperature: float,
+                    use_cache: bool = True) -> str:
     """
-    Use Meta-Llama-3-8B-Instruct via Hugging Face InferenceClient to get cleaning suggestions.
-    Returns a single Markdown-formatted string with clear headings and fenced Python code blocks.
+    Sends one system + user exchange through the shared async client for the novita provider.
     """
+    return await get_llm_client("novita").chat(
+        messages=_messages(system_prompt, user_prompt),
+        model=model_name,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        use_cache=use_cache,
+    )
+
+async def _stream(system_prompt: str, user_prompt: str, model_name: str, max_tokens: int, temperature: float,
+                  fallback: str, caller: str, use_cache: bool = True):
+    """
+    Yields completion text as it arrives. Errors before the first token yield the fallback instead.
+    """
+    emitted = False
     try:
-        hf_token = get_hf_token()
-        os.environ["HF_TOKEN"] = hf_token
-
-        client = InferenceClient(provider="novita", api_key=hf_token)
-
-        system_prompt = (
-            "You are an expert data-cleaning assistant. Return a clean, readable Markdown manual of issues.\n"
-            "For each issue, follow EXACTLY this structure and formatting (use headings, bold labels, and fenced code):\n\n"
-            "### Issue 1: <Concise Title>\n\n"
-            "**Why this needs to be fixed:**\n<Short, direct explanation in 1-3 sentences>\n\n"
-            "**Code:**\n"
-            "```python\n<Pure, runnable Python code only. No comments outside code.>\n```\n\n"
-            "**Result:**\n<Expected outcome in 1-2 sentences>\n\n"
-            "Then continue with '### Issue 2:', etc. Do not include extra sections or raw prose."
-        )
-
-        user_prompt = (
-            "Dataset Analysis Context:\n"
-            f"Columns: {columns}\n"
-            f"Data Issues Found: {data_issues}\n\n"
-            "Produce the Markdown manual now. Start directly with '### Issue 1:'."
-        )
-
-        completion = client.chat.completions.create(
+        async for delta in get_llm_client("novita").stream_chat(
+            messages=_messages(system_prompt, user_prompt),
             model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=2500,
-            temperature=0.2,
-        )
-
-        md = (
-            completion.choices[0].message.content.strip()
-            if hasattr(completion.choices[0].message, "content")
-            else str(completion.choices[0].message)
-        )
+            max_tokens=max_tokens,
+            temperature=temperature,
+            use_cache=use_cache,
+        ):
+            emitted = True
+            yield delta
+    except Exception as e:
+        _failed(caller, e)
+        yield "\n\n_(The response was interrupted.)_" if emitted else fallback
+
+def _cleaning_user_prompt(data_issues, columns) -> str:
+    return (
+        "Dataset Analysis Context:\n"
+        f"Columns: {columns}\n"
+        f"Data Issues Found (most severe first):\n{data_issues}\n\n"
+        "Produce the Markdown manual now. Start directly with '### Issue 1:'."
+    )
+
+def _story_user_prompt(df_head: str, df_describe: str, columns: list) -> str:
+    return (
+        "Here is a summary of the dataset I am analyzing:\n\n"
+        f"First 5 rows:\n{df_head}\n\n"
+        f"Descriptive Statistics:\n{df_describe}\n\n"
+        f"Columns: {columns}\n\n"
+        "Please generate a data story based on this information."
+    )
+
+def _visualization_user_prompt(columns: list, df_head: str) -> str:
+    return (
+        "Based on the following dataset information, please provide the Python code for a single, meaningful visualization. "
+        "Assume the data is already loaded into a pandas DataFrame called `df`.\n\n"
+        f"Columns: {columns}\n\n"
+        f"First 5 rows:\n{df_head}\n\n"
+        "Provide only the runnable Python code for the plot. Do not include `pd.read_csv()`."
+    )
+
+def _format_history(history: list) -> str:
+    return "\n".join([f"User: {h[0]}\nAssistant: {h[1]}" for h in history])
+
+def _chat_user_prompt(message: str, history: list, columns: list, df_head: str, summary: str = "", profile: str = "") -> str:
+    # Format the history for the prompt
+    formatted_history = _format_history(history)
+    earlier = f"--- Summary of Earlier Conversation ---\n{summary}\n\n" if summary else ""
+    statistics = f"Exact statistics over all rows:\n{profile}\n\n" if profile else ""
+    return (
+        "Here is the context for our conversation:\n\n"
+        f"Dataset Columns: {columns}\n"
+        f"First 5 rows of data:\n{df_head}\n\n"
+        f"{statistics}"
+        f"{earlier}"
+        "--- Conversation History ---\n"
+        f"{formatted_history}\n\n"
+        "--- Current Question ---\n"
+        f"User: {message}\n"
+        "Assistant:"
+    )
+
+async def get_cleaning_suggestions_hf(data_issues, columns, model_name=DEFAULT_MODEL, use_cache=True):
+    """
+    Use Meta-Llama-3-8B-Instruct via the Hugging Face async inference client to get cleaning suggestions.
+    Returns a single Markdown-formatted string with clear headings and fenced Python code blocks.
+    """
+    try:
+        md = await _complete(CLEANING_SYSTEM_PROMPT, _cleaning_user_prompt(data_issues, columns), model_name, max_tokens=2500, temperature=0.2, use_cache=use_cache)
 
         # Light cleanup: ensure python fences aren't duplicated and strip stray triple backticks
         md = re.sub(r"```python\s*```", "", md)
         return md
 
     except Exception as e:
-        print(f"An error occurred in get_cleaning_suggestions_hf: {e}")
-        # Fallback to a minimal Markdown example
-        return (
-            "### Issue 1: Handling Missing Values\n\n"
-            "**Why this needs to be fixed:**\nMissing values can affect model accuracy and create bias.\n\n"
-            "**Code:**\n```python\nimport pandas as pd\ndf['Age'].fillna(df['Age'].median(), inplace=True)\nprint('Missing values:', df['Age'].isnull().sum())\n```\n\n"
-            "**Result:**\nAge column will have no missing values."
-        )
+        _failed("get_cleaning_suggestions_hf", e)
+        return CLEANING_FALLBACK
+
+def stream_cleaning_suggestions_hf(data_issues, columns, model_name=DEFAULT_MODEL, use_cache=True):
+    """
+    Streaming variant of get_cleaning_suggestions_hf; an async generator of Markdown fragments.
+    """
+    return _stream(CLEANING_SYSTEM_PROMPT, _cleaning_user_prompt(data_issues, columns), model_name,
+                   max_tokens=2500, temperature=0.2, fallback=CLEANING_FALLBACK, caller="stream_cleaning_suggestions_hf", use_cache=use_cache)
 
 def get_default_suggestions():
     """Returns a list of default fallback suggestions in the correct format."""
@@ -79,138 +186,74 @@ def get_default_suggestions():
         "Issue 2: Remove Duplicate Rows\n\nWhy this needs to be fixed:\nDuplicate entries can skew analysis and model training.\n\nCode:\nimport pandas as pd\nprint('Duplicates found:', df.duplicated().sum())\ndf.drop_duplicates(inplace=True)\nprint('Dataset shape after removal:', df.shape)\n\nResult:\nClean dataset without duplicate entries.",
     ]
 
-def get_data_story_hf(df_head: str, df_describe: str, columns: list, model_name="meta-llama/Meta-Llama-3-8B-Instruct"):
+async def get_data_story_hf(df_head: str, df_describe: str, columns: list, model_name=DEFAULT_MODEL, use_cache=True):
     """
     Generates a data story using a Hugging Face model.
     """
     try:
-        hf_token = get_hf_token()
-        client = InferenceClient(provider="novita", api_key=hf_token)
-
-        system_prompt = (
-            "You are a senior data analyst and an expert storyteller. Your task is to analyze the provided dataset summary "
-            "and write a compelling, easy-to-understand narrative for a non-technical audience. "
-            "Focus on the key insights, trends, potential outliers, and interesting relationships between variables. "
-            "Structure your story logically. Start with a high-level overview, then dive into specific, noteworthy findings. "
-            "Conclude with a summary of the most important takeaways or potential next steps for analysis. "
-            "Do NOT produce Python code. Generate a narrative story only."
-        )
-
-        user_prompt = (
-            "Here is a summary of the dataset I am analyzing:\n\n"
-            f"First 5 rows:\n{df_head}\n\n"
-            f"Descriptive Statistics:\n{df_describe}\n\n"
-            f"Columns: {columns}\n\n"
-            "Please generate a data story based on this information."
-        )
-
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=1500,
-            temperature=0.5, # Slightly higher temperature for more creative storytelling
-        )
-        
-        story = completion.choices[0].message.content.strip() if hasattr(completion.choices[0].message, 'content') else str(completion.choices[0].message)
+        # Slightly higher temperature for more creative storytelling
+        story = await _complete(STORY_SYSTEM_PROMPT, _story_user_prompt(df_head, df_describe, columns), model_name, max_tokens=1500, temperature=0.5, use_cache=use_cache)
         return story
 
     except Exception as e:
-        print(f"An error occurred in get_data_story_hf: {e}")
-        return "Error: Could not generate the data story. Please check the logs."
+        _failed("get_data_story_hf", e)
+        return STORY_FALLBACK
+
+def stream_data_story_hf(df_head: str, df_describe: str, columns: list, model_name=DEFAULT_MODEL, use_cache=True):
+    """
+    Streaming variant of get_data_story_hf.
+    """
+    return _stream(STORY_SYSTEM_PROMPT, _story_user_prompt(df_head, df_describe, columns), model_name,
+                   max_tokens=1500, temperature=0.5, fallback=STORY_FALLBACK, caller="stream_data_story_hf", use_cache=use_cache)
 
-def get_visualization_suggestion_hf(columns: list, df_head: str, model_name="meta-llama/Meta-Llama-3-8B-Instruct"):
+async def get_visualization_suggestion_hf(columns: list, df_head: str, model_name=DEFAULT_MODEL, use_cache=True):
     """
     Generates a data visualization suggestion using a Hugging Face model.
     """
     try:
-        hf_token = get_hf_token()
-        client = InferenceClient(provider="novita", api_key=hf_token)
-
-        system_prompt = (
-            "You are a data visualization expert. Your task is to suggest a relevant and insightful "
-            "data visualization based on the provided dataset columns and head. "
-            "Your output must be a single, clean block of executable Python code using seaborn or matplotlib. "
-            "The code should be complete and ready to run, assuming a pandas DataFrame named `df` already exists. "
-            "It must include all necessary imports. "
-            "Do not add any explanation, narrative, or markdown fences. Do NOT include `pd.read_csv()`. Just the plotting code."
-        )
-
-        user_prompt = (
-            "Based on the following dataset information, please provide the Python code for a single, meaningful visualization. "
-            "Assume the data is already loaded into a pandas DataFrame called `df`.\n\n"
-            f"Columns: {columns}\n\n"
-            f"First 5 rows:\n{df_head}\n\n"
-            "Provide only the runnable Python code for the plot. Do not include `pd.read_csv()`."
-        )
-
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=500,
-            temperature=0.2,
-        )
-        
-        code = completion.choices[0].message.content.strip()
-        
+        code = await _complete(VISUALIZATION_SYSTEM_PROMPT, _visualization_user_prompt(columns, df_head), model_name, max_tokens=500, temperature=0.2, use_cache=use_cache)
+
         # Clean the output to ensure it's just code
         code = re.sub(r"```python", "", code)
         code = re.sub(r"```", "", code)
-        
+
         return code.strip()
 
     except Exception as e:
-        print(f"An error occurred in get_visualization_suggestion_hf: {e}")
-        return "import matplotlib.pyplot as plt\nimport seaborn as sns\n\n# Error generating suggestion. Please check logs.\nplt.figure()\nplt.title('Error Generating Plot')\nplt.show()"
+        _failed("get_visualization_suggestion_hf", e)
+        return VISUALIZATION_FALLBACK
 
-def get_chat_response_hf(message: str, history: list, columns: list, df_head: str, model_name="meta-llama/Meta-Llama-3-8B-Instruct"):
+async def get_chat_response_hf(message: str, history: list, columns: list, df_head: str, model_name=DEFAULT_MODEL, use_cache=True,
+                               summary: str = "", profile: str = ""):
     """
     Generates a conversational response using a Hugging Face model, maintaining context.
+    `summary` stands in for turns older than `history`; `profile` holds exact statistics of
+    the columns the message is about.
     """
     try:
-        hf_token = get_hf_token()
-        client = InferenceClient(provider="novita", api_key=hf_token)
-
-        system_prompt = (
-            "You are a friendly and helpful data analyst chatbot. Your role is to assist users in understanding and exploring their dataset. "
-            "You have access to the dataset's column names and the first few rows. "
-            "When a user asks for a visualization, provide the Python code (using seaborn or matplotlib) in a clean, executable block. "
-            "Assume the data is in a pandas DataFrame named `df`. Do NOT include `pd.read_csv()` in your code. "
-            "For other questions, provide clear, concise answers based on the provided data context."
-        )
-
-        # Format the history for the prompt
-        formatted_history = "\n".join([f"User: {h[0]}\nAssistant: {h[1]}" for h in history])
-
-        user_prompt = (
-            "Here is the context for our conversation:\n\n"
-            f"Dataset Columns: {columns}\n"
-            f"First 5 rows of data:\n{df_head}\n\n"
-            "--- Conversation History ---\n"
-            f"{formatted_history}\n\n"
-            "--- Current Question ---\n"
-            f"User: {message}\n"
-            "Assistant:"
-        )
-
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=1500,
-            temperature=0.4,
-        )
-        
-        response = completion.choices[0].message.content.strip() if hasattr(completion.choices[0].message, 'content') else str(completion.choices[0].message)
+        response = await _complete(CHAT_SYSTEM_PROMPT, _chat_user_prompt(message, history, columns, df_head, summary, profile), model_name, max_tokens=1500, temperature=0.4, use_cache=use_cache)
         return response
 
     except Exception as e:
-        print(f"An error occurred in get_chat_response_hf: {e}")
-        return "Error: I'm having trouble connecting to my brain right now. Please try again in a moment."
+        _failed("get_chat_response_hf", e)
+        return CHAT_FALLBACK
+
+def stream_chat_response_hf(message: str, history: list, columns: list, df_head: str, model_name=DEFAULT_MODEL, use_cache=True,
+                            summary: str = "", profile: str = ""):
+    """
+    Streaming variant of get_chat_response_hf.
+    """
+    return _stream(CHAT_SYSTEM_PROMPT, _chat_user_prompt(message, history, columns, df_head, summary, profile), model_name,
+                   max_tokens=1500, temperature=0.4, fallback=CHAT_FALLBACK, caller="stream_chat_response_hf", use_cache=use_cache)
+
+async def summarize_chat_hf(summary: str, turns: list, model_name=SUMMARY_MODEL):
+    """
+    Folds chat turns into a running summary with a short, low-temperature completion.
+    Errors propagate so the caller can keep the previous summary.
+    """
+    user_prompt = (
+        f"Previous summary:\n{summary or '(none)'}\n\n"
+        f"New exchanges:\n{_format_history(turns)}\n\n"
+        "Updated summary:"
+    )
+    return await _complete(SUMMARY_SYSTEM_PROMPT, user_prompt, model_name, max_tokens=300, temperature=0.1)
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+# Every backend exposes the same three coroutines:
+#   complete(messages, model, max_tokens, temperature) -> str
+#   stream(messages, model, max_tokens, temperature)   -> async iterator of text deltas
+#   aclose()
+# Retries, timeouts, concurrency limits and caching live in AsyncLLMClient on top of them.
+
+
+class HFBackend:
+    """
+    Hugging Face Inference Providers (e.g. novita) through one pooled AsyncInferenceClient, or,
+    with `base_url` (HF_BASE_URL), any OpenAI-compatible chat completions server, e.g. a
+    local TGI or vLLM, or benchmarks.mock_llm_server.
+    """
+
+    name = "hf"
+
+    def __init__(self, provider: str = "novita", timeout: float = 60.0, base_url: Optional[str] = None):
+        self.provider = provider
+        self.timeout = timeout
+        self.base_url = base_url
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from huggingface_hub import AsyncInferenceClient
+            from src.storytelling.llm_client import get_hf_token
+            # The underlying HTTP session is created once and reused for every request
+            if self.base_url:
+                # A self-hosted server may not need a token
+                token = os.environ.get("HF_TOKEN") or os.environ.get("HF_API_KEY")
+                self._client = AsyncInferenceClient(base_url=self.base_url, api_key=token, timeout=self.timeout)
+            else:
+                self._client = AsyncInferenceClient(provider=self.provider, api_key=get_hf_token(), timeout=self.timeout)
+        return self._client
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        completion = await self._get_client().chat_completion(
+            messages=messages,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        message = completion.choices[0].message
+        return message.content.strip() if getattr(message, "content", None) is not None else str(message)
+
+    async def stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                     temperature: float) -> AsyncIterator[str]:
+        stream = await self._get_client().chat_completion(
+            messages=messages,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class OllamaBackend:
+    """
+    A local Ollama server. Hub model ids are not Ollama tags, so `model` (OLLAMA_MODEL) replaces them.
+    """
+
+    name = "ollama"
+
+    def __init__(self, host: str = "http://127.0.0.1:11434", model: str = "llama3"):
+        self.host = host
+        self.model = model
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import ollama
+            self._client = ollama.AsyncClient(host=self.host)
+        return self._client
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        response = await self._get_client().chat(
+            model=self.model,
+            messages=messages,
+            options={"num_predict": max_tokens, "temperature": temperature},
+        )
+        return response["message"]["content"].strip()
+
+    async def stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                     temperature: float) -> AsyncIterator[str]:
+        stream = await self._get_client().chat(
+            model=self.model,
+            messages=messages,
+            options={"num_predict": max_tokens, "temperature": temperature},
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk["message"]["content"]
+            if delta:
+                yield delta
+
+    async def aclose(self) -> None:
+        self._client = None
+
+
+_MOCK_WORDS = (
+    "the data shows a clear trend across rows with several columns that need attention "
+    "missing values duplicates outliers and skewed distributions should be reviewed first"
+).split()
+
+
+class MockBackend:
+    """
+    Offline, deterministic stand-in for a provider: the reply depends only on the request, and
+    latency is simulated as fixed overhead + time to first token + tokens / throughput.
+    """
+
+    name = "mock"
+
+    def __init__(self, latency_seconds: float = 0.05, ttft_seconds: float = 0.2,
+                 tokens_per_second: float = 50.0, response_tokens: int = 200):
+        self.latency_seconds = latency_seconds
+        self.ttft_seconds = ttft_seconds
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.calls = 0
+
+    def _tokens(self, messages: List[Dict[str, str]], model: str, max_tokens: int) -> List[str]:
+        seed = hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode("utf-8")).digest()
+        n = min(max_tokens, self.response_tokens)
+        return [_MOCK_WORDS[(seed[i % len(seed)] + i) % len(_MOCK_WORDS)] + " " for i in range(n)]
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        self.calls += 1
+        tokens = self._tokens(messages, model, max_tokens)
+        await asyncio.sleep(self.latency_seconds + self.ttft_seconds + len(tokens) / self.tokens_per_second)
+        return "".join(tokens).strip()
+
+    async def stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                     temperature: float) -> AsyncIterator[str]:
+        self.calls += 1
+        tokens = self._tokens(messages, model, max_tokens)
+        await asyncio.sleep(self.latency_seconds + self.ttft_seconds)
+        for token in tokens:
+            yield token
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def make_backend(name: str, provider: str = "novita", timeout: float = 60.0):
+    """
+    Backend by name (LLM_BACKEND): "hf" (default), "ollama" or "mock". HF_BASE_URL points the
+    hf backend at an OpenAI-compatible server; the Ollama and mock backends are configured by
+    OLLAMA_HOST / OLLAMA_MODEL and MOCK_LLM_* environment variables.
+    """
+    if name == "hf":
+        return HFBackend(provider=provider, timeout=timeout, base_url=os.environ.get("HF_BASE_URL") or None)
+    if name == "ollama":
+        return OllamaBackend(
+            host=os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434"),
+            model=os.environ.get("OLLAMA_MODEL", "llama3"),
+        )
+    if name == "mock":
+        return MockBackend(
+            latency_seconds=float(os.environ.get("MOCK_LLM_LATENCY_SECONDS", 0.05)),
+            ttft_seconds=float(os.environ.get("MOCK_LLM_TTFT_SECONDS", 0.2)),
+            tokens_per_second=float(os.environ.get("MOCK_LLM_TOKENS_PER_SECOND", 50)),
+            response_tokens=int(os.environ.get("MOCK_LLM_RESPONSE_TOKENS", 200)),
+        )
+    raise ValueError(f"Unknown LLM backend '{name}'. Use 'hf', 'ollama' or 'mock'.")
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import random
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from src.observability.metrics import (
+    LLM_COMPLETION_SIZE,
+    LLM_COMPLETION_TOKENS,
+    LLM_IN_FLIGHT,
+    LLM_LATENCY,
+    LLM_PROMPT_TOKENS,
+    LLM_REQUESTS,
+    LLM_RETRIES,
+    LLM_TTFT,
+    METRICS_ENABLED,
+)
+from src.observability.tracing import current_span, tracer
+from src.storytelling.llm_backends import make_backend
+from src.storytelling.prompt_builder import estimate_tokens
+from src.storytelling.response_cache import cache_key, response_cache
+
+# Load environment variables
+load_dotenv()
+
+# HTTP statuses worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def get_hf_token():
+    # Prefer environment variable for cloud deployment
+    token = os.environ.get("HF_TOKEN") or os.environ.get("HF_API_KEY")
+    if not token:
+        raise RuntimeError("Hugging Face token not found in environment variable 'HF_TOKEN' or 'HF_API_KEY'. Please set it in your deployment secrets or environment.")
+    return token
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Transport-level errors (connection resets, DNS) carry no response
+    return type(exc).__module__.startswith(("httpx", "aiohttp"))
+
+
+class AsyncLLMClient:
+    """
+    One long-lived, pooled async client per provider on top of an LLM backend (see
+    llm_backends). Calls are awaitable, bounded by a concurrency limit, time out individually
+    and retry transient failures with backoff.
+    """
+
+    def __init__(self, provider: str = "novita", max_concurrency: int = 8, timeout: float = 60.0,
+                 max_retries: int = 3, backoff_seconds: float = 1.0, backend: str = "hf"):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backend = make_backend(backend, provider=provider, timeout=timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _backoff(self, attempt: int, exc: Exception) -> None:
+        delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+        print(f"LLM call to {self.backend.name}:{self.provider} failed ({exc!r}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        LLM_RETRIES.inc(backend=self.backend.name)
+        current_span().set(llm_retries=attempt + 1)
+        await asyncio.sleep(delay)
+
+    async def _with_retries(self, make_call):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(make_call(), timeout=self.timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                await self._backoff(attempt, e)
+                attempt += 1
+
+    def _cache_key(self, messages, model, max_tokens, temperature) -> str:
+        return cache_key(backend=self.backend.name, provider=self.provider, model=model, messages=messages,
+                         max_tokens=max_tokens, temperature=temperature)
+
+    def _record(self, span, mode: str, model: str, messages: List[Dict[str, str]], text: Optional[str],
+                start: float, outcome: str) -> None:
+        # Upstream calls only: cache hits are counted by the response cache
+        seconds = time.perf_counter() - start
+        LLM_LATENCY.observe(seconds, backend=self.backend.name, model=model, mode=mode)
+        LLM_REQUESTS.inc(backend=self.backend.name, model=model, mode=mode, outcome=outcome)
+        span.set(outcome=outcome)
+        if text is None or not (METRICS_ENABLED or tracer.enabled):
+            return
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        completion_tokens = estimate_tokens(text)
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, backend=self.backend.name, model=model)
+        LLM_COMPLETION_TOKENS.inc(completion_tokens, backend=self.backend.name, model=model)
+        LLM_COMPLETION_SIZE.observe(completion_tokens, backend=self.backend.name, model=model)
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    async def _chat_uncached(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        start = time.perf_counter()
+        text, outcome = None, "error"
+        with tracer.span("llm.complete", backend=self.backend.name, provider=self.provider, model=model,
+                         max_tokens=max_tokens) as span, LLM_IN_FLIGHT.track(backend=self.backend.name):
+            try:
+                text = await self._with_retries(lambda: self.backend.complete(messages, model, max_tokens, temperature))
+                outcome = "ok"
+                return text
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                self._record(span, "complete", model, messages, text, start, outcome)
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float,
+                   use_cache: bool = True) -> str:
+        """
+        Completion text for the messages, served from the response cache when an identical
+        request was answered before; use_cache=False forces a fresh upstream call.
+        """
+        return await response_cache.get_or_call(
+            self._cache_key(messages, model, max_tokens, temperature),
+            lambda: self._chat_uncached(messages, model, max_tokens, temperature),
+            bypass=not use_cache,
+        )
+
+    async def stream_chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                          temperature: float, use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Yields completion text deltas as the provider produces them. A cached completion, or
+        one already in flight, is yielded in one piece; a fully streamed one is added to the cache.
+        """
+        key = self._cache_key(messages, model, max_tokens, temperature)
+        if use_cache:
+            # A completion being generated for the same request (e.g. prefetched) is awaited
+            # rather than requested again
+            cached = await response_cache.lookup(key, count_miss=False) or await response_cache.join(key)
+            if cached is None:
+                response_cache.misses += 1
+        else:
+            cached = None
+            response_cache.bypassed += 1
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        start = time.perf_counter()
+        outcome = "error"
+        # Not entered as a context manager: the generator is suspended between deltas, so its
+        # span must not become the consumer's current span
+        span = tracer.span("llm.stream", backend=self.backend.name, provider=self.provider, model=model,
+                           max_tokens=max_tokens)
+        error = None
+        LLM_IN_FLIGHT.inc(backend=self.backend.name)
+        try:
+            async for delta in self._stream_uncached(messages, model, max_tokens, temperature):
+                if not parts:
+                    ttft = time.perf_counter() - start
+                    LLM_TTFT.observe(ttft, backend=self.backend.name, model=model)
+                    span.set(ttft_ms=round(ttft * 1000, 3))
+                parts.append(delta)
+                yield delta
+            outcome = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away mid-stream
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            LLM_IN_FLIGHT.dec(backend=self.backend.name)
+            self._record(span, "stream", model, messages, "".join(parts) if parts else None, start, outcome)
+            span.end(error)
+        await response_cache.store(key, "".join(parts).strip())
+
+    async def _stream_uncached(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                               temperature: float) -> AsyncIterator[str]:
+        # The timeout applies to the gap between chunks; retries only happen before the first
+        # token reaches the caller
+        attempt = 0
+        while True:
+            emitted = False
+            try:
+                async with self._semaphore:
+                    deltas = self.backend.stream(messages, model, max_tokens, temperature).__aiter__()
+                    while True:
+                        try:
+                            delta = await asyncio.wait_for(deltas.__anext__(), timeout=self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        emitted = True
+                        yield delta
+            except Exception as e:
+                if emitted or attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                await self._backoff(attempt, e)
+                attempt += 1
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+
+_clients: Dict[str, AsyncLLMClient] = {}
+
+
+def get_llm_client(provider: str = "novita") -> AsyncLLMClient:
+    """
+    Shared client for a provider; configured by LLM_BACKEND, LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES and LLM_BACKOFF_SECONDS.
+    """
+    if provider not in _clients:
+        _clients[provider] = AsyncLLMClient(
+            provider=provider,
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 8)),
+            timeout=float(os.environ.get("LLM_TIMEOUT_SECONDS", 60)),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", 3)),
+            backoff_seconds=float(os.environ.get("LLM_BACKOFF_SECONDS", 1.0)),
+            backend=os.environ.get("LLM_BACKEND", "hf"),
+        )
+    return _clients[provider]
+
+
+async def close_llm_clients() -> None:
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
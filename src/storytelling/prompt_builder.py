@@ -0,0 +1,274 @@
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# Input-token budget for the dataset context of each endpoint's prompt
+PROMPT_BUDGETS = {
+    "cleaning": int(os.environ.get("PROMPT_BUDGET_CLEANING", 2000)),
+    "story": int(os.environ.get("PROMPT_BUDGET_STORY", 2500)),
+    "visualization": int(os.environ.get("PROMPT_BUDGET_VISUALIZATION", 1200)),
+    "chat": int(os.environ.get("PROMPT_BUDGET_CHAT", 1500)),
+    "chat_profile": int(os.environ.get("PROMPT_BUDGET_CHAT_PROFILE", 600)),
+}
+
+# How much a single occurrence of each issue type matters to the cleaning playbook
+ISSUE_SEVERITY = {
+    "high_missing_pct_columns": 0.9,
+    "missing_values": 0.8,
+    "duplicate_rows": 0.8,
+    "type_inconsistencies": 0.7,
+    "constant_columns": 0.6,
+    "all_zero_columns": 0.6,
+    "outliers": 0.5,
+    "multivariate_outliers": 0.5,
+    "robust_outliers": 0.45,
+    "single_unique_columns": 0.5,
+    "highly_imbalanced_categoricals": 0.4,
+    "all_same_string_columns": 0.4,
+    "potential_datetime_parse_issues": 0.3,
+    "high_cardinality_columns": 0.2,
+}
+# Subsumed by another issue type for the same column: entries for columns the other issue
+# type also lists are left out (a column with one value plus NaNs is single-unique but not constant)
+REDUNDANT_ISSUES = {
+    "mixed_type_object_columns": "type_inconsistencies",
+    "single_unique_columns": "constant_columns",
+    "all_same_string_columns": "constant_columns",
+}
+
+# Report keys that describe columns rather than flag issues
+CONTEXT_KEYS = {"inferred_types"}
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_TYPE_RE = re.compile(r"<class '([^']+)'>")
+_TYPE_NAME = r"\1"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap BPE-style estimate: one token per punctuation mark and per ~8 characters of each word.
+    """
+    return sum(1 + (len(piece) - 1) // 8 for piece in _TOKEN_RE.findall(str(text)))
+
+
+def _truncate(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    lines, kept, used = text.splitlines(), [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept + [f"... ({len(lines) - len(kept)} more lines omitted)"])
+
+
+def _short(value: Any, width: int = 40) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    if isinstance(value, dict):
+        # "<class 'str'>" type-histogram keys shrink to "str"
+        value = ",".join(f"{_TYPE_RE.sub(_TYPE_NAME, str(k))}:{v}" for k, v in value.items())
+    text = str(value)
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def rank_issues(issues: Dict[str, Any], n_rows: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Flattens an issues report into (issue, column, detail) rows sorted by descending severity.
+    Counts are weighted by the share of rows they affect when the row count is known.
+    """
+    rows = []
+    for issue, value in issues.items():
+        if issue in CONTEXT_KEYS or not value:
+            continue
+        base = ISSUE_SEVERITY.get(issue, 0.3)
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, list):
+            items = ((col, None) for col in value)
+        else:
+            items = [(None, value)]
+        covered = issues.get(REDUNDANT_ISSUES[issue]) or () if issue in REDUNDANT_ISSUES else ()
+        for col, detail in items:
+            if col in covered:
+                continue
+            severity = base
+            if isinstance(detail, (int, float)) and not isinstance(detail, bool) and n_rows:
+                severity *= 0.5 + 0.5 * min(1.0, detail / n_rows)
+            elif isinstance(detail, (int, float)) and not isinstance(detail, bool):
+                severity *= 0.5 + 0.05 * min(10.0, math.log10(1 + detail))
+            rows.append({"issue": issue, "column": col, "detail": detail, "severity": round(severity, 3)})
+    rows.sort(key=lambda r: r["severity"], reverse=True)
+    return rows
+
+
+def rank_columns(columns: List[Any], ranked_issues: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Columns involved in the most severe issues first, then the rest in their original order.
+    """
+    score: Dict[Any, float] = {}
+    for row in ranked_issues:
+        if row["column"] is not None:
+            score[row["column"]] = score.get(row["column"], 0.0) + row["severity"]
+    order = {col: i for i, col in enumerate(columns)}
+    return sorted(columns, key=lambda c: (-score.get(c, 0.0), order[c]))
+
+
+def format_issues_table(ranked_issues: List[Dict[str, Any]], budget: int) -> str:
+    """
+    Compact `issue|column|detail` table of the highest-severity rows that fit in the budget.
+    """
+    lines, used = ["issue|column|detail"], 4
+    for i, row in enumerate(ranked_issues):
+        line = f"{row['issue']}|{'' if row['column'] is None else _short(row['column'])}|{'' if row['detail'] is None else _short(row['detail'])}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            lines.append(f"... ({len(ranked_issues) - i} lower-severity items omitted)")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def format_columns(columns: List[Any], budget: int, types: Optional[Dict[Any, str]] = None) -> str:
+    """
+    Comma-separated column names, annotated `name:type` when inferred types are known.
+    """
+    kept, used = [], 0
+    for col in columns:
+        label = f"{col}:{types[col]}" if types and col in types else str(col)
+        cost = estimate_tokens(label) + 1
+        if used + cost > budget:
+            break
+        kept.append(label)
+        used += cost
+    text = ", ".join(kept)
+    if len(kept) < len(columns):
+        text += f", ... (+{len(columns) - len(kept)} more columns)"
+    return text
+
+
+def format_head(head: Any, columns: List[Any], budget: int) -> str:
+    """
+    The first rows restricted to as many of the (ranked) columns as fit; plain text is truncated.
+    """
+    if not isinstance(head, pd.DataFrame):
+        return _truncate(str(head), budget)
+    columns = [c for c in columns if c in head.columns]
+    lo, hi, best = 1, len(columns), head[columns[:1]].to_string(max_colwidth=20) if columns else ""
+    # Binary search for the widest column prefix that fits
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        text = head[columns[:mid]].to_string(max_colwidth=20)
+        if estimate_tokens(text) <= budget:
+            best, lo = text, mid + 1
+        else:
+            hi = mid - 1
+    return _truncate(best, budget)
+
+
+def format_describe(describe: Any, columns: List[Any], budget: int) -> str:
+    """
+    Per-column summary statistics, one compact row per column in ranked order, to 4 significant digits.
+    """
+    if not isinstance(describe, pd.DataFrame):
+        return _truncate(str(describe), budget)
+    table = describe.T
+    stats = [s for s in ("count", "mean", "std", "min", "50%", "max", "unique", "top", "freq") if s in table.columns]
+    lines, used = ["column|" + "|".join(stats)], 8
+    rows = [c for c in columns if c in table.index]
+    for i, col in enumerate(rows):
+        values = table.loc[col, stats]
+        line = _short(col) + "|" + "|".join("" if pd.isna(v) else _short(v, 20) for v in values)
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            lines.append(f"... ({len(rows) - i} more columns omitted)")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def _stats(endpoint: str, budget: int, original: str, fitted: str) -> Dict[str, int]:
+    original_tokens, fitted_tokens = estimate_tokens(original), estimate_tokens(fitted)
+    return {
+        "endpoint": endpoint,
+        "budget": budget,
+        "original_tokens": original_tokens,
+        "prompt_tokens": fitted_tokens,
+        "saved_tokens": max(0, original_tokens - fitted_tokens),
+    }
+
+
+def fit_cleaning_prompt(issues: Dict[str, Any], columns: List[Any], n_rows: Optional[int] = None,
+                        budget: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, int]]:
+    budget = budget or PROMPT_BUDGETS["cleaning"]
+    ranked = rank_issues(issues, n_rows)
+    fitted = {
+        "columns": format_columns(rank_columns(columns, ranked), budget // 4, issues.get("inferred_types")),
+    }
+    fitted["issues"] = format_issues_table(ranked, budget - estimate_tokens(fitted["columns"]))
+    return fitted, _stats("cleaning", budget, f"{columns}{issues}", fitted["columns"] + fitted["issues"])
+
+
+def fit_story_prompt(head: Any, describe: Any, columns: List[Any], issues: Optional[Dict[str, Any]] = None,
+                     budget: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, int]]:
+    budget = budget or PROMPT_BUDGETS["story"]
+    ranked_columns = rank_columns(columns, rank_issues(issues or {}))
+    fitted = {
+        "columns": format_columns(ranked_columns, budget // 5, (issues or {}).get("inferred_types")),
+        "head": format_head(head, ranked_columns, budget * 3 // 10),
+    }
+    fitted["describe"] = format_describe(describe, ranked_columns, budget - estimate_tokens(fitted["columns"] + fitted["head"]))
+    original = f"{columns}{head if isinstance(head, str) else head.to_string()}{describe if isinstance(describe, str) else describe.to_string()}"
+    return fitted, _stats("story", budget, original, "".join(fitted.values()))
+
+
+def fit_columns_and_head(endpoint: str, head: Any, columns: List[Any], issues: Optional[Dict[str, Any]] = None,
+                         budget: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """
+    Context for the visualization and chat prompts: the column list and the first rows.
+    """
+    budget = budget or PROMPT_BUDGETS[endpoint]
+    ranked_columns = rank_columns(columns, rank_issues(issues or {}))
+    fitted = {"columns": format_columns(ranked_columns, budget * 2 // 5, (issues or {}).get("inferred_types"))}
+    fitted["head"] = format_head(head, ranked_columns, budget - estimate_tokens(fitted["columns"]))
+    original = f"{columns}{head if isinstance(head, str) else head.to_string()}"
+    return fitted, _stats(endpoint, budget, original, "".join(fitted.values()))
+
+
+def format_profile(profile: Dict[str, Any], columns: List[Any], budget: Optional[int] = None) -> str:
+    """
+    Exact statistics of the given columns (e.g. those a chat question names) from the dataset
+    profile, one compact row per column, followed by their pairwise correlations.
+    """
+    budget = budget or PROMPT_BUDGETS["chat_profile"]
+    fields = ("kind", "nulls", "distinct", "mean", "std", "min", "median", "max")
+    summaries = {s["name"]: s for s in profile["columns"]}
+    lines, used = [f"rows={profile['n_rows']}", "column|" + "|".join(fields) + "|top values"], 12
+    for i, col in enumerate(columns):
+        summary = summaries[col]
+        top = ",".join(f"{_short(v, 20)}:{c}" for v, c in summary["top_values"][:3])
+        line = _short(col) + "|" + "|".join("" if summary.get(f) is None else _short(summary[f], 20) for f in fields) + "|" + top
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            lines.append(f"... ({len(columns) - i} more columns omitted)")
+            return "\n".join(lines)
+        lines.append(line)
+        used += cost
+    names = profile["correlation"]["columns"]
+    pairs = [(a, b) for i, a in enumerate(columns) for b in columns[i + 1:] if a in names and b in names]
+    for a, b in pairs:
+        value = profile["correlation"]["matrix"][names.index(a)][names.index(b)]
+        line = f"corr({_short(a)},{_short(b)})={'' if value is None else value}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
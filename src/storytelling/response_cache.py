@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def cache_key(**request: Any) -> str:
+    """
+    Content address of an LLM request: model, messages (system + user prompt) and sampling parameters.
+    """
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Abandoned(Exception):
+    """The shared call was cancelled along with the request that started it."""
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM completions: an in-memory LRU bounded by bytes, backed by one JSON
+    file per entry on disk with a TTL. Concurrent misses for the same key share one upstream call.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, disk_dir: Optional[str] = None, ttl_seconds: float = 7 * 86400):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.bytes_used = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+
+    # Memory tier
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def _memory_put(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self.bytes_used -= len(old.encode("utf-8"))
+            self._memory[key] = value
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self.bytes_used -= len(evicted.encode("utf-8"))
+
+    # Disk tier
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - record.get("created", 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record.get("response")
+
+    def _disk_put(self, key: str, value: str) -> None:
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "response": value}, f)
+        os.replace(tmp_path, path)
+
+    async def lookup(self, key: str, count_miss: bool = True) -> Optional[str]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        value = await asyncio.to_thread(self._disk_get, key)
+        if value is not None:
+            self.disk_hits += 1
+            self._memory_put(key, value)
+        elif count_miss:
+            self.misses += 1
+        return value
+
+    async def store(self, key: str, value: str) -> None:
+        self._memory_put(key, value)
+        try:
+            await asyncio.to_thread(self._disk_put, key, value)
+        except OSError as e:
+            print(f"Could not write LLM cache entry {key}: {e}")
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[str]], bypass: bool = False) -> str:
+        """
+        Returns the cached completion for `key` or awaits `call()` once and caches its result.
+        With bypass=True the cache is not read (the fresh result still replaces the entry).
+        If the request that started a shared call is cancelled (e.g. its client disconnected),
+        one of the requests waiting on it makes the call instead.
+        """
+        if bypass:
+            self.bypassed += 1
+            value = await call()
+            await self.store(key, value)
+            return value
+
+        value = await self.lookup(key, count_miss=False)
+        if value is not None:
+            return value
+        while key in self._inflight:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(self._inflight[key])
+            except _Abandoned:
+                # Nothing was stored; the first waiter to wake up makes the call, the others join it
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await call()
+            await self.store(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # Cancelling the future would cancel every waiter too; they retry instead
+            future.set_exception(_Abandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def join(self, key: str) -> Optional[str]:
+        """
+        The result of an upstream call already in flight for `key` (e.g. a prefetch), or None
+        when there is none or it fails.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            return None
+        self.coalesced += 1
+        while True:
+            try:
+                return await asyncio.shield(inflight)
+            except _Abandoned:
+                # Follow the waiter that took the call over, if any
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    return None
+            except Exception:
+                return None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        with self._lock:
+            entries = len(self._memory)
+        return {
+            "entries": entries,
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "disk_dir": self.disk_dir,
+            "ttl_seconds": self.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", 64 << 20)),
+    disk_dir=os.environ.get("LLM_CACHE_DIR", os.path.join(os.environ.get("DATA_DIR", "data"), "llm_cache")) or None,
+    ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", 7 * 86400)),
+)
@@ -0,0 +1,591 @@
+import functools
+import math
+import sys
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Finest KDE grid per dimension; beyond it the kernel is resolved more coarsely rather than
+# falling back to the exact O(n * m) evaluation
+_KDE_MAX_CELLS = {1: 1 << 16, 2: 512}
+
+
+def _numeric(values) -> Optional[np.ndarray]:
+    """
+    1-D float64 view of numeric, boolean or datetime-like values; None for anything else.
+    """
+    if hasattr(values, "asi8"):
+        # DatetimeIndex, PeriodIndex and TimedeltaIndex
+        return np.asarray(values.asi8, dtype=np.float64)
+    if isinstance(values, pd.Series) and hasattr(values, "dt") and values.dtype.kind in "Mm":
+        values = values.to_numpy()
+    try:
+        array = np.asarray(values)
+    except Exception:
+        return None
+    if array.ndim != 1:
+        return None
+    if array.dtype.kind in "Mm":
+        return array.view("i8").astype(np.float64)
+    if array.dtype.kind in "iufb":
+        return array.astype(np.float64, copy=False)
+    return None
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `n_out` points of the series (x, y) that keep
+    its visual shape. The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously kept point and the
+    next bucket's average. Bucket averages are computed up front in one vectorized pass.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[n - 1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[n - 1])
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def thin_scatter(x: np.ndarray, y: np.ndarray, n_cells: int, groups: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Indices of the points of a dense scatter to draw: the plane is binned into about `n_cells`
+    cells and each occupied cell keeps its last point (per group), the one that would be on
+    top when every point is drawn. Points with a non-finite coordinate are dropped.
+    """
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(finite) == 0:
+        return finite
+    side = max(1, int(math.sqrt(n_cells)))
+    cells = np.zeros(len(finite), dtype=np.int64)
+    for values in (x[finite], y[finite]):
+        lo, hi = values.min(), values.max()
+        index = ((values - lo) * (side / (hi - lo))).astype(np.int64) if hi > lo else np.zeros(len(values), dtype=np.int64)
+        cells = cells * side + np.minimum(index, side - 1)
+    if groups is not None:
+        cells = cells + groups[finite].astype(np.int64) * side * side
+    _, inverse = np.unique(cells, return_inverse=True)
+    last = np.full(inverse.max() + 1, -1, dtype=np.int64)
+    np.maximum.at(last, inverse, np.arange(len(finite)))
+    return finite[np.sort(last)]
+
+
+def binned_kde(dataset: np.ndarray, weights: np.ndarray, covariance: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    Gaussian KDE of `dataset` (d x n, d <= 2) evaluated at `points` (d x m) in O(n + grid) time:
+    the weights are linearly binned onto a regular grid fine enough to resolve the kernel,
+    convolved with the kernel by FFT, and the grid density is interpolated at the points.
+    """
+    d = dataset.shape[0]
+    lo = np.minimum(dataset.min(axis=1), points.min(axis=1))
+    hi = np.maximum(dataset.max(axis=1), points.max(axis=1))
+    sigma = np.sqrt(np.diag(covariance))
+    cells = np.clip(np.ceil((hi - lo) / (sigma / 4)).astype(np.int64) + 1, 2, _KDE_MAX_CELLS[d])
+    step = np.where(hi > lo, (hi - lo) / (cells - 1), 1.0)
+
+    # Linear binning: each observation is split between the grid nodes on either side of it
+    grid = np.zeros(int(np.prod(cells)))
+    t = (dataset - lo[:, None]) / step[:, None]
+    base = np.minimum(np.floor(t).astype(np.int64), (cells - 2)[:, None])
+    frac = t - base
+    for corner in range(1 << d):
+        flat = np.zeros(dataset.shape[1], dtype=np.int64)
+        share = weights.copy()
+        for k in range(d):
+            bit = (corner >> k) & 1
+            flat = flat * cells[k] + base[k] + bit
+            share = share * (frac[k] if bit else 1 - frac[k])
+        grid += np.bincount(flat, weights=share, minlength=len(grid))
+    grid = grid.reshape(cells)
+
+    # Kernel sampled on the grid offsets, out to four standard deviations
+    reach = np.minimum(np.ceil(4 * sigma / step).astype(np.int64), cells - 1)
+    offsets = np.meshgrid(*[np.arange(-r, r + 1) * s for r, s in zip(reach, step)], indexing="ij")
+    offsets = np.stack([o.ravel() for o in offsets])
+    inverse = np.linalg.inv(covariance)
+    kernel = np.exp(-0.5 * np.einsum("im,ij,jm->m", offsets, inverse, offsets))
+    kernel = kernel.reshape(tuple(2 * reach + 1)) / math.sqrt((2 * math.pi) ** d * np.linalg.det(covariance))
+
+    shape = [int(c + 2 * r) for c, r in zip(cells, reach)]
+    density = np.fft.irfftn(np.fft.rfftn(grid, shape) * np.fft.rfftn(kernel, shape), shape)
+    density = np.maximum(density[tuple(slice(r, r + c) for r, c in zip(reach, cells))], 0)
+
+    # Linear interpolation of the grid density at the points
+    t = (points - lo[:, None]) / step[:, None]
+    if d == 1:
+        return np.interp(t[0], np.arange(cells[0]), density)
+    i = np.clip(np.floor(t).astype(np.int64), 0, (cells - 2)[:, None])
+    f = np.clip(t - i, 0, 1)
+    return ((1 - f[0]) * (1 - f[1]) * density[i[0], i[1]] + f[0] * (1 - f[1]) * density[i[0] + 1, i[1]]
+            + (1 - f[0]) * f[1] * density[i[0], i[1] + 1] + f[0] * f[1] * density[i[0] + 1, i[1] + 1])
+
+
+def group_codes(data: pd.DataFrame, keys: List[Any]) -> Tuple[np.ndarray, int]:
+    """
+    One integer code per row for the combination of `keys` columns, in order of first
+    appearance, and the number of codes; rows with a missing key get -1.
+    """
+    codes = np.zeros(len(data), dtype=np.int64)
+    missing = np.zeros(len(data), dtype=bool)
+    for key in keys:
+        key_codes, uniques = pd.factorize(data[key])
+        missing |= key_codes < 0
+        codes = codes * max(len(uniques), 1) + key_codes
+    combined = np.full(len(data), -1, dtype=np.int64)
+    combined[~missing], uniques = pd.factorize(codes[~missing])
+    return combined, len(uniques)
+
+
+def group_aggregate(codes: np.ndarray, n_groups: int, values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-group count, sum, mean, standard deviation (ddof=1) and standard error of `values`,
+    from three bincounts. Rows with code -1 or a missing value are left out.
+    """
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    count = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    total = np.bincount(codes, weights=values, minlength=n_groups)
+    mean = np.divide(total, count, out=np.full(n_groups, np.nan), where=count > 0)
+    squares = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_groups)
+    sd = np.sqrt(np.divide(squares, count - 1, out=np.full(n_groups, np.nan), where=count > 1))
+    return {"count": count, "sum": total, "mean": mean, "sd": sd, "se": sd / np.sqrt(count)}
+
+
+# Estimators the aggregates above can stand in for
+_ESTIMATORS = {"mean": "mean", np.mean: "mean", "sum": "sum", np.sum: "sum", "count": "count", len: "count"}
+
+
+def _estimate(stats: Dict[str, np.ndarray], estimator, errorbar) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+    """
+    (estimate, error bar half-width or None) per group, matching seaborn's estimator and
+    errorbar arguments; None when they cannot be derived from the aggregates. Bootstrap
+    confidence intervals use the normal approximation, which they converge to on large groups.
+    """
+    name = _ESTIMATORS.get(estimator) if not isinstance(estimator, (list, dict)) else None
+    if name is None:
+        return None
+    estimate = stats[name]
+    if errorbar is None or (stats["count"] <= 1).all():
+        return estimate, None
+    method, level = (errorbar, None) if isinstance(errorbar, str) else tuple(errorbar)
+    if method in ("sd", "se"):
+        return estimate, stats[method] * (1 if level is None else level)
+    if method == "ci" and name in ("mean", "sum"):
+        z = NormalDist().inv_cdf(0.5 + (95 if level is None else level) / 200)
+        half = stats["se"] * z
+        return estimate, half * stats["count"] if name == "sum" else half
+    return None
+
+
+def _rows(data: pd.DataFrame, first: np.ndarray, columns: List[Any], value: Any, estimate: np.ndarray,
+          half: Optional[np.ndarray]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    A frame with one row per group (the key columns taken from each group's `first` row) whose
+    `value` column holds the estimate, and the estimator/errorbar arguments that make seaborn
+    draw exactly that. With error bars each group becomes two rows at estimate -/+ half / sqrt(2),
+    whose mean is the estimate and whose standard deviation is `half`.
+    """
+    rows = data.iloc[first][columns].reset_index(drop=True)
+    if half is None:
+        rows[value] = estimate
+        return rows, {"estimator": "mean", "errorbar": None}
+    shift = np.nan_to_num(half) / math.sqrt(2)
+    rows = pd.concat([rows, rows], ignore_index=True)
+    rows[value] = np.concatenate([estimate - shift, estimate + shift])
+    return rows, {"estimator": "mean", "errorbar": ("sd", 1)}
+
+
+def _first_rows(codes: np.ndarray, n_groups: int) -> np.ndarray:
+    first = np.full(n_groups, len(codes), dtype=np.int64)
+    valid = codes >= 0
+    np.minimum.at(first, codes[valid], np.flatnonzero(valid))
+    return first
+
+
+def _levels(values: pd.Series) -> Optional[List[Any]]:
+    """
+    The level order seaborn would give a categorical variable; None for numeric ones, whose
+    mapping must not be turned categorical by passing an order.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    if _numeric(values) is not None:
+        return None
+    return list(values.dropna().unique())
+
+
+def _semantics(data: pd.DataFrame, kwargs: Dict[str, Any], names: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Pins the levels and norms of semantic variables (hue, style, size) to those of the full
+    data, so a reduced frame keeps the same colors, markers and legend.
+    """
+    pinned = {}
+    for name in names:
+        column = kwargs.get(name)
+        if column is None:
+            continue
+        levels = _levels(data[column])
+        if levels is not None:
+            pinned.setdefault(f"{name}_order", levels)
+        elif name in ("hue", "size"):
+            values = data[column]
+            pinned.setdefault(f"{name}_norm", (values.min(), values.max()))
+    return {k: v for k, v in pinned.items() if kwargs.get(k) is None}
+
+
+def _columns(data: pd.DataFrame, kwargs: Dict[str, Any], names: Tuple[str, ...]) -> Optional[List[Any]]:
+    # Only long-form calls naming columns of `data` are reduced
+    columns = []
+    for name in names:
+        column = kwargs.get(name)
+        if column is None:
+            continue
+        if not isinstance(column, str) or column not in data.columns:
+            return None
+        columns.append(column)
+    return columns
+
+
+def reduce_scatter(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    if kwargs.get("kind", "scatter") != "scatter" or kwargs.get("x") is None or kwargs.get("y") is None:
+        return None
+    columns = _columns(data, kwargs, ("x", "y", "hue", "style", "size", "row", "col"))
+    x, y = _numeric(data[kwargs["x"]]), _numeric(data[kwargs["y"]])
+    if columns is None or x is None or y is None:
+        return None
+    keys = [kwargs[k] for k in ("hue", "style", "row", "col") if kwargs.get(k) is not None]
+    groups = group_codes(data, keys)[0] + 1 if keys else None
+    keep = thin_scatter(x, y, budget, groups)
+    return data.iloc[keep], {**kwargs, **_semantics(data, kwargs, ("hue", "style", "size", "row", "col"))}
+
+
+def reduce_line(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    if (kwargs.get("kind", "line") != "line" or kwargs.get("x") is None or kwargs.get("y") is None
+            or kwargs.get("units") is not None or kwargs.get("weights") is not None
+            or kwargs.get("estimator", "mean") is None or kwargs.get("orient", "x") != "x"):
+        return None
+    keys = _columns(data, kwargs, ("hue", "style", "size", "row", "col"))
+    x, y = _numeric(data[kwargs["x"]]), _numeric(data[kwargs["y"]])
+    if keys is None or x is None or y is None or kwargs["x"] in keys:
+        return None
+    columns = keys + [kwargs["x"]]
+
+    # One aggregate per line and x value, as seaborn computes them
+    codes, n_groups = group_codes(data, columns)
+    stats = group_aggregate(codes, n_groups, y)
+    estimated = _estimate(stats, kwargs.get("estimator", "mean"), kwargs.get("errorbar", ("ci", 95)))
+    if estimated is None:
+        return None
+    estimate, half = estimated
+    first = _first_rows(codes, n_groups)
+
+    # Downsample each line separately, so the budget is shared between them
+    lines = group_codes(data.iloc[first], keys)[0] if keys else np.zeros(n_groups, dtype=np.int64)
+    keep = []
+    per_line = max(3, budget // max(1, lines.max() + 1))
+    for line in np.unique(lines):
+        members = np.flatnonzero(lines == line)
+        members = members[np.argsort(x[first[members]], kind="stable")]
+        keep.append(members[lttb(x[first[members]], estimate[members], per_line)])
+    keep = np.concatenate(keep)
+    rows, aggregation = _rows(data, first[keep], columns, kwargs["y"], estimate[keep], None if half is None else half[keep])
+    pinned = _semantics(data, kwargs, ("hue", "style", "size", "row", "col"))
+    return rows, {**kwargs, **aggregation, **pinned}
+
+
+def reduce_relational(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    # relplot draws scatters unless told otherwise
+    kind = kwargs.get("kind", "scatter")
+    return reduce_scatter(data, {**kwargs, "kind": kind}, budget) if kind == "scatter" else reduce_line(data, kwargs, budget)
+
+
+def _orientation(data: pd.DataFrame, kwargs: Dict[str, Any]) -> Optional[Tuple[Any, Any]]:
+    # (categorical column, value column) of a bar plot, following seaborn's orient inference
+    x, y, orient = kwargs.get("x"), kwargs.get("y"), kwargs.get("orient")
+    if x is None or y is None:
+        return None
+    if orient in ("h", "y"):
+        return y, x
+    if orient in ("v", "x"):
+        return x, y
+    if _numeric(data[y]) is None and _numeric(data[x]) is not None:
+        return y, x
+    return x, y
+
+
+def reduce_bar(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    if (kwargs.get("units") is not None or kwargs.get("weights") is not None
+            or _columns(data, kwargs, ("x", "y", "hue")) is None):
+        return None
+    oriented = _orientation(data, kwargs)
+    if oriented is None:
+        return None
+    category, value = oriented
+    values = _numeric(data[value])
+    if values is None:
+        return None
+    columns = [category] + ([kwargs["hue"]] if kwargs.get("hue") is not None else [])
+    codes, n_groups = group_codes(data, columns)
+    estimated = _estimate(group_aggregate(codes, n_groups, values), kwargs.get("estimator", "mean"),
+                          kwargs.get("errorbar", ("ci", 95)))
+    if estimated is None:
+        return None
+    rows, aggregation = _rows(data, _first_rows(codes, n_groups), columns, value, *estimated)
+    pinned = _semantics(data, kwargs, ("hue",))
+    if kwargs.get("order") is None and _levels(data[category]) is not None:
+        pinned["order"] = _levels(data[category])
+    kwargs = {k: v for k, v in kwargs.items() if k not in ("n_boot", "seed")}
+    return rows, {**kwargs, **aggregation, **pinned}
+
+
+def reduce_count(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    """
+    countplot as a barplot of precomputed counts; returns (rows, barplot kwargs).
+    """
+    x, y = kwargs.get("x"), kwargs.get("y")
+    if (x is None) == (y is None) or _columns(data, kwargs, ("x", "y", "hue")) is None:
+        return None
+    category = x if x is not None else y
+    stat = kwargs.get("stat", "count")
+    if stat not in ("count", "percent", "probability", "proportion"):
+        return None
+    columns = [category] + ([kwargs["hue"]] if kwargs.get("hue") is not None else [])
+    codes, n_groups = group_codes(data, columns)
+    counts = np.bincount(codes[codes >= 0], minlength=n_groups).astype(np.float64)
+    if stat != "count":
+        counts = counts / (codes >= 0).sum() * (100 if stat == "percent" else 1)
+    rows, aggregation = _rows(data, _first_rows(codes, n_groups), columns, stat, counts, None)
+    pinned = _semantics(data, kwargs, ("hue",))
+    if kwargs.get("order") is None and _levels(data[category]) is not None:
+        pinned["order"] = _levels(data[category])
+    kwargs = {k: v for k, v in kwargs.items() if k != "stat"}
+    kwargs.update({"x": category, "y": stat} if x is not None else {"x": stat, "y": category})
+    return rows, {**kwargs, **aggregation, **pinned}
+
+
+def reduce_hist(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    """
+    histplot of bin centers weighted by precomputed counts, with the same bin edges.
+    """
+    x, y = kwargs.get("x"), kwargs.get("y")
+    if ((x is None) == (y is None) or kwargs.get("kde") or kwargs.get("weights") is not None
+            or kwargs.get("binwidth") is not None or kwargs.get("discrete") or kwargs.get("log_scale")
+            or not kwargs.get("common_bins", True) or _columns(data, kwargs, ("x", "y", "hue")) is None):
+        return None
+    variable = x if x is not None else y
+    values = data[variable]
+    if values.dtype.kind not in "iuf":
+        return None
+    values = values.to_numpy(dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return None
+    edges = np.histogram_bin_edges(values[finite], bins=kwargs.get("bins", "auto"), range=kwargs.get("binrange"))
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    # Values outside a given bin range are not counted, as in seaborn
+    inside = finite & (values >= edges[0]) & (values <= edges[-1])
+    if kwargs.get("hue") is not None:
+        hue_codes, n_hue = group_codes(data, [kwargs["hue"]])
+        inside &= hue_codes >= 0
+    else:
+        hue_codes, n_hue = np.zeros(len(values), dtype=np.int64), 1
+    codes = np.where(inside, hue_codes * (len(edges) - 1) + bins, -1)
+    n_groups = n_hue * (len(edges) - 1)
+    counts = np.bincount(codes[codes >= 0], minlength=n_groups).astype(np.float64)
+    first = _first_rows(codes, n_groups)
+    occupied = np.flatnonzero(counts > 0)
+    rows = data.iloc[first[occupied]][[kwargs["hue"]] if kwargs.get("hue") is not None else []].reset_index(drop=True)
+    rows[variable] = ((edges[:-1] + edges[1:]) / 2)[occupied % (len(edges) - 1)]
+    weight = "__count__"
+    rows[weight] = counts[occupied]
+    kwargs = {k: v for k, v in kwargs.items() if k != "binrange"}
+    return rows, {**kwargs, "weights": weight, "bins": edges.tolist(), **_semantics(data, kwargs, ("hue",))}
+
+
+def reduce_sample(data: pd.DataFrame, kwargs: Dict[str, Any], budget: int):
+    """
+    A uniform random sample of `budget` rows (in their original order), for regression plots
+    whose fit and bootstrap scale with every row.
+    """
+    if _columns(data, kwargs, ("x", "y")) is None:
+        return None
+    keep = np.sort(np.random.default_rng(0).choice(len(data), size=budget, replace=False))
+    return data.iloc[keep], kwargs
+
+
+def _reduced(func, reduce, budget: int, target=None):
+    """
+    Wraps a seaborn function so a long-form call on more than `budget` rows is first reduced by
+    `reduce(data, kwargs, budget)`, then drawn by `target` (default: `func` itself). Calls the
+    reduction does not understand are drawn from the full data.
+    """
+    @functools.wraps(func)
+    def wrapper(data=None, **kwargs):
+        if isinstance(data, pd.DataFrame) and len(data) > budget:
+            try:
+                reduced = reduce(data, kwargs, budget)
+            except Exception:
+                reduced = None
+            if reduced is not None:
+                data, kwargs = reduced
+                return (target or func)(data=data, **kwargs)
+        return func(data=data, **kwargs)
+    return wrapper
+
+
+def reduce_frame_line(parent, kwargs: Dict[str, Any], budget: int):
+    """
+    The rows of a DataFrame or Series that a pandas line plot needs: the union of each plotted
+    column's LTTB points. pandas converts every index value before it reaches Axes.plot, so
+    long line plots are cut down here rather than there.
+    """
+    if kwargs.get("kind", "line") != "line" or kwargs.get("subplots"):
+        return None
+    frame = parent.to_frame() if isinstance(parent, pd.Series) else parent
+    x = kwargs.get("x")
+    if x is not None and (not isinstance(x, str) or x not in frame.columns):
+        return None
+    x_values = _numeric(frame.index if x is None else frame[x])
+    y = kwargs.get("y")
+    columns = [y] if isinstance(y, str) else list(y) if y is not None else [c for c in frame.columns if c != x]
+    columns = [c for c in columns if c in frame.columns and frame[c].dtype.kind in "iufb"]
+    if x_values is None or not columns:
+        return None
+    keep = np.unique(np.concatenate([lttb(x_values, frame[c].to_numpy(dtype=np.float64), budget) for c in columns]))
+    return parent.iloc[keep]
+
+
+def _reduce_plot_args(args: tuple, budget: int) -> tuple:
+    # Splits Axes.plot's (x, y, fmt, x2, y2, fmt2, ...) the way matplotlib does
+    out = []
+    while args:
+        this, args = args[:2], args[2:]
+        if args and isinstance(args[0], str):
+            this, args = this + (args[0],), args[1:]
+        fmt = this[-1:] if isinstance(this[-1], str) else ()
+        series = this[:len(this) - len(fmt)]
+        if len(series) == 1:
+            series = (np.arange(len(series[0])) if hasattr(series[0], "__len__") else None, series[0])
+        if series[0] is not None and len(series) == 2 and not isinstance(series[1], str) and len(series[1]) > budget:
+            x = _numeric(series[0])
+            y_all = np.asarray(series[1])
+            if x is not None and len(x) == len(y_all) and y_all.dtype.kind in "iuf" and y_all.ndim in (1, 2):
+                columns = y_all.reshape(len(y_all), -1).astype(np.float64)
+                keep = np.unique(np.concatenate([lttb(x, columns[:, j], budget) for j in range(columns.shape[1])]))
+                xs = series[0][keep] if isinstance(series[0], pd.Index) else np.asarray(series[0])[keep]
+                this = (xs, y_all[keep]) + fmt
+        out.extend(this)
+    return tuple(out)
+
+
+def _from_seaborn() -> bool:
+    # seaborn colors scatter points after drawing them, so it must get every point it asked for
+    return sys._getframe(2).f_globals.get("__name__", "").startswith("seaborn")
+
+
+_installed = False
+
+
+def install(budget: int) -> None:
+    """
+    Puts the aggregation layer in front of the plotting libraries of this process (a render
+    worker), so plot code drawing large frames is drawn from at most about `budget` points:
+    line plots (matplotlib and pandas) are downsampled with LTTB, dense scatters thinned on a 2-D grid, histograms and
+    bar/count plots drawn from precomputed bins and group aggregates, regression plots fitted on
+    a sample, and Gaussian KDEs evaluated on a binned grid.
+    """
+    global _installed
+    if _installed or budget <= 0:
+        return
+    _installed = True
+    from matplotlib.axes import Axes
+
+    plot, scatter = Axes.plot, Axes.scatter
+
+    @functools.wraps(plot)
+    def downsampled_plot(self, *args, **kwargs):
+        if kwargs.get("data") is None:
+            try:
+                args = _reduce_plot_args(args, budget)
+            except Exception:
+                pass
+        return plot(self, *args, **kwargs)
+
+    @functools.wraps(scatter)
+    def thinned_scatter(self, *args, **kwargs):
+        if kwargs.get("data") is None and len(args) >= 2 and not _from_seaborn():
+            x, y = _numeric(args[0]), _numeric(args[1])
+            if x is not None and y is not None and len(x) == len(y) > budget:
+                keep = thin_scatter(x, y, budget)
+                n = len(x)
+
+                def subset(value):
+                    # Per-point sizes, colors and widths follow their points
+                    if value is None or isinstance(value, str) or np.ndim(value) == 0:
+                        return value
+                    array = np.asarray(value)
+                    return array[keep] if len(array) == n else value
+
+                args = (np.asarray(args[0])[keep], np.asarray(args[1])[keep]) + tuple(subset(a) for a in args[2:])
+                kwargs = {k: subset(v) if k in ("s", "c", "linewidths", "edgecolors", "alpha") else v
+                          for k, v in kwargs.items()}
+        return scatter(self, *args, **kwargs)
+
+    Axes.plot, Axes.scatter = downsampled_plot, thinned_scatter
+
+    try:
+        from scipy.stats import gaussian_kde
+    except ImportError:
+        gaussian_kde = None
+    if gaussian_kde is not None:
+        evaluate = gaussian_kde.evaluate
+
+        @functools.wraps(evaluate)
+        def binned_evaluate(self, points):
+            points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+            if self.n > budget and self.d <= 2 and points.shape[0] == self.d:
+                return binned_kde(self.dataset, self.weights, self.covariance, points)
+            return evaluate(self, points)
+
+        gaussian_kde.evaluate = gaussian_kde.__call__ = binned_evaluate
+
+    accessor = pd.plotting.PlotAccessor.__call__
+
+    @functools.wraps(accessor)
+    def reduced_accessor(self, *args, **kwargs):
+        if not args and len(self._parent) > budget:
+            try:
+                reduced = reduce_frame_line(self._parent, kwargs, budget)
+            except Exception:
+                reduced = None
+            if reduced is not None:
+                return accessor(type(self)(reduced), **kwargs)
+        return accessor(self, *args, **kwargs)
+
+    pd.plotting.PlotAccessor.__call__ = reduced_accessor
+
+    try:
+        import seaborn as sns
+    except ImportError:
+        return
+    sns.scatterplot = _reduced(sns.scatterplot, reduce_scatter, budget)
+    sns.lineplot = _reduced(sns.lineplot, reduce_line, budget)
+    sns.relplot = _reduced(sns.relplot, reduce_relational, budget)
+    barplot = sns.barplot
+    sns.barplot = _reduced(barplot, reduce_bar, budget)
+    sns.countplot = _reduced(sns.countplot, reduce_count, budget, target=barplot)
+    sns.histplot = _reduced(sns.histplot, reduce_hist, budget)
+    sns.regplot = _reduced(sns.regplot, reduce_sample, budget)
+    sns.lmplot = _reduced(sns.lmplot, reduce_sample, budget)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.storage.columnar import DATA_DIR
+
+# Generated plot code is also written here, so any API worker process can render it
+PLOT_CODE_DIR = os.environ.get("PLOT_CODE_DIR") or os.path.join(DATA_DIR, "plots")
+
+_CODE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PlotCodeStore:
+    """
+    Plot code the server generated (/suggest-visualization), by id: the SHA-256 of the code.
+    /render-visualization takes an id rather than code, so only code produced here is ever
+    run. The `max_entries` most recent are kept in memory, and every entry on disk.
+    """
+
+    def __init__(self, directory: str = PLOT_CODE_DIR, max_entries: int = 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, code_id: str) -> str:
+        return os.path.join(self.directory, f"{code_id}.py")
+
+    def _remember(self, code_id: str, code: str) -> None:
+        with self._lock:
+            self._entries[code_id] = code
+            self._entries.move_to_end(code_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, code: str) -> str:
+        code_id = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        self._remember(code_id, code)
+        path = self._path(code_id)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(code)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self.stored += 1
+        return code_id
+
+    def get(self, code_id: str) -> Optional[str]:
+        """
+        The code stored under `code_id`, or None for an unknown (or malformed) id.
+        """
+        if not isinstance(code_id, str) or not _CODE_ID_RE.match(code_id):
+            return None
+        with self._lock:
+            code = self._entries.get(code_id)
+            if code is not None:
+                self._entries.move_to_end(code_id)
+                self.hits += 1
+                return code
+        try:
+            with open(self._path(code_id), encoding="utf-8") as f:
+                code = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(code_id, code)
+        with self._lock:
+            self.hits += 1
+        return code
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "stored": self.stored, "hits": self.hits, "misses": self.misses}
+
+
+plot_code_store = PlotCodeStore(max_entries=int(os.environ.get("PLOT_CODE_MAX_ENTRIES", 1024)))
@@ -0,0 +1,413 @@
+import ast
+import builtins
+import hashlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from typing import Any, Dict, Optional, Tuple
+
+from src.storage import columnar
+
+try:
+    import resource
+    import signal
+except ImportError:  # Windows: no rlimits, only the wall-clock timeout applies
+    resource = None
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+DPI_RANGE = (10, 300)
+
+# Plot code runs with these builtins only (no open, eval, exec, getattr, type, ...) and may
+# only import these packages
+ALLOWED_IMPORTS = frozenset({
+    "matplotlib", "seaborn", "pandas", "numpy", "math", "statistics", "datetime", "collections", "itertools",
+})
+_SAFE_BUILTINS = (
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float", "frozenset", "int",
+    "isinstance", "len", "list", "map", "max", "min", "print", "range", "reversed", "round", "set", "slice",
+    "sorted", "str", "sum", "tuple", "zip", "True", "False", "None",
+    "Exception", "ValueError", "TypeError", "KeyError", "IndexError", "ZeroDivisionError",
+)
+# Private and dunder attributes are the way out of restricted builtins (().__class__.__bases__...);
+# the rest read or write files, run commands or reach modules that do. Writes that get past this
+# list still fail: workers may not write to files at all (RLIMIT_FSIZE 0)
+_BLOCKED_ATTRIBUTES = frozenset({
+    "eval", "query", "imread", "imsave", "genfromtxt", "fromfile", "fromregex", "tofile", "export", "style",
+    "canvas", "memmap", "open", "system", "popen", "io", "lib", "os", "sys", "subprocess", "shutil", "pathlib",
+    "builtins", "importlib", "socket", "pickle", "ctypeslib", "DataSource", "testing", "use", "rc_file",
+    "get_data_path", "cbook", "animation", "backends", "PdfPages", "ExcelWriter", "HDFStore",
+})
+_BLOCKED_PREFIXES = ("_", "read_", "to_", "save", "load", "dump", "print_")
+_ALLOWED_TO = frozenset({"to_datetime", "to_numeric", "to_timedelta", "to_numpy", "to_list", "to_frame", "to_period"})
+
+# How long a freshly started worker may take to import matplotlib/seaborn before it is replaced
+_WARM_TIMEOUT = 60.0
+
+
+class RenderError(Exception):
+    """Plot code failed, produced no figure, or its worker died."""
+
+
+class RenderTimeout(RenderError):
+    """Plot code ran past the per-job wall-clock timeout; its worker was killed."""
+
+
+class _CPULimitExceeded(Exception):
+    pass
+
+
+def _on_sigxcpu(signum, frame):
+    raise _CPULimitExceeded("CPU time limit exceeded")
+
+
+def _set_cpu_budget(seconds: Optional[int]) -> None:
+    # RLIMIT_CPU counts the worker's whole lifetime, so each job gets "used so far + seconds"
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + 1 + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _blocked_attribute(name: str) -> bool:
+    if name in _ALLOWED_TO:
+        return False
+    return name in _BLOCKED_ATTRIBUTES or name.startswith(_BLOCKED_PREFIXES)
+
+
+def check_code(code: str) -> None:
+    """
+    Rejects plot code that imports outside ALLOWED_IMPORTS, names a dunder or uses a blocked
+    attribute. Raises RenderError.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise RenderError(f"SyntaxError: {e}")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""] if not node.level else ["."]
+            names = [alias.name for alias in node.names]
+            if any(name == "*" or _blocked_attribute(name) for name in names):
+                raise RenderError(f"Importing {', '.join(names)} is not allowed in plot code")
+        else:
+            modules = []
+        for module in modules:
+            if module.split(".")[0] not in ALLOWED_IMPORTS or any(_blocked_attribute(part) for part in module.split(".")[1:]):
+                raise RenderError(f"Importing '{module}' is not allowed in plot code")
+        if isinstance(node, ast.Attribute) and _blocked_attribute(node.attr):
+            raise RenderError(f"Plot code may not use '.{node.attr}'")
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise RenderError(f"Plot code may not use '{node.id}'")
+
+
+def _import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name.split(".")[0] not in ALLOWED_IMPORTS:
+        raise ImportError(f"Importing '{name}' is not allowed in plot code")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _restricted_builtins() -> Dict[str, Any]:
+    scope = {name: getattr(builtins, name) for name in _SAFE_BUILTINS}
+    scope["__import__"] = _import
+    return scope
+
+
+def _figure(scope: Dict[str, Any], plt):
+    # The code may leave a Figure in `fig`, a seaborn grid (FacetGrid, JointGrid, ...) or just draw on plt
+    candidate = scope.get("fig", scope.get("g"))
+    for attr in ("figure", "fig"):
+        if candidate is not None and not hasattr(candidate, "savefig") and hasattr(candidate, attr):
+            candidate = getattr(candidate, attr)
+    if candidate is not None and hasattr(candidate, "savefig"):
+        return candidate
+    return plt.gcf() if plt.get_fignums() else None
+
+
+def _worker_main(conn, cpu_seconds: int, memory_bytes: int, point_budget: int) -> None:
+    """
+    Render worker: imports the plotting stack once, applies the memory limit, then runs one job
+    at a time from `conn` until it receives None. Every figure is closed after each job. Plots of
+    more than `point_budget` rows are drawn from aggregates (see aggregate.install).
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
+    try:
+        import seaborn as sns
+    except ImportError:
+        sns = None
+    from src.visualization.aggregate import install
+
+    install(point_budget)
+
+    # Warm the font cache and renderer so the first real job is not the slow one
+    plt.figure().savefig(io.BytesIO(), format="png")
+    plt.close("all")
+    if resource is not None:
+        # RLIMIT_DATA leaves memory-mapped datasets out of the budget, unlike RLIMIT_AS
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_bytes, memory_bytes))
+        # Images go back over the pipe; plot code gets an OSError for any write to a file
+        signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    conn.send(("ready", None))
+
+    frames: "OrderedDict[str, Any]" = OrderedDict()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        code, dataset_id, frame, fmt, dpi = job
+        try:
+            _set_cpu_budget(cpu_seconds)
+            if frame is None:
+                if dataset_id not in frames:
+                    frames[dataset_id] = columnar.load_dataset(dataset_id)
+                    # Keep the two most recent datasets decoded
+                    while len(frames) > 2:
+                        frames.popitem(last=False)
+                frame = frames[dataset_id]
+                frames.move_to_end(dataset_id)
+            if frame is None:
+                raise RenderError(f"Dataset '{dataset_id}' is not stored")
+            scores = columnar.load_outlier_scores(dataset_id)
+            if scores is not None and len(scores) == len(frame):
+                # Per-row scores from the dataset's last outlier run (POST /datasets/{id}/outliers)
+                scores = pd.Series(scores, index=frame.index, name="outlier_score")
+            else:
+                scores = None
+            scope = {"__builtins__": _restricted_builtins(), "df": frame.copy(deep=False), "outlier_scores": scores,
+                     "pd": pd, "np": np, "plt": plt, "sns": sns}
+            with redirect_stdout(io.StringIO()):
+                exec(code, scope)
+            fig = _figure(scope, plt)
+            if fig is None:
+                raise RenderError("The code did not draw a figure")
+            buf = io.BytesIO()
+            fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight")
+            conn.send(("ok", buf.getvalue()))
+        except BaseException as e:
+            # SystemExit from the plot code must not end the worker either
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            plt.close("all")
+            frame = None
+            _set_cpu_budget(None)
+
+
+class _Worker:
+    def __init__(self, ctx, cpu_seconds: int, memory_bytes: int, point_budget: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, cpu_seconds, memory_bytes, point_budget),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.jobs = 0
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = self.conn.recv()[0] == "ready"
+        return self.ready
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class RenderPool:
+    """
+    Runs LLM-generated plot code in pre-warmed worker processes, one job per worker at a time,
+    under per-job CPU-time, memory and wall-clock limits, with restricted builtins and imports
+    (see check_code). A worker that times out or dies is
+    replaced, and workers are recycled after `max_jobs_per_worker` jobs. Successful renders of
+    stored datasets are cached in memory by (code, dataset id, format, dpi).
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 30.0, cpu_seconds: int = 20, memory_bytes: int = 2 << 30,
+                 max_jobs_per_worker: int = 200, cache_max_bytes: int = 64 << 20, point_budget: int = 10_000):
+        self.workers = workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.cache_max_bytes = cache_max_bytes
+        self.point_budget = point_budget
+        # forkserver children start clean, so forking from a threaded server is safe
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._ctx = multiprocessing.get_context(method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self.cache_bytes = 0
+        self.renders = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.render_seconds = 0.0
+
+    def start(self) -> None:
+        """
+        Starts the workers; they import the plotting stack in the background.
+        """
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.workers):
+                self._idle.put(self._spawn())
+            self._started = True
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.cpu_seconds, self.memory_bytes, self.point_budget)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        with self._lock:
+            self.restarts += 1
+        return self._spawn()
+
+    @staticmethod
+    def cache_key(code: str, dataset_id: str, fmt: str, dpi: int) -> str:
+        return hashlib.sha256(f"{dataset_id}\0{fmt}\0{dpi}\0{code}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            return image
+
+    def _cache_put(self, key: str, image: bytes) -> None:
+        with self._lock:
+            if key in self._cache or len(image) > self.cache_max_bytes:
+                return
+            self._cache[key] = image
+            self.cache_bytes += len(image)
+            while self.cache_bytes > self.cache_max_bytes:
+                _, old = self._cache.popitem(last=False)
+                self.cache_bytes -= len(old)
+
+    def render(self, code: str, dataset_id: str, frame=None, fmt: str = "png", dpi: int = 100) -> Tuple[bytes, bool]:
+        """
+        Renders `code` against the dataset and returns (image bytes, served from cache). Workers
+        memory-map the stored dataset; pass `frame` for one that is not on disk (e.g. a sample),
+        in which case the render is not cached. Blocks until a worker is free.
+        Raises RenderTimeout or RenderError (also for code check_code() rejects).
+        """
+        if fmt not in FORMATS:
+            raise RenderError(f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+        if not DPI_RANGE[0] <= dpi <= DPI_RANGE[1]:
+            raise RenderError(f"dpi must be between {DPI_RANGE[0]} and {DPI_RANGE[1]}")
+        check_code(code)
+        version = dataset_id
+        if "outlier_scores" in code:
+            # A plot of the scores is stale once they are recomputed
+            path = columnar.outlier_scores_path(dataset_id)
+            version += f"@{os.path.getmtime(path) if os.path.exists(path) else 0}"
+        key = self.cache_key(code, version, fmt, dpi)
+        if frame is None:
+            image = self._cache_get(key)
+            if image is not None:
+                return image, True
+        self.start()
+        worker = self._idle.get()
+        start = time.perf_counter()
+        try:
+            if not worker.wait_ready(_WARM_TIMEOUT):
+                worker = self._replace(worker)
+                raise RenderError("Render worker failed to start")
+            worker.conn.send((code, dataset_id, frame, fmt, dpi))
+            if not worker.conn.poll(self.timeout):
+                worker = self._replace(worker)
+                with self._lock:
+                    self.timeouts += 1
+                raise RenderTimeout(f"Rendering took longer than {self.timeout:g}s")
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            # The worker died mid-job, e.g. killed by the OS or a hard resource limit
+            worker = self._replace(worker)
+            with self._lock:
+                self.failures += 1
+            raise RenderError(f"Render worker crashed: {e}")
+        finally:
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs_per_worker:
+                worker = self._replace(worker)
+            self._idle.put(worker)
+            with self._lock:
+                self.renders += 1
+                self.render_seconds += time.perf_counter() - start
+        if status != "ok":
+            with self._lock:
+                self.failures += 1
+            raise RenderError(payload)
+        if frame is None:
+            self._cache_put(key, payload)
+        return payload, False
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+                worker.process.join(timeout=2)
+            except OSError:
+                pass
+            if worker.process.is_alive():
+                worker.kill()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "idle_workers": self._idle.qsize(),
+                "renders": self.renders,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self._cache),
+                "cache_bytes": self.cache_bytes,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "worker_restarts": self.restarts,
+                "mean_render_seconds": self.render_seconds / self.renders if self.renders else 0.0,
+            }
+
+
+render_pool = RenderPool(
+    workers=int(os.environ.get("RENDER_WORKERS", 2)),
+    timeout=float(os.environ.get("RENDER_TIMEOUT_SECONDS", 30)),
+    cpu_seconds=int(os.environ.get("RENDER_CPU_SECONDS", 20)),
+    memory_bytes=int(os.environ.get("RENDER_MEMORY_BYTES", 2 << 30)),
+    max_jobs_per_worker=int(os.environ.get("RENDER_MAX_JOBS_PER_WORKER", 200)),
+    cache_max_bytes=int(os.environ.get("RENDER_CACHE_MAX_BYTES", 64 << 20)),
+    point_budget=int(os.environ.get("RENDER_POINT_BUDGET", 10_000)),
+)
@@ -0,0 +1,67 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning.pipeline import run_pipeline
+from src.storage import columnar
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+def mixed_frame(n=600_000):
+    # pandas' C parser reads an integer column with one stray "x" as an object column of ints and a str
+    csv = "id,value\n" + "".join(f"{i},{i % 100}\n" for i in range(n - 1)) + f"{n - 1},x\n"
+    df = pd.read_csv(io.StringIO(csv), engine="c", low_memory=True)
+    assert df["value"].dtype == object
+    assert {type(v) for v in df["value"]} == {int, str}
+    return df
+
+
+def test_write_dataset_stores_mixed_type_columns_as_strings(data_dir):
+    df = mixed_frame()
+    path = columnar.write_dataset("a" * 32, df)
+    assert path == columnar.dataset_path("a" * 32)
+    stored = columnar.load_dataset("a" * 32)
+    assert len(stored) == len(df)
+    assert stored["value"].iloc[0] == "0"
+    assert stored["value"].iloc[-1] == "x"
+    assert (stored["id"].to_numpy() == df["id"].to_numpy()).all()
+
+
+def test_write_dataset_keeps_missing_values_in_mixed_columns(data_dir):
+    df = pd.DataFrame({"value": [1, "a", None, 2.5]})
+    columnar.write_dataset("b" * 32, df)
+    stored = columnar.load_dataset("b" * 32)
+    assert stored["value"].tolist()[:2] == ["1", "a"]
+    assert stored["value"].isna().tolist() == [False, False, True, False]
+
+
+def test_pipeline_runs_on_stored_mixed_type_dataset(data_dir):
+    columnar.write_dataset("c" * 32, mixed_frame())
+    table = columnar.load_table("c" * 32)
+    written = {}
+
+    def write(schema, batches):
+        written["batches"] = list(batches)
+        return "memory"
+
+    result = run_pipeline(table, [{"op": "cast", "column": "value", "to": "numeric"}], write, chunk_rows=100_000)
+    assert result["rows_out"] == 600_000
+    assert result["steps"][0]["values_changed"] == 1
+    values = np.concatenate([batch.column(1).to_numpy(zero_copy_only=False) for batch in written["batches"]])
+    assert np.isnan(values[-1]) and values[0] == 0
+
+
+@pytest.mark.parametrize("dataset_id", ["../../etc/passwd", "/tmp/x", "A" * 32, "a" * 31, ""])
+def test_paths_reject_ids_that_are_not_dataset_ids(data_dir, dataset_id):
+    with pytest.raises(ValueError):
+        columnar.dataset_path(dataset_id)
+    with pytest.raises(ValueError):
+        columnar.cleaned_path(dataset_id)
+    assert not columnar.valid_dataset_id(dataset_id)
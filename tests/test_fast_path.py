@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.fast_path import answer_from_profile
+from src.analysis.profile import build_profile
+
+
+@pytest.fixture(scope="module")
+def profile():
+    rng = np.random.default_rng(0)
+    n = 200
+    df = pd.DataFrame({
+        "Survived": rng.integers(0, 2, n),
+        "Pclass": rng.integers(1, 4, n),
+        "Sex": rng.choice(["male", "female"], n),
+        "Age": np.where(rng.random(n) < 0.1, np.nan, rng.uniform(1, 80, n)),
+        "Fare": rng.exponential(30, n),
+        "Price per unit": rng.uniform(1, 5, n),
+    })
+    return build_profile(df)
+
+
+@pytest.mark.parametrize("question", [
+    "What is the average Age of survivors?",
+    "average Fare for women",
+    "max Age for female passengers",
+    "median Age in first class",
+    "mean Fare where Pclass is 1",
+    "average Age by Sex",
+    "Why is the median Age so low?",
+    "plot the mean Fare",
+    "What is the average Age of passengers who survived?",
+])
+def test_filtered_or_open_questions_go_to_the_llm(profile, question):
+    assert answer_from_profile(question, profile) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the average Age?", "The mean of **Age**"),
+    ("median Age", "The median of **Age**"),
+    ("What's the max Fare in the dataset?", "The maximum of **Fare**"),
+    ("how many missing values in Age", "**Age** has"),
+    ("How many rows are there?", "The dataset has 200 rows"),
+    ("What is the correlation between Age and Fare?", "correlation between **Age** and **Fare**"),
+    ("mean Price per unit", "The mean of **Price per unit**"),
+    ("how many unique values does Sex have", "**Sex** has 2 distinct values"),
+    ("Which columns have missing values?", "Missing values per column: **Age**"),
+])
+def test_plain_statistical_questions_are_answered(profile, question, expected):
+    answer = answer_from_profile(question, profile)
+    assert answer is not None and expected in answer
+    assert "Answered from the dataset profile" in answer
@@ -0,0 +1,32 @@
+import gzip
+import io
+import os
+
+import pytest
+
+from src.storage.ingest import UploadStager, stage_upload
+
+CSV = b"a,b\n" + b"".join(b"%d,%d\n" % (i, i % 7) for i in range(10_000))
+
+
+@pytest.mark.parametrize("body,filename", [(CSV, "a.csv"), (gzip.compress(CSV), "a.csv.gz"), (b"a\n", "t.csv")])
+def test_stager_stages_pieces_like_stage_upload(tmp_path, body, filename):
+    stager = UploadStager(filename, str(tmp_path))
+    for start in range(0, len(body), 3):
+        stager.write(body[start:start + 3])
+    staged = stager.finish()
+    expected = stage_upload(io.BytesIO(body), filename, str(tmp_path))
+    with open(staged["path"], "rb") as f:
+        assert f.read() == (CSV if body != b"a\n" else body)
+    assert {k: staged[k] for k in ("format", "compression", "digest", "bytes")} == \
+           {k: expected[k] for k in ("format", "compression", "digest", "bytes")}
+    os.remove(staged["path"])
+    os.remove(expected["path"])
+    assert os.listdir(tmp_path) == []
+
+
+def test_aborted_stager_leaves_no_file(tmp_path):
+    stager = UploadStager("a.csv", str(tmp_path))
+    stager.write(CSV[:100])
+    stager.abort()
+    assert os.listdir(tmp_path) == []
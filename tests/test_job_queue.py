@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+
+from src.api.job_queue import JobQueue, new_job_id
+
+
+def submit(queue, n=1):
+    items = [{"job_id": new_job_id(), "name": f"f{i}.csv", "path": f"/nonexistent/f{i}.csv", "owned": False}
+             for i in range(n)]
+    queue.submit("batch", items, {})
+    return [item["job_id"] for item in items]
+
+
+def test_second_process_does_not_rerun_a_job_another_is_running(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobQueue(path, workers=1), JobQueue(path, workers=1)
+    runs = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow(job, set_stage):
+            runs.append(("first", job["job_id"]))
+            await release.wait()
+            return {"ok": True}
+
+        async def fast(job, set_stage):
+            runs.append(("second", job["job_id"]))
+            return {"ok": True}
+
+        (job_id,) = submit(first)
+        first.start(slow)
+        while not runs:
+            await asyncio.sleep(0.01)
+        second.start(fast)
+        await asyncio.sleep(0.1)
+        assert second.get(job_id)["status"] == "running"
+        release.set()
+        while first.get(job_id)["status"] == "running":
+            await asyncio.sleep(0.01)
+        await first.shutdown()
+        await second.shutdown()
+        return job_id
+
+    job_id = asyncio.run(main())
+    assert runs == [("first", job_id)]
+    assert first.get(job_id)["status"] == "done"
+
+
+def test_stale_claim_is_requeued_and_its_late_outcome_dropped(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    dead, alive = JobQueue(path), JobQueue(path)
+    (job_id,) = submit(dead)
+    job = dead._claim()
+    assert alive._requeue_stale() == 0
+    dead._execute("UPDATE jobs SET heartbeat_at = heartbeat_at - ? WHERE job_id = ?", (dead.stale_seconds + 1, job_id))
+    assert alive._requeue_stale() == 1
+    assert alive.get(job_id)["status"] == "queued"
+    assert alive._claim()["job_id"] == job_id
+    assert not dead._finish(job, {"ok": True}, None)
+    assert alive.get(job_id)["status"] == "running"
+
+
+def test_shutdown_requeues_interrupted_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, workers=1)
+
+    async def main():
+        started = asyncio.Event()
+
+        async def hang(job, set_stage):
+            started.set()
+            await asyncio.Event().wait()
+
+        (job_id,) = submit(queue)
+        queue.start(hang)
+        await started.wait()
+        await queue.shutdown()
+        return job_id
+
+    job_id = asyncio.run(main())
+    assert JobQueue(path).get(job_id)["status"] == "queued"
+
+
+def test_queue_files_without_owner_columns_are_migrated(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE jobs (seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT UNIQUE NOT NULL, "
+               "batch_id TEXT NOT NULL, name TEXT NOT NULL, path TEXT NOT NULL, owned INTEGER NOT NULL, "
+               "options TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+               "result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)")
+    db.execute("INSERT INTO jobs (job_id, batch_id, name, path, owned, options, status, created_at) "
+               "VALUES ('old', 'batch', 'f.csv', '/nonexistent/f.csv', 0, '{}', 'running', 0)")
+    db.commit()
+    db.close()
+    queue = JobQueue(path)
+    # Claimed before owners were recorded: no heartbeat, so it is queued again
+    assert queue._requeue_stale() == 1
+    assert queue.get("old")["status"] == "queued"
@@ -0,0 +1,32 @@
+import pytest
+
+from src.visualization.render_pool import RenderError, check_code
+
+
+@pytest.mark.parametrize("code", [
+    'np.arange(3).dump("/tmp/x")',
+    'np.ndarray.dump(np.zeros(1), "/tmp/z")',
+    'np.zeros(1).dumps()',
+    'plt.gcf().canvas.print_png("/tmp/y.png")',
+    'plt.gcf().print_figure("/tmp/y.png")',
+    'df.style.export()',
+    'np.savez_compressed("/tmp/x", a=np.zeros(1))',
+    'np.loadtxt("/etc/passwd")',
+    'import matplotlib.animation',
+    'from matplotlib.backends.backend_pdf import PdfPages',
+    '().__class__.__bases__',
+])
+def test_check_code_rejects_file_and_process_access(code):
+    with pytest.raises(RenderError):
+        check_code(code)
+
+
+def test_check_code_accepts_plotting_code():
+    check_code(
+        "import matplotlib.pyplot as plt\nimport seaborn as sns\n"
+        "fig, ax = plt.subplots(figsize=(8, 5))\n"
+        "counts = df['city'].value_counts().head(10)\n"
+        "sns.barplot(x=counts.index, y=counts.values, ax=ax)\n"
+        "df['date'] = pd.to_datetime(df['date'])\n"
+        "ax.set_title('Top cities')\nax.set_xlabel('City')\nplt.xticks(rotation=45)\nplt.tight_layout()\n"
+    )